@@ -1,19 +1,76 @@
+import argparse
 from datetime import datetime, timezone
+import json
+import jwt
 import os
+import platform
+import random
 import requests
+import signal
+import threading
+import time
 import uuid
 
+from shieldcli import metrics
+from shieldcli.codec import dumps, encode_body
 from shieldcli.compliance.compliance_audit import audit_checks
-from shieldcli.integrity.file_monitor import run_integrity_check
+from shieldcli.integrity.file_monitor import run_integrity_check, last_merkle
+from shieldcli.integrity.merkle import node_payload, root_payload
+from shieldcli.logs.script_logs_multiOS_detect import iter_events, load_config
+from shieldcli.logs.tailer import load_checkpoints, save_checkpoints
+from shieldcli.report_delta import compute_delta
+from shieldcli.scheduler import RunLock, Scheduler, Task, lower_priority
+from shieldcli.spool import Spool
 
 AGENT_ID_FILE = "agent_id.txt"
+# Dernier rapport mis en file (seq + état complet) : base des rapports différentiels
+AGENT_STATE_FILE = "agent_state.json"
+# Tokens JWT (accès + refresh) réutilisés entre deux exécutions tant qu'ils ne sont pas proches de l'expiration
+AGENT_TOKEN_FILE = "agent_token.json"
+TOKEN_REFRESH_MARGIN = 120  # secondes avant "exp"
+# Rapports en attente d'envoi (API injoignable), vidés par lots avec backoff
+SPOOL = Spool("agent_spool.jsonl")
+SPOOL_BATCH_SIZE = 50
+MAX_RETRIES = 3
+BACKOFF_BASE = 1  # secondes, doublé à chaque échec
+# Événements de logs : configuration du collecteur, points de reprise propres à l'agent
+LOGS_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "shieldcli", "logs", "config.json")
+LOG_CHECKPOINT_FILE = "agent_log_checkpoints.json"
+EVENT_BATCH_SIZE = 1000
+# Résumé JSON des métriques de la dernière exécution (durées des phases, tailles des rapports...)
+METRICS_FILE = "agent_metrics.json"
+
+# Mode démon (python agent.py --daemon) : périodes des tâches, splay, nice / ionice
+AGENT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "agent_config.json")
+# Une seule exécution à la fois (cron ou démon) : une exécution lancée pendant la précédente est ignorée
+RUN_LOCK_FILE = "agent.lock"
+DAEMON_STOP_TIMEOUT = 60  # secondes laissées aux tâches en cours à l'arrêt
 
 API_URL = "http://192.168.126.1:8000/report"
+BATCH_URL = "http://192.168.126.1:8000/reports/batch"
 LOGIN_URL = "http://192.168.126.1:8000/login"
+REFRESH_URL = "http://192.168.126.1:8000/token/refresh"
+MERKLE_URL = "http://192.168.126.1:8000/integrity/merkle"
+EVENTS_URL = "http://192.168.126.1:8000/logs/events"
 
 HEADERS = {
     "Content-Type": "application/json"
 }
+# Compression des corps de requête ("gzip", "zstd" si l'API dispose de zstandard, None pour désactiver)
+REQUEST_ENCODING = "gzip"
+
+# Session HTTP persistante (keep-alive) partagée par toutes les requêtes de l'agent
+SESSION = requests.Session()
+
+PHASE_SECONDS = metrics.histogram("shieldcli_agent_phase_seconds", "Durée des phases d'une exécution de l'agent")
+REQUEST_BYTES = metrics.histogram("shieldcli_agent_request_bytes", "Taille des corps envoyés à l'API (raw / compressé)",
+                                  metrics.SIZE_BUCKETS)
+REQUEST_SECONDS = metrics.histogram("shieldcli_agent_request_seconds", "Durée des requêtes vers l'API")
+EVENTS_SENT = metrics.counter("shieldcli_agent_log_events_sent_total", "Événements de logs acquittés par l'API")
+SESSION.headers.update(HEADERS)
+# En mode démon, les tâches partagent la session, la file et l'état : les échanges avec l'API sont sérialisés
+API_LOCK = threading.RLock()
+METRICS_LOCK = threading.Lock()
 
 def get_agent_id():
     if os.path.exists(AGENT_ID_FILE):
@@ -25,40 +82,372 @@ def get_agent_id():
             f.write(new_id)
         return new_id
 
-# Obtenir un token JWT valide via la route /login
-def get_jwt_token(agent_id):
+def load_token_cache(agent_id):
+    try:
+        with open(AGENT_TOKEN_FILE, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if cache.get("agent_id") == agent_id else {}
+
+def save_token_cache(cache):
+    tmp_path = AGENT_TOKEN_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, AGENT_TOKEN_FILE)
+
+def token_exp(token):
+    # L'expiration est lue dans le token lui-même (la signature est vérifiée par l'API)
+    return jwt.decode(token, options={"verify_signature": False}).get("exp", 0)
+
+# Obtenir un token JWT valide : token en cache, sinon via le refresh token, sinon via /login
+def get_jwt_token(agent_id, force=False):
+    cache = load_token_cache(agent_id)
+    now = time.time()
+    if not force and cache.get("exp", 0) - now >= TOKEN_REFRESH_MARGIN:
+        return cache.get("access_token")
+    if cache.get("refresh_token") and cache.get("refresh_exp", 0) - now >= TOKEN_REFRESH_MARGIN:
+        try:
+            r = SESSION.post(REFRESH_URL, json={"refresh_token": cache["refresh_token"]})
+            r.raise_for_status()
+            token = r.json().get("access_token")
+            save_token_cache(dict(cache, access_token=token, exp=token_exp(token)))
+            return token
+        except Exception as e:
+            print("Erreur refresh token:", e)
     try:
-        r = requests.post(LOGIN_URL, json={"agent_id": agent_id})
+        r = SESSION.post(LOGIN_URL, json={"agent_id": agent_id})
         r.raise_for_status()
-        token = r.json().get("access_token")
+        data = r.json()
+        token = data.get("access_token")
+        cache = {"agent_id": agent_id, "access_token": token, "exp": token_exp(token)}
+        # API antérieure : pas de refresh token
+        if data.get("refresh_token"):
+            cache.update(refresh_token=data["refresh_token"], refresh_exp=token_exp(data["refresh_token"]))
+        save_token_cache(cache)
         return token
     except Exception as e:
         print("Erreur login:", e)
         return None
 
+def authenticate(agent_id, force=False):
+    token = get_jwt_token(agent_id, force)
+    if token:
+        SESSION.headers["Authorization"] = f"Bearer {token}"
+    return token
+
+# POST authentifié : un token refusé (révoqué, secret changé...) déclenche un nouveau login.
+# Le corps JSON est compressé au-delà de COMPRESS_THRESHOLD octets.
+def api_post(url, agent_id, payload):
+    body, headers = encode_body(payload, REQUEST_ENCODING)
+    endpoint = url.rsplit("/", 1)[-1]
+    if "Content-Encoding" in headers:
+        REQUEST_BYTES.observe(len(dumps(payload)), endpoint=endpoint, encoding="identity")
+    REQUEST_BYTES.observe(len(body), endpoint=endpoint, encoding=headers.get("Content-Encoding", "identity"))
+    with REQUEST_SECONDS.time(endpoint=endpoint):
+        r = SESSION.post(url, data=body, headers=headers)
+    if r.status_code in (401, 403) and authenticate(agent_id, force=True):
+        r = SESSION.post(url, data=body, headers=headers)
+    return r
+
+def load_state():
+    if os.path.exists(AGENT_STATE_FILE):
+        try:
+            with open(AGENT_STATE_FILE, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print("Erreur lecture état agent:", e)
+    return {}
+
+def save_state(state):
+    tmp_path = AGENT_STATE_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, AGENT_STATE_FILE)
+
+# Construit le rapport : complet au premier envoi ou sur demande de resynchronisation,
+# sinon uniquement les changements depuis le dernier rapport mis en file
+def build_payload(state, timestamp, audit, alerts, full=False):
+    data = {"timestamp": timestamp, "seq": state.get("seq", 0) + 1}
+    if full or "seq" not in state:
+        data.update({"audit": audit, "integrity_alerts": alerts, "base_seq": None})
+    else:
+        changed, new_alerts, resolved = compute_delta(state["audit"], state["alerts"], audit, alerts)
+        data.update({"audit": changed, "integrity_alerts": new_alerts,
+                     "resolved_alerts": resolved, "base_seq": state["seq"]})
+    return data
+
+# Synchronisation de l'arbre de Merkle : une seule requête (les racines) si rien n'a changé,
+# sinon descente uniquement dans les sous-arbres dont le digest diffère
+def sync_merkle(agent_id):
+    if not last_merkle:
+        return
+    tree = last_merkle["tree"]
+    nodes = root_payload(tree, last_merkle["roots"])
+    changes = []
+    try:
+        while nodes:
+            r = api_post(MERKLE_URL, agent_id, {"nodes": nodes})
+            r.raise_for_status()
+            resp = r.json()
+            changes.extend(resp.get("changes", []))
+            nodes = {path: node_payload(tree, path, last_merkle.get("files"))
+                     for path in resp.get("request", []) if path in tree}
+        print(f"Merkle: {len(changes)} changement(s) depuis le dernier rapport")
+    except Exception as e:
+        print("Erreur lors de la synchronisation Merkle:", e)
+
+# Ajoute un rapport en file ; si la file est pleine, elle est remplacée par un rapport complet
+def enqueue_report(state, timestamp, audit, alerts, full=False):
+    data = build_payload(state, timestamp, audit, alerts, full)
+    if not SPOOL.append(data):
+        print("File d'envoi pleine : rapports en attente abandonnés, envoi d'un rapport complet")
+        SPOOL.clear()
+        data = build_payload(state, timestamp, audit, alerts, full=True)
+        SPOOL.append(data)
+    save_state({"seq": data["seq"], "audit": audit, "alerts": alerts})
+
+# Vide la file par lots via /reports/batch. Retourne True si tout a été acquitté.
+def drain_spool(agent_id):
+    attempt = 0
+    while True:
+        entries = SPOOL.pending(SPOOL_BATCH_SIZE)
+        if not entries:
+            return True
+        try:
+            r = api_post(BATCH_URL, agent_id, [payload for _, payload in entries])
+            r.raise_for_status()
+            results = r.json()["results"]
+        except Exception as e:
+            attempt += 1
+            if attempt > MAX_RETRIES:
+                print(f"API injoignable ({e}), rapports conservés dans {SPOOL.path}")
+                return False
+            time.sleep(BACKOFF_BASE * 2 ** (attempt - 1) + random.uniform(0, BACKOFF_BASE))
+            continue
+        attempt = 0
+        acked = 0
+        for (offset, _), result in zip(entries, results):
+            if result["status"] == 409:
+                # Séquences désynchronisées (base API réinitialisée, état local perdu...) : rapport complet
+                print("Resynchronisation complète demandée par l'API")
+                SPOOL.clear()
+                state = load_state()
+                enqueue_report(state, datetime.now(timezone.utc).isoformat(),
+                               state.get("audit", {}), state.get("alerts", []), full=True)
+                break
+            if result["status"] != 200:
+                print("Rapport rejeté par l'API:", result.get("detail"))
+            acked = offset
+        else:
+            SPOOL.ack(acked)
+            print(f"{len(entries)} rapport(s) envoyé(s)")
+
+def post_events(agent_id, events):
+    try:
+        r = api_post(EVENTS_URL, agent_id, events)
+        r.raise_for_status()
+        return True
+    except Exception as e:
+        print("Erreur envoi des événements de logs:", e)
+        return False
+
+# Envoie les nouveaux événements de logs par lots compressés. Le point de reprise n'est enregistré
+# qu'après l'acquittement d'un lot : un envoi échoué est relu à l'exécution suivante.
+def ship_log_events(agent_id):
+    if platform.system().lower() != "linux":
+        return
+    cfg = load_config(LOGS_CONFIG_FILE)["linux"]
+    if not cfg.get("ship_events"):
+        return
+    # Flux continu : seuls les mots-clés s'appliquent, pas la fenêtre since/until de l'export
+    cfg = dict(cfg, filters={"keywords": cfg["filters"].get("keywords", [])})
+    checkpoints = load_checkpoints(LOG_CHECKPOINT_FILE)
+    batch = []
+    sent = 0
+    for event in iter_events(cfg, checkpoints):
+        batch.append(event)
+        if len(batch) >= EVENT_BATCH_SIZE:
+            if not post_events(agent_id, batch):
+                return
+            save_checkpoints(LOG_CHECKPOINT_FILE, checkpoints)
+            sent += len(batch)
+            EVENTS_SENT.inc(len(batch))
+            batch = []
+    if batch and not post_events(agent_id, batch):
+        return
+    save_checkpoints(LOG_CHECKPOINT_FILE, checkpoints)
+    sent += len(batch)
+    EVENTS_SENT.inc(len(batch))
+    if sent:
+        print(f"{sent} événement(s) de logs envoyé(s)")
+
+# Écrit le résumé des métriques de l'exécution (voir shieldcli/metrics.py)
+def save_metrics(started_at, elapsed):
+    try:
+        with METRICS_LOCK, open(METRICS_FILE, "w") as f:
+            json.dump({"started_at": started_at, "duration": round(elapsed, 3),
+                       "metrics": metrics.REGISTRY.snapshot()}, f, indent=2)
+    except Exception as e:
+        print("Erreur écriture des métriques:", e)
+
+def load_agent_config():
+    try:
+        with open(AGENT_CONFIG_FILE, "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print("Erreur lecture configuration agent:", e)
+        return {}
+
 # Envoi vers API
 def send_report():
-    # Récupérer un token JWT valide avant l'envoi
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
+    try:
+        run_agent()
+    finally:
+        PHASE_SECONDS.observe(time.perf_counter() - start, phase="total")
+        save_metrics(started_at, time.perf_counter() - start)
+
+# Vide la file de rapports vers l'API, puis synchronise l'arbre de Merkle si demandé.
+# Retourne True si tous les rapports ont été acquittés.
+def send_pending(agent_id, merkle=False):
+    with API_LOCK:
+        # Récupérer un token JWT valide avant l'envoi
+        with PHASE_SECONDS.time(phase="auth"):
+            token = authenticate(agent_id)
+        if not token:
+            print("Impossible d'obtenir un token JWT, rapport conservé en file")
+            return False
+        with PHASE_SECONDS.time(phase="report"):
+            drained = drain_spool(agent_id)
+        if drained and merkle:
+            with PHASE_SECONDS.time(phase="merkle"):
+                sync_merkle(agent_id)
+        return drained
+
+def run_agent():
+    agent_id = get_agent_id()
+
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with PHASE_SECONDS.time(phase="compliance"):
+        audit = audit_checks()
+    with PHASE_SECONDS.time(phase="integrity"):
+        alerts = run_integrity_check()
+
+    # Le rapport passe toujours par la file locale : il n'est pas perdu si l'API est injoignable
+    enqueue_report(load_state(), timestamp, audit, alerts)
+
+    if send_pending(agent_id, merkle=True):
+        with PHASE_SECONDS.time(phase="log_events"):
+            ship_log_events(agent_id)
+
+# Tâches du mode démon : chacune met à jour sa partie du rapport (audit ou alertes),
+# l'autre partie est reprise du dernier rapport mis en file
+def task_integrity():
+    agent_id = get_agent_id()
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with PHASE_SECONDS.time(phase="integrity"):
+        alerts = run_integrity_check()
+    with API_LOCK:
+        state = load_state()
+        enqueue_report(state, timestamp, state.get("audit", {}), alerts)
+        send_pending(agent_id, merkle=True)
+
+def task_compliance():
     agent_id = get_agent_id()
-    token = get_jwt_token(agent_id)
-    if not token:
-        print("Impossible d'obtenir un token JWT")
+    timestamp = datetime.now(timezone.utc).isoformat()
+    with PHASE_SECONDS.time(phase="compliance"):
+        audit = audit_checks()
+    with API_LOCK:
+        state = load_state()
+        enqueue_report(state, timestamp, audit, state.get("alerts", []))
+        send_pending(agent_id)
+
+def task_logs():
+    agent_id = get_agent_id()
+    with API_LOCK:
+        # Les rapports restés en file passent avant les événements (comme en exécution unique)
+        if send_pending(agent_id):
+            with PHASE_SECONDS.time(phase="log_events"):
+                ship_log_events(agent_id)
+
+def task_discovery():
+    # Configuration et sorties de shieldcli/Discovery/CONFIG.json (nmap / scapy importés à la demande)
+    from shieldcli.Discovery.subnet_discovery import DEFAULT_SHARD_PREFIX, ENGINES, load_config, run_discovery
+    config = load_config()
+    engine = ENGINES[config.get("engine", 1)]
+    api = config.get("api", {})
+    with PHASE_SECONDS.time(phase="discovery"):
+        run_discovery(config["ip_range"], engine, config.get("workers", 8),
+                      config.get("shard_prefix", DEFAULT_SHARD_PREFIX), config.get(engine, {}),
+                      config.get("output", "subnet_assets.csv"), api if api.get("enabled") else None)
+
+DAEMON_TASKS = {
+    "integrity": task_integrity,
+    "compliance": task_compliance,
+    "logs": task_logs,
+    "discovery": task_discovery,
+}
+
+def build_tasks(config):
+    tasks = []
+    for name, options in config.get("tasks", {}).items():
+        if not options.get("enabled", True):
+            continue
+        if name not in DAEMON_TASKS:
+            print(f"Tâche inconnue ignorée: {name}")
+            continue
+        tasks.append(Task(name, DAEMON_TASKS[name], options["interval"], options.get("jitter", 0.1)))
+    return tasks
+
+def run_daemon(config):
+    tasks = build_tasks(config)
+    if not tasks:
+        print("Aucune tâche activée dans", AGENT_CONFIG_FILE)
         return
+    started_at = datetime.now(timezone.utc).isoformat()
+    start = time.perf_counter()
 
-    # Mettre à jour le header Authorization avec le token JWT
-    HEADERS["Authorization"] = f"Bearer {token}"
+    def on_complete(task, outcome, seconds):
+        # Métriques cumulées depuis le démarrage du démon
+        save_metrics(started_at, time.perf_counter() - start)
 
-    data = {
-        "timestamp": datetime.now(timezone.utc).isoformat(),
-        "audit": audit_checks(),
-        "integrity_alerts": run_integrity_check()
-    }
+    scheduler = Scheduler(tasks, splay=config.get("splay", 0), on_complete=on_complete)
 
+    def stop(signum, frame):
+        print("Arrêt du démon demandé")
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, stop)
+    print("Démon ShieldCLI : " + ", ".join(f"{task.name} toutes les {task.interval} s" for task in tasks))
     try:
-        r = requests.post(API_URL, headers=HEADERS, json=data)
-        print("Statut:", r.status_code)
-    except Exception as e:
-        print("Erreur lors de l'envoi:", e)
+        scheduler.run()
+    except KeyboardInterrupt:
+        scheduler.stop()
+    # Les tâches en cours se terminent (rapports mis en file, points de reprise enregistrés)
+    scheduler.join(DAEMON_STOP_TIMEOUT)
 
 if __name__ == "__main__":
-    send_report()
+    parser = argparse.ArgumentParser(description="Agent ShieldCLI")
+    parser.add_argument("--daemon", action="store_true", help="reste actif et planifie les tâches (agent_config.json)")
+    parser.add_argument("--splay", type=float, default=0,
+                        help="exécution unique : délai aléatoire maximal avant de démarrer (secondes, pour cron)")
+    args = parser.parse_args()
+    config = load_agent_config()
+    lower_priority(config.get("nice"), config.get("ionice"))
+    lock = RunLock(RUN_LOCK_FILE)
+    if not lock.acquire():
+        print("Une exécution de l'agent est déjà en cours, abandon")
+    else:
+        try:
+            if args.daemon:
+                run_daemon(config)
+            else:
+                if args.splay:
+                    time.sleep(random.uniform(0, args.splay))
+                send_report()
+        finally:
+            lock.release()
@@ -0,0 +1,89 @@
+# Test de charge de l'ingestion des rapports
+# Lance l'API (uvicorn) sur une base temporaire puis simule de nombreux agents concurrents.
+#
+#   python benchmarks/ingest_load.py --agents 200 --reports 20
+#   python benchmarks/ingest_load.py --mode batch --batch-size 20
+#   INGEST_BATCH_SIZE=0 python benchmarks/ingest_load.py   # écriture directe (comportement précédent)
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from synthetic import fake_report
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_agent(base_url, reports, mode, batch_size):
+    session = requests.Session()
+    token = session.post(f"{base_url}/login", json={"agent_id": str(uuid.uuid4())}).json()["access_token"]
+    session.headers["Authorization"] = f"Bearer {token}"
+    sent = 0
+    if mode == "single":
+        for seq in range(1, reports + 1):
+            session.post(f"{base_url}/report", json=fake_report(seq)).raise_for_status()
+            sent += 1
+    else:
+        for start in range(1, reports + 1, batch_size):
+            batch = [fake_report(seq) for seq in range(start, min(reports + 1, start + batch_size))]
+            session.post(f"{base_url}/reports/batch", json=batch).raise_for_status()
+            sent += len(batch)
+    return sent
+
+def wait_for_api(base_url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"{base_url}/docs", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("L'API n'a pas démarré")
+
+def start_api(port, workdir, env=None):
+    """
+    Lance l'API (uvicorn) dans workdir, donc sur une base reports.db vierge.
+    """
+    env = dict(os.environ, PYTHONPATH=RACINE, JWT_SECRET_KEY=os.getenv("JWT_SECRET_KEY", "load-test-" + "x" * 32),
+               **(env or {}))
+    return subprocess.Popen([sys.executable, "-m", "uvicorn", "shieldcli.api:app", "--port", str(port),
+                             "--log-level", "warning"], cwd=workdir, env=env)
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de /report et /reports/batch")
+    parser.add_argument("--agents", type=int, default=100)
+    parser.add_argument("--reports", type=int, default=20, help="rapports par agent")
+    parser.add_argument("--mode", choices=["single", "batch"], default="single")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--url", help="API déjà lancée (sinon une instance locale est démarrée)")
+    args = parser.parse_args()
+
+    server = None
+    workdir = tempfile.mkdtemp(prefix="shieldcli-load-")
+    base_url = args.url
+    if not base_url:
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = start_api(args.port, workdir)
+    try:
+        wait_for_api(base_url)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.agents) as pool:
+            sent = sum(pool.map(lambda _: run_agent(base_url, args.reports, args.mode, args.batch_size),
+                                range(args.agents)))
+        elapsed = time.perf_counter() - start
+        print(f"{args.agents} agents, mode {args.mode} : {sent} rapports en {elapsed:.2f} s "
+              f"({sent / elapsed:.0f} rapports/s)")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Débit du filtre de lignes de logs (lignes/s)
+# Génère un syslog synthétique puis compare l'ancien filter_line (strptime + re.search par
+# mot-clé) au filtre compilé de shieldcli/logs/line_filter.py, et à l'analyse parallèle par
+# tranches (shieldcli/logs/parallel_scan.py) pour chaque nombre de processus demandé.
+#
+#   python benchmarks/log_filter.py --lines 1000000
+#   python benchmarks/log_filter.py --keywords error fail denied
+#   python benchmarks/log_filter.py --skip-legacy --workers 1 8 32 --chunk-size-mb 16
+
+import argparse
+import datetime
+import os
+import re
+import sys
+import tempfile
+import time
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from shieldcli.logs.line_filter import compile_filter
+from shieldcli.logs.parallel_scan import scan_files
+from synthetic import write_syslog
+
+def legacy_filter_line(line, since, until, keywords):
+    # Implémentation d'origine, conservée comme référence
+    try:
+        parts = line.split()
+        dt = datetime.datetime.strptime(
+            f"{parts[0]} {parts[1]} {datetime.datetime.now().year} {parts[2]}",
+            "%b %d %Y %H:%M:%S"
+        )
+    except Exception:
+        dt = None
+    if dt:
+        if since and dt < since:
+            return False
+        if until and dt > until:
+            return False
+    if keywords and not any(re.search(kw, line, re.IGNORECASE) for kw in keywords):
+        return False
+    return True
+
+def measure(path, match):
+    kept = 0
+    start = time.perf_counter()
+    with open(path, "r", errors="ignore") as f:
+        for line in f:
+            if match(line):
+                kept += 1
+    return kept, time.perf_counter() - start
+
+def measure_parallel(path, since, until, keywords, year, workers, chunk_size):
+    start = time.perf_counter()
+    kept = sum(1 for _ in scan_files([path], since, until, keywords, year, workers, chunk_size))
+    return kept, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit du filtre de lignes de logs")
+    parser.add_argument("--lines", type=int, default=1000000)
+    parser.add_argument("--keywords", nargs="*", default=["error", "fail"])
+    parser.add_argument("--skip-legacy", action="store_true", help="ne mesure pas le filtre d'origine")
+    parser.add_argument("--workers", type=int, nargs="*", default=[], help="analyse parallèle avec N processus")
+    parser.add_argument("--chunk-size-mb", type=float, default=16)
+    args = parser.parse_args()
+
+    year = datetime.datetime.now().year
+    start = datetime.datetime(year, 6, 1)
+    # Fenêtre couvrant environ la moitié du fichier
+    since = start + datetime.timedelta(seconds=args.lines * 0.4 * 0.5)
+    until = start + datetime.timedelta(seconds=args.lines * 0.4 * 2)
+    fd, path = tempfile.mkstemp(prefix="shieldcli-syslog-", suffix=".log")
+    os.close(fd)
+    try:
+        write_syslog(path, args.lines, start)
+        print(f"Syslog synthétique : {args.lines} lignes, {os.path.getsize(path) / (1024 * 1024):.1f} Mo")
+        results = {"compilé": measure(path, compile_filter(since, until, args.keywords, year))}
+        if not args.skip_legacy:
+            results["d'origine"] = measure(path, lambda line: legacy_filter_line(line, since, until, args.keywords))
+        for workers in args.workers:
+            results[f"parallèle x{workers}"] = measure_parallel(path, since, until, args.keywords, year, workers,
+                                                               int(args.chunk_size_mb * 1024 * 1024))
+        for name, (kept, elapsed) in results.items():
+            print(f"  filtre {name:<15} : {kept} lignes retenues, {elapsed:.2f} s, {args.lines / elapsed:,.0f} lignes/s")
+        if len({kept for kept, _ in results.values()}) > 1:
+            print("  ATTENTION : les filtres ne retiennent pas le même nombre de lignes")
+    finally:
+        os.remove(path)
+
+if __name__ == "__main__":
+    main()
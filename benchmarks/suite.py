@@ -0,0 +1,270 @@
+# Suite de benchmarks de ShieldCLI
+# Génère des données synthétiques (arborescences, syslogs, racine système factice, flotte d'agents),
+# mesure les chemins critiques (hachage, intégrité, conformité, logs, ingestion) et écrit les
+# résultats en JSON pour comparer les exécutions dans le temps. Fonctionne hors ligne.
+#
+#   python benchmarks/suite.py                              # échelle "small", tous les scénarios
+#   python benchmarks/suite.py --scale medium --scenarios hash logs
+#   python benchmarks/suite.py --compare benchmarks/results/reference.json --tolerance 0.15
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RACINE = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RACINE)
+
+from shieldcli.integrity.file_monitor import build_baseline, compute_checksum, iter_files, run_integrity_check
+from shieldcli.integrity.hasher import hash_files
+from shieldcli.integrity.store import write_store
+from shieldcli.integrity.walker import walk
+from shieldcli.logs.script_logs_multiOS_detect import fetch_linux, filter_line
+from synthetic import make_fake_root, make_tree, touch_files, write_syslog
+
+RESULTS_DIR = os.path.join(RACINE, "benchmarks", "results")
+
+# Paramètres par échelle : "small" tient en quelques secondes, "large" dimensionne un serveur
+SCALES = {
+    "small": {"small_files": 2000, "huge_files": 1, "huge_mb": 64, "log_lines": 200000, "filter_line_lines": 5000,
+              "auth_lines": 20000, "agents": 20, "reports": 10, "batch_size": 10},
+    "medium": {"small_files": 20000, "huge_files": 2, "huge_mb": 256, "log_lines": 1000000, "filter_line_lines": 20000,
+               "auth_lines": 200000, "agents": 100, "reports": 20, "batch_size": 20},
+    "large": {"small_files": 200000, "huge_files": 4, "huge_mb": 1024, "log_lines": 5000000, "filter_line_lines": 50000,
+              "auth_lines": 1000000, "agents": 500, "reports": 20, "batch_size": 50},
+}
+
+KEYWORDS = ["error", "fail"]
+
+# Sens de variation souhaité par unité (pour la comparaison de deux exécutions)
+HIGHER_IS_BETTER = {"files/s", "MB/s", "lines/s", "checks/s", "reports/s"}
+
+class Results:
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, scenario, name, value, unit, seconds, **params):
+        self.entries.append({"scenario": scenario, "name": name, "value": round(value, 3), "unit": unit,
+                             "seconds": round(seconds, 4), "params": params})
+        print(f"  {scenario + '/' + name:<40} {value:>14,.1f} {unit:<10} ({seconds:.3f} s)")
+
+def best_of(repeat, func):
+    """
+    Exécute func repeat fois et retourne (résultat, meilleure durée).
+    """
+    best = None
+    result = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def bench_hash(workdir, scale, results, args):
+    tree = os.path.join(workdir, "tree")
+    files, size = make_tree(tree, small_files=scale["small_files"])
+    paths = list(iter_files([tree]))
+    _, elapsed = best_of(args.repeat, lambda: [compute_checksum(path) for path in paths])
+    results.add("hash", "compute_checksum_small", files / elapsed, "files/s", elapsed, files=files, bytes=size)
+    _, elapsed = best_of(args.repeat, lambda: hash_files(paths))
+    results.add("hash", "hash_files_small", files / elapsed, "files/s", elapsed, files=files, bytes=size)
+
+    huge = os.path.join(workdir, "huge")
+    files, size = make_tree(huge, huge_files=scale["huge_files"], huge_size=scale["huge_mb"] * 1024 * 1024)
+    paths = list(iter_files([huge]))
+    _, elapsed = best_of(args.repeat, lambda: [compute_checksum(path) for path in paths])
+    results.add("hash", "compute_checksum_huge", size / elapsed / 1e6, "MB/s", elapsed, files=files, bytes=size)
+    shutil.rmtree(huge)
+
+def bench_integrity(workdir, scale, results, args):
+    tree = os.path.join(workdir, "tree")
+    if not os.path.isdir(tree):
+        make_tree(tree, small_files=scale["small_files"])
+    files = sum(1 for _ in iter_files([tree]))
+    racine = os.path.join(workdir, "integrity")
+    os.makedirs(racine, exist_ok=True)
+    config = {"paths": [tree], "incremental": True, "paranoid_every": 0, "baseline_store": "baseline.db"}
+    with open(os.path.join(racine, "monitor_config.json"), "w") as f:
+        json.dump(config, f)
+
+    _, elapsed = best_of(args.repeat, lambda: sum(1 for _ in walk([tree])))
+    results.add("integrity", "walk", files / elapsed, "files/s", elapsed, files=files)
+
+    start = time.perf_counter()
+    write_store(os.path.join(racine, "baseline.db"), build_baseline([tree]), meta={"runs": 0})
+    elapsed = time.perf_counter() - start
+    results.add("integrity", "build_baseline", files / elapsed, "files/s", elapsed, files=files)
+
+    _, elapsed = best_of(args.repeat, lambda: run_integrity_check(incremental=False, racine=racine))
+    results.add("integrity", "full_pass", files / elapsed, "files/s", elapsed, files=files)
+    _, elapsed = best_of(args.repeat, lambda: run_integrity_check(incremental=True, racine=racine))
+    results.add("integrity", "incremental_unchanged", files / elapsed, "files/s", elapsed, files=files)
+
+    changed = touch_files(tree, 0.01)
+    start = time.perf_counter()
+    alerts = run_integrity_check(incremental=True, racine=racine)
+    elapsed = time.perf_counter() - start
+    results.add("integrity", "incremental_1pct_changed", files / elapsed, "files/s", elapsed,
+                files=files, changed=changed, alerts=len(alerts))
+
+def bench_compliance(workdir, scale, results, args):
+    from shieldcli.compliance.compliance_audit import REGISTRY, audit_checks
+    root = os.path.join(workdir, "fakeroot")
+    bin_dir = make_fake_root(root, auth_lines=scale["auth_lines"])
+    # Les commandes des contrôles (systemctl, dpkg...) sont remplacées par les scripts de la racine factice
+    previous_path = os.environ.get("PATH", "")
+    os.environ["PATH"] = bin_dir + os.pathsep + previous_path
+    cache_path = os.path.join(workdir, "compliance_cache.json")
+    try:
+        checks = len(REGISTRY)
+        _, elapsed = best_of(args.repeat, lambda: audit_checks(cache_path=None, root=root))
+        results.add("compliance", "audit_uncached", checks / elapsed, "checks/s", elapsed, checks=checks)
+        start = time.perf_counter()
+        audit_checks(cache_path=cache_path, root=root)
+        elapsed = time.perf_counter() - start
+        results.add("compliance", "audit_cache_cold", checks / elapsed, "checks/s", elapsed, checks=checks)
+        _, elapsed = best_of(args.repeat, lambda: audit_checks(cache_path=cache_path, root=root))
+        results.add("compliance", "audit_cache_warm", checks / elapsed, "checks/s", elapsed, checks=checks)
+    finally:
+        os.environ["PATH"] = previous_path
+
+def bench_logs(workdir, scale, results, args):
+    lines = scale["log_lines"]
+    path = os.path.join(workdir, "syslog")
+    start_date = datetime.datetime(datetime.datetime.now().year, 6, 1)
+    end_date = write_syslog(path, lines, start_date)
+    # Fenêtre couvrant environ la moitié du fichier
+    since = start_date + (end_date - start_date) / 4
+    until = start_date + (end_date - start_date) * 3 / 4
+    size = os.path.getsize(path)
+
+    # filter_line appelé ligne par ligne (filtre compilé mis en cache) : mesuré sur un échantillon
+    with open(path, "r") as f:
+        sample = [line for _, line in zip(range(scale["filter_line_lines"]), f)]
+    _, elapsed = best_of(args.repeat, lambda: [filter_line(line, since, until, KEYWORDS) for line in sample])
+    results.add("logs", "filter_line", len(sample) / elapsed, "lines/s", elapsed, lines=len(sample))
+
+    cfg = {"logs": [path], "filters": {"since": since.isoformat(), "until": until.isoformat(), "keywords": KEYWORDS}}
+    kept, elapsed = best_of(args.repeat, lambda: len(fetch_linux(cfg)))
+    results.add("logs", "fetch_linux", lines / elapsed, "lines/s", elapsed, lines=lines, bytes=size, kept=kept)
+    parallel_cfg = dict(cfg, parallel=True, chunk_size_mb=8)
+    kept, elapsed = best_of(args.repeat, lambda: len(fetch_linux(parallel_cfg)))
+    results.add("logs", "fetch_linux_parallel", lines / elapsed, "lines/s", elapsed, lines=lines, bytes=size,
+                kept=kept, workers=os.cpu_count())
+
+def bench_ingest(workdir, scale, results, args):
+    from ingest_load import run_agent, start_api, wait_for_api
+
+    for mode in ("single", "batch"):
+        # Base vierge pour chaque mode
+        api_dir = os.path.join(workdir, f"api-{mode}")
+        os.makedirs(api_dir, exist_ok=True)
+        server = start_api(args.port, api_dir)
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            wait_for_api(base_url)
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=scale["agents"]) as pool:
+                sent = sum(pool.map(lambda _: run_agent(base_url, scale["reports"], mode, scale["batch_size"]),
+                                    range(scale["agents"])))
+            elapsed = time.perf_counter() - start
+            results.add("ingest", f"report_{mode}", sent / elapsed, "reports/s", elapsed,
+                        agents=scale["agents"], reports=sent, batch_size=scale["batch_size"] if mode == "batch" else 1)
+        finally:
+            server.terminate()
+            server.wait()
+
+SCENARIOS = {
+    "hash": bench_hash,
+    "integrity": bench_integrity,
+    "compliance": bench_compliance,
+    "logs": bench_logs,
+    "ingest": bench_ingest,
+}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=RACINE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def compare(current, reference, tolerance):
+    """
+    Affiche l'écart avec une exécution de référence ; retourne le nombre de régressions
+    (écart défavorable supérieur à tolerance).
+    """
+    previous = {(e["scenario"], e["name"]): e for e in reference["results"]}
+    regressions = 0
+    print(f"Comparaison avec {reference['meta'].get('date')} ({reference['meta'].get('commit')}) :")
+    for entry in current:
+        old = previous.get((entry["scenario"], entry["name"]))
+        if not old or not old["value"] or old["unit"] != entry["unit"]:
+            continue
+        ratio = entry["value"] / old["value"]
+        worse = ratio < 1 - tolerance if entry["unit"] in HIGHER_IS_BETTER else ratio > 1 + tolerance
+        regressions += worse
+        print(f"  {entry['scenario'] + '/' + entry['name']:<40} {ratio:>6.2f}x" + ("  RÉGRESSION" if worse else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Suite de benchmarks de ShieldCLI (résultats JSON)")
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--scenarios", nargs="*", choices=sorted(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--repeat", type=int, default=3, help="meilleure durée sur N exécutions (mesures sans effet de bord)")
+    parser.add_argument("--output", help=f"fichier de résultats (par défaut {RESULTS_DIR}/<date>.json)")
+    parser.add_argument("--compare", help="résultats d'une exécution précédente")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="écart toléré avant de signaler une régression")
+    parser.add_argument("--workdir", help="dossier des données synthétiques (par défaut temporaire, supprimé à la fin)")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="shieldcli-bench-"))
+    os.makedirs(workdir, exist_ok=True)
+    results = Results()
+    meta = {
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "host": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "scale": args.scale,
+        "parameters": scale,
+        "repeat": args.repeat,
+    }
+    cwd = os.getcwd()
+    # Les fichiers écrits dans le répertoire courant (cache, profils...) restent dans le dossier de travail
+    os.chdir(workdir)
+    try:
+        for name in args.scenarios:
+            print(f"[{name}]")
+            SCENARIOS[name](workdir, scale, results, args)
+    finally:
+        os.chdir(cwd)
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, meta["date"].replace(":", "") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump({"meta": meta, "results": results.entries}, f, indent=2)
+    print(f"Résultats écrits dans {output}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            if compare(results.entries, json.load(f), args.tolerance):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# Données synthétiques des benchmarks (reproductibles : générateurs initialisés par une graine)
+# Arborescences de fichiers, syslogs, racine système factice pour l'audit de conformité et
+# rapports d'une flotte d'agents. Aucun accès réseau ni privilège requis.
+
+import datetime
+import os
+import random
+import stat
+
+MESSAGES = [
+    "sshd[{pid}]: Accepted publickey for deploy from 10.0.0.{n} port 52{n} ssh2",
+    "sshd[{pid}]: Failed password for invalid user admin from 192.168.1.{n} port 40{n} ssh2",
+    "CRON[{pid}]: pam_unix(cron:session): session opened for user root by (uid=0)",
+    "kernel: [{pid}.{n}] EXT4-fs error (device sda1): ext4_find_entry:1455: inode #{n}",
+    "systemd[1]: Started Session {n} of user deploy.",
+    "sudo: pam_unix(sudo:auth): authentication failure; logname= uid=1000 euid=0 tty=/dev/pts/{n} user=root",
+]
+
+def write_syslog(path, count, start, seed=42):
+    """
+    Écrit count lignes au format syslog à partir de start (quelques lignes par seconde).
+    Retourne la date de la dernière ligne.
+    """
+    rng = random.Random(seed)
+    current = start
+    with open(path, "w") as f:
+        for _ in range(count):
+            if rng.random() < 0.2:
+                current += datetime.timedelta(seconds=rng.randint(1, 3))
+            message = rng.choice(MESSAGES).format(pid=rng.randint(100, 99999), n=rng.randint(1, 254))
+            f.write(f"{current.strftime('%b')} {current.day:2d} {current.strftime('%H:%M:%S')} host {message}\n")
+    return current
+
+def write_random_file(path, size, rng, block=1024 * 1024):
+    with open(path, "wb") as f:
+        remaining = size
+        while remaining > 0:
+            n = min(block, remaining)
+            f.write(rng.randbytes(n))
+            remaining -= n
+
+def make_tree(root, small_files=0, small_size=4096, huge_files=0, huge_size=256 * 1024 * 1024,
+              fanout=100, seed=42):
+    """
+    Crée une arborescence de small_files petits fichiers (répartis par dossiers de fanout fichiers)
+    et de huge_files gros fichiers. Retourne (nombre de fichiers, octets écrits).
+    """
+    rng = random.Random(seed)
+    total = 0
+    for i in range(small_files):
+        directory = os.path.join(root, "small", f"d{i // fanout:05d}")
+        if i % fanout == 0:
+            os.makedirs(directory, exist_ok=True)
+        # Tailles variées autour de small_size
+        size = rng.randint(small_size // 2, small_size * 3 // 2)
+        write_random_file(os.path.join(directory, f"f{i:07d}.conf"), size, rng)
+        total += size
+    if huge_files:
+        os.makedirs(os.path.join(root, "huge"), exist_ok=True)
+    for i in range(huge_files):
+        write_random_file(os.path.join(root, "huge", f"blob{i:03d}.bin"), huge_size, rng)
+        total += huge_size
+    return small_files + huge_files, total
+
+def touch_files(root, ratio, seed=42):
+    """
+    Modifie le contenu d'une fraction ratio des fichiers de root (dernier octet) et
+    retourne le nombre de fichiers modifiés.
+    """
+    rng = random.Random(seed)
+    changed = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if rng.random() < ratio:
+                with open(os.path.join(directory, name), "r+b") as f:
+                    f.seek(-1, os.SEEK_END)
+                    last = f.read(1)
+                    f.seek(-1, os.SEEK_END)
+                    f.write(bytes([(last[0] + 1) % 256]))
+                changed += 1
+    return changed
+
+# Sorties des commandes appelées par les contrôles de conformité
+FAKE_COMMANDS = {
+    "systemctl": "disabled",
+    "aa-status": "apparmor module is loaded.\n42 profiles are loaded.",
+    "dpkg": "Package: auditd\nStatus: install ok installed",
+}
+
+def make_fake_root(root, users=200, auth_lines=100000, seed=42):
+    """
+    Crée une racine système factice (etc, proc/mounts, var/log/auth.log, bin/) pour
+    audit_checks(root=...). Les commandes de bin/ sont des scripts renvoyant une sortie fixe :
+    ajouter root/bin en tête du PATH. Retourne le chemin de bin/.
+    """
+    for directory in ("etc/ssh", "proc", "var/log", "var/lib/dpkg", "bin"):
+        os.makedirs(os.path.join(root, directory), exist_ok=True)
+    with open(os.path.join(root, "etc/passwd"), "w") as f:
+        f.write("root:x:0:0:root:/root:/bin/bash\n")
+        for uid in range(1000, 1000 + users):
+            f.write(f"user{uid}:x:{uid}:{uid}::/home/user{uid}:/bin/bash\n")
+    os.chmod(os.path.join(root, "etc/passwd"), 0o644)
+    with open(os.path.join(root, "etc/shadow"), "w") as f:
+        f.write("root:$6$salt$hash:19000:0:99999:7:::\n")
+        for uid in range(1000, 1000 + users):
+            f.write(f"user{uid}:$6$salt$hash:19000:0:99999:7:::\n")
+    with open(os.path.join(root, "etc/login.defs"), "w") as f:
+        f.write("UMASK 022\nPASS_MAX_DAYS 90\nPASS_MIN_DAYS 1\n")
+    with open(os.path.join(root, "etc/ssh/sshd_config"), "w") as f:
+        f.write("Port 22\nPermitRootLogin no\nPasswordAuthentication no\n")
+    with open(os.path.join(root, "proc/mounts"), "w") as f:
+        f.write("/dev/sda1 / ext4 rw,relatime 0 0\ntmpfs /tmp tmpfs rw,nosuid,nodev 0 0\n")
+    with open(os.path.join(root, "var/lib/dpkg/status"), "w") as f:
+        f.write(FAKE_COMMANDS["dpkg"] + "\n")
+    write_syslog(os.path.join(root, "var/log/auth.log"), auth_lines, datetime.datetime(2025, 6, 1), seed)
+    bin_dir = os.path.join(root, "bin")
+    for name, output in FAKE_COMMANDS.items():
+        path = os.path.join(bin_dir, name)
+        with open(path, "w") as f:
+            f.write("#!/bin/sh\ncat <<'EOF'\n" + output + "\nEOF\n")
+        os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return bin_dir
+
+def fake_report(seq, checks=10, alerts=1, timestamp=None):
+    """
+    Rapport complet d'un agent (numéro de séquence seq) au format attendu par /report.
+    """
+    return {
+        "timestamp": timestamp or datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "seq": seq,
+        "base_seq": None,
+        "audit": {f"check_{i}": (seq + i) % 3 == 0 for i in range(checks)},
+        "integrity_alerts": [{"type": "checksum", "file": f"/etc/file_{seq}_{i}", "msg": "Modification détectée"}
+                             for i in range(alerts)],
+    }
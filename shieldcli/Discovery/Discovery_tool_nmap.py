@@ -1,7 +1,11 @@
 import csv
 import socket
 import nmap           # pip install python-nmap
-from manuf import manuf  # pip install manuf
+
+try:
+    from shieldcli.Discovery.oui import lookup_vendor
+except ImportError:
+    from oui import lookup_vendor
 
 def get_local_ip():
     """Récupère l'IP primaire de la machine en ouvrant une socket UDP."""
@@ -13,13 +17,33 @@ def get_local_ip():
     finally:
         s.close()
 
+def host_record(nm, host, default_hostname=''):
+    """Convertit le résultat nmap d'un hôte en entrée d'inventaire (fabricant via l'index OUI partagé)."""
+    info = nm[host]
+    mac = info['addresses'].get('mac', 'Inconnu')
+    device_type = lookup_vendor(mac) if mac != 'Inconnu' else 'Inconnu'
+    hostnames = [h['name'] for h in info['hostnames'] if h.get('name')]
+    hostname = hostnames[0] if hostnames else default_hostname
+
+    os_guess = 'Inconnu'
+    os_matches = info.get('osmatch', [])
+    if os_matches:
+        os_guess = os_matches[0]['name']
+
+    return {
+        'ip': host,
+        'mac': mac,
+        'hostname': hostname,
+        'device_type': device_type,
+        'os': os_guess
+    }
+
 def scan_local():
     local_ip = get_local_ip()
     nm = nmap.PortScanner()
     # Scan SYN + OS detection sur l'hôte local
     nm.scan(hosts=local_ip, arguments='-sS -O')
 
-    parser = manuf.MacParser()
     result = []
 
     host_info = nm.all_hosts()[0]  # il n'y a qu'un seul host
@@ -27,22 +51,7 @@ def scan_local():
         print("L'hôte local n'est pas détecté comme 'up'.")
         return result
 
-    mac = nm[host_info]['addresses'].get('mac', 'Inconnu')
-    device_type = parser.get_manuf(mac) if mac != 'Inconnu' else 'Inconnu'
-    hostname = nm[host_info]['hostnames'][0]['name'] if nm[host_info]['hostnames'] else socket.gethostname()
-
-    os_guess = 'Inconnu'
-    os_matches = nm[host_info].get('osmatch', [])
-    if os_matches:
-        os_guess = os_matches[0]['name']
-
-    result.append({
-        'ip': local_ip,
-        'mac': mac,
-        'hostname': hostname,
-        'device_type': device_type,
-        'os': os_guess
-    })
+    result.append(dict(host_record(nm, host_info, socket.gethostname()), ip=local_ip))
     return result
 
 def save_to_csv(data, filename="local_asset.csv"):
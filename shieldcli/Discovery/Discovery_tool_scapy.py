@@ -1,7 +1,11 @@
 import csv
 import socket
 from scapy.all import get_if_addr, get_if_hwaddr
-from manuf import manuf
+
+try:
+    from shieldcli.Discovery.oui import lookup_vendor
+except ImportError:
+    from oui import lookup_vendor
 
 # Récupère l'adresse IP locale en utilisant l'interface par défaut
 def get_local_ip():
@@ -22,9 +26,8 @@ def scan_local_scapy():
     except socket.herror:
         hostname = socket.gethostname()
 
-    # Type d'appareil/fabricant via OUI
-    parser = manuf.MacParser()
-    device_type = parser.get_manuf(mac) or "Inconnu"
+    # Type d'appareil/fabricant via l'index OUI partagé (chargé une seule fois)
+    device_type = lookup_vendor(mac)
 
     return [{
         'ip': ip,
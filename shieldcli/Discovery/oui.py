@@ -0,0 +1,102 @@
+# Index des préfixes OUI (fabricants des adresses MAC)
+# La base du paquet manuf (format Wireshark) est lue une seule fois par processus et rangée
+# par longueur de préfixe (24, 28, 36 bits...) : une recherche coûte quelques accès dictionnaire,
+# au lieu d'une nouvelle analyse complète du fichier à chaque manuf.MacParser().
+
+import os
+import threading
+
+try:
+    from manuf import manuf  # pip install manuf
+except ImportError:
+    manuf = None
+
+def default_database():
+    if manuf is None:
+        return None
+    return os.path.join(os.path.dirname(manuf.__file__), "manuf")
+
+def mac_to_int(mac):
+    """
+    Adresse MAC (séparateurs ':', '-' ou '.') -> entier 48 bits, None si elle est invalide.
+    """
+    digits = "".join(c for c in mac if c not in ":-.")
+    if len(digits) != 12:
+        return None
+    try:
+        return int(digits, 16)
+    except ValueError:
+        return None
+
+class OuiIndex:
+    """
+    {longueur du préfixe en bits: {préfixe: fabricant}} ; les noms de fabricants sont partagés
+    entre les préfixes (un même fabricant possède souvent des centaines de blocs).
+    """
+
+    def __init__(self):
+        self.prefixes = {}
+        self.lengths = ()
+
+    @classmethod
+    def load(cls, path):
+        index = cls()
+        names = {}
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                fields = line.split("\t")
+                if len(fields) < 2:
+                    continue
+                prefix, _, bits = fields[0].partition("/")
+                digits = "".join(c for c in prefix if c not in ":-.")
+                try:
+                    value = int(digits, 16)
+                except ValueError:
+                    continue
+                bits = int(bits) if bits else len(digits) * 4
+                # "00:1B:C5:00:00:00/36" : adresse complète, on ne garde que les bits du masque
+                value = (value << (48 - len(digits) * 4)) >> (48 - bits)
+                name = fields[1].strip()
+                index.prefixes.setdefault(bits, {})[value] = names.setdefault(name, name)
+        # Préfixe le plus long d'abord (les blocs MA-M / MA-S affinent un bloc de 24 bits)
+        index.lengths = tuple(sorted(index.prefixes, reverse=True))
+        return index
+
+    def lookup(self, mac):
+        value = mac_to_int(mac) if isinstance(mac, str) else mac
+        if value is None:
+            return None
+        for bits in self.lengths:
+            name = self.prefixes[bits].get(value >> (48 - bits))
+            if name is not None:
+                return name
+        return None
+
+    def __len__(self):
+        return sum(len(prefixes) for prefixes in self.prefixes.values())
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index(path=None):
+    """
+    Index partagé du processus, chargé au premier appel (base de manuf par défaut).
+    Sans base disponible, un index vide est retourné (fabricant "Inconnu").
+    """
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                path = path or default_database()
+                if path and os.path.exists(path):
+                    _index = OuiIndex.load(path)
+                else:
+                    print("Base OUI introuvable : fabricants non résolus")
+                    _index = OuiIndex()
+    return _index
+
+def lookup_vendor(mac, default="Inconnu"):
+    return get_index().lookup(mac) or default
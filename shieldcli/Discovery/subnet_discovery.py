@@ -0,0 +1,221 @@
+# Découverte d'un sous-réseau complet (jusqu'à un /16 ou plus)
+# La plage est découpée en tranches (un /24 par défaut) réparties entre plusieurs scanners
+# concurrents (nmap ou ARP scapy). Les hôtes sont restitués dès qu'une tranche est analysée :
+# ils sont écrits au fur et à mesure dans le CSV et, si configuré, envoyés par lots à l'API.
+#
+#   python shieldcli/Discovery/subnet_discovery.py --range 10.20.0.0/16 --engine nmap --workers 16
+#   python shieldcli/Discovery/subnet_discovery.py --engine scapy --api
+
+import argparse
+import csv
+import ipaddress
+import json
+import os
+import re
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import requests
+
+try:
+    from shieldcli.Discovery.oui import lookup_vendor
+except ImportError:
+    from oui import lookup_vendor
+
+try:
+    from shieldcli.codec import encode_body
+except ImportError:
+    encode_body = None
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "CONFIG.json")
+FIELDS = ["ip", "mac", "hostname", "device_type", "os"]
+ENGINES = {1: "nmap", 2: "scapy", "nmap": "nmap", "scapy": "scapy"}
+DEFAULT_SHARD_PREFIX = 24
+DEFAULT_NMAP_ARGUMENTS = "-sS -O -p 22,80,443 --osscan-guess"
+
+def load_config(path=CONFIG_FILE):
+    # CONFIG.json contient des commentaires "//" en fin de ligne : retirés avant le décodage
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    return json.loads(re.sub(r"(^|\s)//.*$", "", text, flags=re.M))
+
+def shard_network(cidr, shard_prefix=DEFAULT_SHARD_PREFIX):
+    """
+    Découpe la plage en sous-réseaux de shard_prefix bits (la plage elle-même si elle est plus petite).
+    """
+    network = ipaddress.ip_network(cidr, strict=False)
+    if network.prefixlen >= shard_prefix:
+        return [network]
+    return list(network.subnets(new_prefix=shard_prefix))
+
+def resolve_hostname(ip):
+    try:
+        return socket.gethostbyaddr(ip)[0]
+    except (socket.herror, socket.gaierror, OSError):
+        return ''
+
+# Scanners : une tranche -> liste d'hôtes actifs (dictionnaires FIELDS)
+def scan_shard_nmap(network, options):
+    import nmap  # pip install python-nmap
+    try:
+        from shieldcli.Discovery.Discovery_tool_nmap import host_record
+    except ImportError:
+        from Discovery_tool_nmap import host_record
+    nm = nmap.PortScanner()
+    nm.scan(hosts=str(network), arguments=options.get("arguments", DEFAULT_NMAP_ARGUMENTS))
+    return [host_record(nm, host) for host in nm.all_hosts() if nm[host].state() == 'up']
+
+def scan_shard_scapy(network, options):
+    # Requêtes ARP en diffusion : uniquement sur le segment de niveau 2 de l'interface
+    from scapy.all import ARP, Ether, srp
+    answered, _ = srp(Ether(dst="ff:ff:ff:ff:ff:ff") / ARP(pdst=str(network)),
+                      timeout=options.get("timeout", 2), verbose=options.get("verbose", 0),
+                      iface=options.get("iface"))
+    hosts = []
+    for _, reply in answered:
+        hosts.append({
+            'ip': reply.psrc,
+            'mac': reply.hwsrc,
+            'hostname': resolve_hostname(reply.psrc) if options.get("resolve_names", True) else '',
+            'device_type': lookup_vendor(reply.hwsrc),
+            'os': 'Inconnu',
+        })
+    return hosts
+
+SCANNERS = {"nmap": scan_shard_nmap, "scapy": scan_shard_scapy}
+
+def discover(cidr, engine="nmap", workers=8, shard_prefix=DEFAULT_SHARD_PREFIX, options=None):
+    """
+    Générateur des hôtes actifs de la plage, dans l'ordre de fin d'analyse des tranches.
+    Une tranche en erreur est signalée et ignorée ; les autres continuent.
+    """
+    scan = SCANNERS[ENGINES[engine]]
+    options = options or {}
+    shards = shard_network(cidr, shard_prefix)
+    done = 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards)))) as pool:
+        futures = {pool.submit(scan, shard, options): shard for shard in shards}
+        for future in as_completed(futures):
+            done += 1
+            try:
+                hosts = future.result()
+            except Exception as e:
+                print(f"Erreur lors du scan de {futures[future]}: {e}")
+                continue
+            for host in hosts:
+                yield host
+            if len(shards) > 1:
+                print(f"{done}/{len(shards)} tranche(s) analysée(s) ({futures[future]} : {len(hosts)} hôte(s))")
+
+class CsvSink:
+    """
+    Écriture incrémentale : chaque hôte est écrit (et le fichier vidé sur disque) dès sa découverte.
+    """
+
+    def __init__(self, filename):
+        self.file = open(filename, 'w', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=FIELDS, extrasaction='ignore')
+        self.writer.writeheader()
+        self.count = 0
+
+    def write(self, host):
+        self.writer.writerow(host)
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        self.file.close()
+
+class ApiSink:
+    """
+    Envoi par lots à l'API d'inventaire (POST {"network", "scanned_at", "hosts": [...]}).
+    Un lot refusé ou une API injoignable est signalé sans interrompre le scan (le CSV reste complet).
+    """
+
+    def __init__(self, url, login_url, agent_id, network, batch_size=500):
+        self.url = url
+        self.login_url = login_url
+        self.agent_id = agent_id
+        self.network = network
+        self.batch_size = batch_size
+        self.session = requests.Session()
+        self.scanned_at = datetime.now(timezone.utc).isoformat()
+        self.batch = []
+        self.sent = 0
+        self.failed = 0
+
+    def login(self):
+        r = self.session.post(self.login_url, json={"agent_id": self.agent_id}, timeout=10)
+        r.raise_for_status()
+        self.session.headers["Authorization"] = f"Bearer {r.json()['access_token']}"
+
+    def post(self, payload):
+        if encode_body:
+            body, headers = encode_body(payload)
+            return self.session.post(self.url, data=body, headers=headers, timeout=60)
+        return self.session.post(self.url, json=payload, timeout=60)
+
+    def write(self, host):
+        self.batch.append(host)
+        if len(self.batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        payload = {"network": self.network, "scanned_at": self.scanned_at, "hosts": self.batch}
+        try:
+            if "Authorization" not in self.session.headers:
+                self.login()
+            r = self.post(payload)
+            if r.status_code in (401, 403):
+                self.login()
+                r = self.post(payload)
+            r.raise_for_status()
+            self.sent += len(self.batch)
+        except Exception as e:
+            print(f"Erreur envoi de {len(self.batch)} hôte(s) à l'API: {e}")
+            self.failed += len(self.batch)
+        self.batch = []
+
+    def close(self):
+        self.flush()
+        self.session.close()
+
+def run_discovery(cidr, engine, workers, shard_prefix, options, output, api=None):
+    """
+    Lance la découverte et alimente les sorties (CSV, API) au fil de l'eau. Retourne le nombre d'hôtes.
+    """
+    sinks = [CsvSink(output)]
+    if api:
+        sinks.append(ApiSink(api["url"], api["login_url"], api.get("agent_id") or f"discovery-{socket.gethostname()}",
+                             cidr, api.get("batch_size", 500)))
+    start = time.perf_counter()
+    try:
+        for host in discover(cidr, engine, workers, shard_prefix, options):
+            for sink in sinks:
+                sink.write(host)
+    finally:
+        for sink in sinks:
+            sink.close()
+    elapsed = time.perf_counter() - start
+    print(f"{sinks[0].count} hôte(s) actif(s) sur {cidr} en {elapsed:.1f} s, enregistrés dans '{output}'")
+    if api:
+        print(f"{sinks[1].sent} hôte(s) envoyé(s) à l'API" + (f", {sinks[1].failed} en échec" if sinks[1].failed else ""))
+    return sinks[0].count
+
+if __name__ == "__main__":
+    config = load_config()
+    parser = argparse.ArgumentParser(description="Découverte concurrente d'un sous-réseau")
+    parser.add_argument("--range", default=config.get("ip_range"), help="plage CIDR (ex. 10.20.0.0/16)")
+    parser.add_argument("--engine", choices=["nmap", "scapy"], default=ENGINES[config.get("engine", 1)])
+    parser.add_argument("--workers", type=int, default=config.get("workers", 8))
+    parser.add_argument("--shard-prefix", type=int, default=config.get("shard_prefix", DEFAULT_SHARD_PREFIX))
+    parser.add_argument("--output", default=config.get("output", "subnet_assets.csv"))
+    parser.add_argument("--api", action="store_true", default=config.get("api", {}).get("enabled", False),
+                        help="envoie aussi les hôtes à l'API d'inventaire")
+    args = parser.parse_args()
+    run_discovery(args.range, args.engine, args.workers, args.shard_prefix, config.get(args.engine, {}),
+                  args.output, config.get("api") if args.api else None)
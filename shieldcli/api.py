@@ -1,92 +1,1199 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import threading
+import time
 from datetime import datetime, timedelta, timezone
-from fastapi import FastAPI, Depends, HTTPException, Body
+from fastapi import FastAPI, Depends, HTTPException, Body, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 import json
 import jwt
 from jwt import PyJWTError
 import os
 from pydantic import BaseModel
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime
-from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Dict, Any
+from sqlalchemy import (create_engine, event, inspect, text, and_, or_, func, select, insert, update, bindparam, tuple_,
+                        Column, Integer, String, Text, DateTime, Index, MetaData, Table, UniqueConstraint)
+from sqlalchemy.orm import sessionmaker, declarative_base, load_only
+from typing import Dict, Any, List, Optional
 import uvicorn
 
-app = FastAPI()
+from shieldcli import codec, metrics
+from shieldcli.auth import AgentRateCounters, TokenCache
+from shieldcli.ingest import WriteQueue
+from shieldcli.integrity.merkle import FILE, diff_children
+from shieldcli.inventory import diff_assets, normalize_host, normalize_mac
+from shieldcli.report_delta import alert_key, apply_delta, compute_delta
+from shieldcli.retention import (AUTO_VACUUM_INCREMENTAL, PeriodicJob, auto_vacuum_mode, delete_ids, delete_where,
+                                 enable_incremental_vacuum, incremental_vacuum)
+
+# Réponses JSON sérialisées par codec.dumps (orjson lorsqu'il est installé)
+class FastJSONResponse(JSONResponse):
+    def render(self, content):
+        return codec.dumps(content)
+
+app = FastAPI(default_response_class=FastJSONResponse)
 security = HTTPBearer()
 JWT_SECRET = os.getenv("JWT_SECRET_KEY")
+JWT_MIN_SECRET_LENGTH = 32  # octets, recommandé pour HS256 (RFC 7518)
+ACCESS_TOKEN_MINUTES = 30
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+
+# Tokens déjà vérifiés (JWT_CACHE_SIZE=0 : vérification complète à chaque requête)
+token_cache = TokenCache(int(os.getenv("JWT_CACHE_SIZE", "10000")))
+rate_counters = AgentRateCounters()
+metrics.gauge("shieldcli_token_cache_entries", "Tokens vérifiés en cache", lambda: len(token_cache))
+metrics.counter("shieldcli_token_cache_hits_total", "Vérifications servies par le cache", lambda: token_cache.hits)
+metrics.counter("shieldcli_token_cache_misses_total", "Vérifications complètes (décodage + HMAC)",
+                lambda: token_cache.misses)
+
+# Export /metrics (format texte Prometheus) : protégé par un token statique si METRICS_TOKEN est défini,
+# sinon réservé aux requêtes locales (nombre d'agents et débits d'ingestion non exposés au réseau)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+# Taille maximale d'un corps de requête une fois décompressé
+MAX_REQUEST_BODY = int(os.getenv("MAX_REQUEST_BODY", str(64 * 1024 * 1024)))
+
+# Décompression des corps de requête (Content-Encoding: gzip / zstd) avant les routes
+class DecompressRequestMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = dict(scope["headers"])
+        encoding = headers.get(b"content-encoding", b"").decode("latin-1").strip().lower()
+        if encoding in ("", "identity"):
+            return await self.app(scope, receive, send)
+        if encoding not in codec.ENCODINGS:
+            response = JSONResponse({"detail": f"Unsupported Content-Encoding: {encoding}"}, status_code=415)
+            return await response(scope, receive, send)
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        try:
+            # Décompression hors de la boucle d'événements (lots volumineux)
+            body = await asyncio.to_thread(codec.decompress, b"".join(chunks), encoding, MAX_REQUEST_BODY)
+        except ValueError as e:
+            response = JSONResponse({"detail": f"Invalid {encoding} body: {e}"}, status_code=400)
+            return await response(scope, receive, send)
+        scope = dict(scope, headers=[(k, v) for k, v in scope["headers"]
+                                     if k not in (b"content-encoding", b"content-length")]
+                     + [(b"content-length", str(len(body)).encode())])
+        delivered = False
+
+        async def receive_body():
+            nonlocal delivered
+            if delivered:
+                return await receive()
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, receive_body, send)
+
+HTTP_REQUESTS = metrics.counter("shieldcli_http_requests_total", "Requêtes HTTP par route et code de statut")
+HTTP_SECONDS = metrics.histogram("shieldcli_http_request_seconds", "Durée de traitement des requêtes HTTP")
+
+# Durée et nombre de requêtes par modèle de route (/state/{agent_id}, pas l'URL effective)
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            # Le routeur complète le scope avec la route trouvée
+            route = scope.get("route")
+            path = route.path if route is not None else "unmatched"
+            HTTP_REQUESTS.inc(method=scope["method"], route=path, status=str(status))
+            HTTP_SECONDS.observe(time.perf_counter() - start, method=scope["method"], route=path)
+
+# Ajouté avant la décompression : il reçoit le scope réécrit, que le routeur complète ensuite
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(DecompressRequestMiddleware)
+# Compression des réponses (dashboard, recherches) si le client accepte gzip
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=6)
 
 # Base SQLAlchemy
 Base = declarative_base()
 
 class ReportDB(Base):
     __tablename__ = "reports"
+    # Index composite pour la pagination du dashboard par agent et par date
+    __table_args__ = (Index("ix_reports_agent_timestamp", "agent_id", "timestamp"),)
     id = Column(Integer, primary_key=True)
     agent_id = Column(String, index=True)
     timestamp = Column(DateTime)
     audit = Column(Text)  # stocké en JSON string
     integrity_alerts = Column(Text)  # stocké en JSON string
+    seq = Column(Integer)
+    is_delta = Column(Integer, default=0)  # 1 : audit/alertes ne contiennent que les changements
+    resolved_alerts = Column(Text)  # stocké en JSON string (rapports différentiels)
+    # Point de reprise du rejeu : état complet après ce rapport, enregistré tous les REPORT_SNAPSHOT_EVERY deltas
+    snapshot_audit = Column(Text)
+    snapshot_alerts = Column(Text)
+
+# Dernier état complet reconstruit pour chaque agent (base des rapports différentiels)
+class AgentStateDB(Base):
+    __tablename__ = "agent_states"
+    agent_id = Column(String, primary_key=True)
+    seq = Column(Integer)
+    last_seen = Column(DateTime)
+    audit = Column(Text)  # stocké en JSON string
+    integrity_alerts = Column(Text)  # stocké en JSON string
+    deltas_since_snapshot = Column(Integer, default=0)  # rapports différentiels depuis le dernier point de reprise
+
+# Tables normalisées alimentées à l'ingestion : un résultat de contrôle par changement d'état
+# (ou par contrôle pour un rapport complet), et une ligne par alerte avec sa date de résolution
+class CheckResultDB(Base):
+    __tablename__ = "check_results"
+    __table_args__ = (
+        Index("ix_check_results_check_timestamp", "check_id", "timestamp"),
+        Index("ix_check_results_agent_check_timestamp", "agent_id", "check_id", "timestamp"),
+    )
+    id = Column(Integer, primary_key=True)
+    agent_id = Column(String)
+    check_id = Column(String)
+    timestamp = Column(DateTime)
+    passed = Column(Integer)  # 1 / 0, NULL si le résultat n'est pas booléen
+    value = Column(Text)  # résultat brut en JSON string
 
-DATABASE_URL = "sqlite:///./reports.db"
+class AlertDB(Base):
+    __tablename__ = "alerts"
+    __table_args__ = (
+        Index("ix_alerts_file_timestamp", "file", "timestamp"),
+        Index("ix_alerts_type_timestamp", "type", "timestamp"),
+        Index("ix_alerts_agent_key", "agent_id", "alert_key"),
+        Index("ix_alerts_resolved_at", "resolved_at"),
+    )
+    id = Column(Integer, primary_key=True)
+    agent_id = Column(String)
+    alert_key = Column(String)  # identifiant stable de l'alerte (voir report_delta.alert_key)
+    type = Column(String)
+    file = Column(String)
+    msg = Column(Text)
+    timestamp = Column(DateTime)  # première apparition
+    resolved_at = Column(DateTime)
+
+# Dernier arbre de Merkle connu par agent : un noeud (digest + enfants) par chemin
+class MerkleNodeDB(Base):
+    __tablename__ = "merkle_nodes"
+    __table_args__ = (UniqueConstraint("agent_id", "path"),)
+    id = Column(Integer, primary_key=True)
+    agent_id = Column(String, index=True)
+    path = Column(String)
+    kind = Column(String)
+    digest = Column(String)
+    children = Column(Text)  # stocké en JSON string {nom: [type, digest]}
+
+# Inventaire des actifs découverts : une ligne par hôte (MAC, ou IP sans MAC), mise à jour à chaque scan
+class AssetDB(Base):
+    __tablename__ = "assets"
+    __table_args__ = (
+        Index("ix_assets_mac", "mac", unique=True),
+        Index("ix_assets_ip", "ip"),
+        Index("ix_assets_last_seen", "last_seen"),
+    )
+    id = Column(Integer, primary_key=True)
+    mac = Column(String)
+    ip = Column(String)
+    hostname = Column(String)
+    device_type = Column(String)
+    os = Column(String)
+    network = Column(String)
+    agent_id = Column(String)  # dernier scanner ayant vu l'hôte
+    first_seen = Column(DateTime)
+    last_seen = Column(DateTime)
+
+# Changements de l'inventaire : new, ip_changed, mac_changed, os_changed
+class AssetEventDB(Base):
+    __tablename__ = "asset_events"
+    __table_args__ = (
+        Index("ix_asset_events_timestamp", "timestamp"),
+        Index("ix_asset_events_mac_timestamp", "mac", "timestamp"),
+        Index("ix_asset_events_ip_timestamp", "ip", "timestamp"),
+    )
+    id = Column(Integer, primary_key=True)
+    timestamp = Column(DateTime)
+    agent_id = Column(String)
+    network = Column(String)
+    ip = Column(String)
+    mac = Column(String)
+    change = Column(String)
+    old_value = Column(String)
+    new_value = Column(String)
+
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./reports.db")
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine)
+
+# SQLite : WAL (lectures concurrentes des écritures), fsync allégé et cache plus grand
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    # Pris en compte à la création de la base ; une base existante se convertit avec AUTO_VACUUM_CONVERT=1
+    cursor.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA cache_size=-65536")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 Base.metadata.create_all(bind=engine)
 
+# Ajoute aux tables existantes les colonnes et index apparus depuis leur création (bases reports.db antérieures)
+def migrate_schema():
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"))
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+migrate_schema()
+
+# Événements de logs : une table par mois (log_events_AAAAMM), en ajout seul avec un unique index
+# sur la date ; une période ne lit que ses partitions et une partition expirée se supprime d'un bloc.
+LOG_EVENTS_PREFIX = "log_events_"
+events_metadata = MetaData()
+event_partitions = {}
+event_partitions_lock = threading.Lock()
+
+def event_partition(month):
+    with event_partitions_lock:
+        table = event_partitions.get(month)
+        if table is None:
+            name = LOG_EVENTS_PREFIX + month
+            table = Table(
+                name, events_metadata,
+                Column("id", Integer, primary_key=True),
+                Column("agent_id", String),
+                Column("timestamp", DateTime),
+                Column("host", String),
+                Column("source", String),
+                Column("severity", String),
+                Column("message", Text),
+                Column("rule", String),
+                Index(f"ix_{name}_timestamp", "timestamp"),
+            )
+            table.create(engine, checkfirst=True)
+            event_partitions[month] = table
+        return table
+
+def event_months(since=None, until=None):
+    """
+    Partitions existantes couvrant la période, de la plus récente à la plus ancienne.
+    """
+    months = [name[len(LOG_EVENTS_PREFIX):] for name in inspect(engine).get_table_names()
+              if name.startswith(LOG_EVENTS_PREFIX)]
+    return sorted((m for m in months
+                   if (not since or m >= since.strftime("%Y%m")) and (not until or m <= until.strftime("%Y%m"))),
+                  reverse=True)
+
 # Modèle de données
+class LogEvent(BaseModel):
+    timestamp: str
+    host: Optional[str] = None
+    source: str
+    severity: str
+    message: str
+    rule: Optional[str] = None
+
+class AssetHost(BaseModel):
+    ip: Optional[str] = None
+    mac: Optional[str] = None
+    hostname: Optional[str] = None
+    device_type: Optional[str] = None
+    os: Optional[str] = None
+
+class AssetScan(BaseModel):
+    network: Optional[str] = None
+    scanned_at: Optional[str] = None
+    hosts: List[AssetHost]
+
 class Report(BaseModel):
     timestamp: str
     audit: Dict[str, Any]
     integrity_alerts: Any
+    # Rapports différentiels : seq du rapport, base_seq du dernier rapport acquitté (None = rapport complet)
+    seq: Optional[int] = None
+    base_seq: Optional[int] = None
+    resolved_alerts: Optional[List[Any]] = None
+
+# Le secret est vérifié au démarrage plutôt qu'à la première requête
+@app.on_event("startup")
+def validate_jwt_secret():
+    if not JWT_SECRET:
+        raise RuntimeError("JWT_SECRET_KEY is not set")
+    if len(JWT_SECRET.encode()) < JWT_MIN_SECRET_LENGTH:
+        print(f"Attention : JWT_SECRET_KEY fait moins de {JWT_MIN_SECRET_LENGTH} octets")
+
+def issue_token(agent_id, token_type, lifetime):
+    payload = {
+        "sub": agent_id,
+        "type": token_type,
+        "exp": datetime.now(timezone.utc) + lifetime
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
 
 @app.post("/login")
 def login(data: Dict[str, str] = Body(...)):
     agent_id = data.get("agent_id")
     if not agent_id:
         raise HTTPException(status_code=400, detail="agent_id required")
-    payload = {
-        "sub": agent_id,
-        "exp": datetime.now(timezone.utc) + timedelta(minutes=30)
+    return {
+        "access_token": issue_token(agent_id, "access", timedelta(minutes=ACCESS_TOKEN_MINUTES)),
+        "refresh_token": issue_token(agent_id, "refresh", timedelta(days=REFRESH_TOKEN_DAYS)),
     }
-    token = jwt.encode(payload, JWT_SECRET, algorithm="HS256")
-    return {"access_token": token}
 
-# Auth
-def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    token = credentials.credentials
+# Nouveau token d'accès à partir d'un refresh token, sans nouveau login de l'agent
+@app.post("/token/refresh")
+def refresh_token(data: Dict[str, str] = Body(...)):
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        return payload["sub"]
+        payload = jwt.decode(data.get("refresh_token", ""), JWT_SECRET, algorithms=["HS256"])
     except PyJWTError:
-        raise HTTPException(status_code=403, detail="Invalid token or expired")
+        raise HTTPException(status_code=403, detail="Invalid refresh token or expired")
+    if payload.get("type") != "refresh":
+        raise HTTPException(status_code=403, detail="Invalid refresh token or expired")
+    return {"access_token": issue_token(payload["sub"], "access", timedelta(minutes=ACCESS_TOKEN_MINUTES))}
 
-@app.post("/report")
-def receive_report(report: Report, agent_id: str = Depends(verify_token)):
-    db = SessionLocal()
-    report_db = ReportDB(
+# Auth : un token déjà vérifié est retrouvé dans le cache jusqu'à son expiration
+def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    token = credentials.credentials
+    agent_id = token_cache.get(token)
+    if agent_id is None:
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
+        except PyJWTError:
+            raise HTTPException(status_code=403, detail="Invalid token or expired")
+        # Un refresh token ne donne pas accès aux routes (tokens antérieurs sans "type" acceptés)
+        if payload.get("type", "access") != "access":
+            raise HTTPException(status_code=403, detail="Invalid token or expired")
+        agent_id = payload["sub"]
+        token_cache.put(token, agent_id, payload["exp"])
+    rate_counters.hit(agent_id)
+    return agent_id
+
+# Compteurs de requêtes par agent (supervision)
+@app.get("/stats/agents")
+def agent_stats(token_sub: str = Depends(verify_token)):
+    return {
+        "token_cache": {"size": len(token_cache), "hits": token_cache.hits, "misses": token_cache.misses},
+        "agents": rate_counters.snapshot(),
+    }
+
+@app.get("/metrics")
+def metrics_export(request: Request):
+    if METRICS_TOKEN:
+        provided = request.headers.get("authorization", "").encode("latin-1")
+        if not hmac.compare_digest(provided, f"Bearer {METRICS_TOKEN}".encode()):
+            raise HTTPException(status_code=403, detail="Invalid metrics token")
+    elif request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Metrics are only served locally unless METRICS_TOKEN is set")
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# Un rapport différentiel sur REPORT_SNAPSHOT_EVERY porte aussi l'état complet (borne le rejeu du dashboard)
+REPORT_SNAPSHOT_EVERY = max(1, int(os.getenv("REPORT_SNAPSHOT_EVERY", "50")))
+
+# Alertes d'un état stocké en JSON : une valeur "null" (ou autre qu'une liste) est lue comme une liste vide
+def load_alerts(value):
+    alerts = json.loads(value) if value else None
+    return alerts if isinstance(alerts, list) else []
+
+# Applique un rapport (complet ou différentiel) dans la session, sans commit
+def ingest_report(db, agent_id, report):
+    timestamp = datetime.fromisoformat(report.timestamp)
+    # integrity_alerts n'est pas typé dans le modèle : une valeur autre qu'une liste est enregistrée comme []
+    new_alerts = report.integrity_alerts if isinstance(report.integrity_alerts, list) else []
+    state = db.get(AgentStateDB, agent_id)
+    is_delta = report.base_seq is not None
+    if is_delta:
+        # Le delta doit s'appliquer sur le dernier état connu, sinon l'agent renvoie un rapport complet
+        if state is None or state.seq != report.base_seq:
+            raise HTTPException(status_code=409, detail={
+                "resync": True, "expected_base_seq": state.seq if state else None})
+        base_audit = json.loads(state.audit) if state.audit else {}
+        audit, alerts = apply_delta(base_audit, load_alerts(state.integrity_alerts),
+                                    report.audit, new_alerts, report.resolved_alerts or [])
+    else:
+        audit, alerts = report.audit, new_alerts
+    if state is None:
+        state = AgentStateDB(agent_id=agent_id)
+        db.add(state)
+        prev_audit, prev_alerts = {}, []
+    else:
+        prev_audit = json.loads(state.audit) if state.audit else {}
+        prev_alerts = load_alerts(state.integrity_alerts)
+    normalize_report(db, agent_id, timestamp, prev_audit, prev_alerts, audit, alerts, full=not is_delta)
+    state.seq = report.seq if report.seq is not None else state.seq
+    state.last_seen = timestamp
+    state.audit = json.dumps(audit)
+    state.integrity_alerts = json.dumps(alerts)
+    result = {"message": f"Report received for agent {agent_id}", "seq": report.seq}
+    # Un delta vide ne crée pas de ligne : seul l'état (seq, last_seen) est mis à jour
+    if is_delta and not (report.audit or new_alerts or report.resolved_alerts):
+        return result
+    row = ReportDB(
         agent_id=agent_id,
-        timestamp=datetime.fromisoformat(report.timestamp),
+        timestamp=timestamp,
         audit=json.dumps(report.audit),
-        integrity_alerts=json.dumps(report.integrity_alerts),
+        integrity_alerts=json.dumps(new_alerts),
+        seq=report.seq,
+        is_delta=int(is_delta),
+        resolved_alerts=json.dumps(report.resolved_alerts or []) if is_delta else None,
     )
-    db.add(report_db)
-    db.commit()
-    db.close()
-    return {"message": f"Report received for agent {agent_id}"}
+    # L'agent n'envoie de rapport complet qu'à l'enrôlement ou après un 409 : sans point de reprise,
+    # le dashboard rejouerait tout l'historique de l'agent à chaque page
+    deltas = (state.deltas_since_snapshot or 0) + 1 if is_delta else 0
+    if deltas >= REPORT_SNAPSHOT_EVERY:
+        row.snapshot_audit = state.audit
+        row.snapshot_alerts = state.integrity_alerts
+        deltas = 0
+    state.deltas_since_snapshot = deltas
+    db.add(row)
+    return result
+
+def alert_hash(alert):
+    return hashlib.sha256(alert_key(alert).encode()).hexdigest()[:32]
+
+# Alimente check_results / alerts à partir de la transition entre l'état précédent et le nouvel état
+def normalize_report(db, agent_id, timestamp, prev_audit, prev_alerts, audit, alerts, full):
+    prev_alerts = prev_alerts if isinstance(prev_alerts, list) else []
+    alerts = alerts if isinstance(alerts, list) else []
+    changed, new_alerts, resolved = compute_delta(prev_audit, prev_alerts, audit, alerts)
+    # Un rapport complet enregistre tous les contrôles, un delta seulement ceux qui ont changé
+    for check_id, value in (audit.items() if full else changed.items()):
+        if value is None:
+            continue
+        db.add(CheckResultDB(agent_id=agent_id, check_id=check_id, timestamp=timestamp,
+                             passed=int(value) if isinstance(value, bool) else None, value=json.dumps(value)))
+    for alert in new_alerts:
+        if not isinstance(alert, dict):
+            continue
+        db.add(AlertDB(agent_id=agent_id, alert_key=alert_hash(alert), type=alert.get("type"),
+                       file=alert.get("file"), msg=alert.get("msg"), timestamp=timestamp))
+    if resolved:
+        db.query(AlertDB).filter(
+            AlertDB.agent_id == agent_id, AlertDB.resolved_at.is_(None),
+            AlertDB.alert_key.in_([alert_hash(a) for a in resolved if isinstance(a, dict)])
+        ).update({AlertDB.resolved_at: timestamp}, synchronize_session=False)
+
+INGEST_SECONDS = metrics.histogram("shieldcli_ingest_seconds", "Latence d'ingestion d'une requête de rapports (file + écriture)")
+REPORTS_INGESTED = metrics.counter("shieldcli_reports_ingested_total", "Rapports ingérés par code de statut")
+WRITE_BATCH_SIZE = metrics.histogram("shieldcli_write_batch_size", "Éléments écrits par transaction",
+                                     (1, 5, 10, 50, 100, 500, 1000, 5000))
+DB_COMMIT_SECONDS = metrics.histogram("shieldcli_db_commit_seconds", "Durée des commits SQLite")
+LOG_EVENTS_INGESTED = metrics.counter("shieldcli_log_events_ingested_total", "Événements de logs ingérés")
+
+# Écrit un lot de rapports [(agent_id, report)] en une seule transaction ; chaque rapport est appliqué
+# dans un point de sauvegarde : un rapport en échec est annulé seul, les autres rapports du lot sont validés
+def write_reports(items):
+    db = SessionLocal()
+    results = []
+    try:
+        if engine.dialect.name == "sqlite":
+            # pysqlite n'ouvre la transaction qu'à la première écriture : sans BEGIN explicite, le premier
+            # point de sauvegarde ouvrirait la transaction et sa libération la validerait aussitôt
+            db.connection().exec_driver_sql("BEGIN")
+        for agent_id, report in items:
+            try:
+                with db.begin_nested():
+                    results.append(ingest_report(db, agent_id, report))
+            except (HTTPException, ValueError) as e:
+                results.append(e)
+            except Exception as e:
+                print(f"Erreur lors de l'ingestion d'un rapport de {agent_id}: {e!r}")
+                results.append(e)
+        WRITE_BATCH_SIZE.observe(len(items), table="reports")
+        with DB_COMMIT_SECONDS.time(table="reports"):
+            db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    return results
+
+# Toute l'ingestion passe par la file d'écriture (INGEST_BATCH_SIZE=0 : écriture directe par requête)
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "0.05"))
+ingest_queue = WriteQueue(write_reports, max_batch=max(1, INGEST_BATCH_SIZE), flush_interval=INGEST_FLUSH_INTERVAL)
+metrics.gauge("shieldcli_ingest_queue_depth", "Rapports en attente dans la file d'écriture", ingest_queue.qsize)
+
+@app.on_event("shutdown")
+def flush_ingest_queue():
+    ingest_queue.stop()
+
+async def submit_reports(agent_id, reports):
+    with INGEST_SECONDS.time():
+        if INGEST_BATCH_SIZE == 0:
+            results = await asyncio.to_thread(write_reports, [(agent_id, report) for report in reports])
+        else:
+            futures = [ingest_queue.submit((agent_id, report)) for report in reports]
+            results = []
+            for future in futures:
+                try:
+                    results.append(await asyncio.wrap_future(future))
+                except Exception as e:
+                    results.append(e)
+    for result in results:
+        REPORTS_INGESTED.inc(status=str(report_status(result)))
+    return results
+
+def report_status(result):
+    if isinstance(result, HTTPException):
+        return result.status_code
+    if isinstance(result, ValueError):
+        return 400
+    return 500 if isinstance(result, Exception) else 200
+
+@app.post("/report")
+async def receive_report(report: Report, agent_id: str = Depends(verify_token)):
+    result = (await submit_reports(agent_id, [report]))[0]
+    if isinstance(result, HTTPException):
+        raise result
+    if isinstance(result, ValueError):
+        raise HTTPException(status_code=400, detail=str(result))
+    if isinstance(result, Exception):
+        raise HTTPException(status_code=500, detail="Report ingestion failed")
+    return result
+
+# Ingestion groupée : plusieurs rapports (ex: file locale de l'agent) en une requête, traités dans l'ordre
+@app.post("/reports/batch")
+async def receive_reports_batch(reports: List[Report], agent_id: str = Depends(verify_token)):
+    results = []
+    for result in await submit_reports(agent_id, reports):
+        if isinstance(result, HTTPException):
+            results.append({"status": result.status_code, "detail": result.detail})
+        elif isinstance(result, ValueError):
+            results.append({"status": 400, "detail": str(result)})
+        elif isinstance(result, Exception):
+            results.append({"status": 500, "detail": "Report ingestion failed"})
+        else:
+            results.append({"status": 200, **result})
+    return {"results": results}
+
+# Comparaison Merkle : l'agent envoie d'abord ses racines, puis le détail des seuls dossiers demandés
+@app.post("/integrity/merkle")
+def merkle_sync(data: Dict[str, Any] = Body(...), agent_id: str = Depends(verify_token)):
+    nodes = data.get("nodes", {})
+    db = SessionLocal()
+    to_visit = []
+    changes = []
+    try:
+        for path, node in nodes.items():
+            stored = db.query(MerkleNodeDB).filter(
+                MerkleNodeDB.agent_id == agent_id, MerkleNodeDB.path == path).first()
+            if "children" not in node:
+                # Racine : comparaison O(1) du digest
+                if stored and stored.kind == node.get("kind") and stored.digest == node.get("digest"):
+                    continue
+                if node.get("kind") == FILE:
+                    changes.append({"file": path, "change": "modified" if stored else "added"})
+                    stored = stored or MerkleNodeDB(agent_id=agent_id, path=path)
+                    stored.kind, stored.digest, stored.children = FILE, node.get("digest"), None
+                    db.add(stored)
+                else:
+                    to_visit.append(path)
+                continue
+            previous = json.loads(stored.children) if stored and stored.children else {}
+            visit, diff = diff_children(path, previous, node["children"])
+            to_visit.extend(visit)
+            changes.extend(diff)
+            # Les sous-dossiers disparus sont retirés de l'arbre stocké
+            for change in diff:
+                if change["change"] == "removed_dir":
+                    db.query(MerkleNodeDB).filter(
+                        MerkleNodeDB.agent_id == agent_id,
+                        (MerkleNodeDB.path == change["file"]) | MerkleNodeDB.path.startswith(change["file"] + "/", autoescape=True)
+                        | MerkleNodeDB.path.startswith(change["file"] + "\\", autoescape=True)
+                    ).delete(synchronize_session=False)
+            stored = stored or MerkleNodeDB(agent_id=agent_id, path=path)
+            stored.kind, stored.digest = node.get("kind"), node.get("digest")
+            stored.children = json.dumps(node["children"])
+            db.add(stored)
+        db.commit()
+    finally:
+        db.close()
+    return {"request": to_visit, "changes": changes}
+
+# Écrit un lot d'événements en une transaction (insertion groupée par partition)
+def write_log_events(agent_id, events):
+    rows = {}
+    for e in events:
+        timestamp = datetime.fromisoformat(e.timestamp)
+        rows.setdefault(timestamp.strftime("%Y%m"), []).append({
+            "agent_id": agent_id, "timestamp": timestamp, "host": e.host, "source": e.source,
+            "severity": e.severity, "message": e.message, "rule": e.rule})
+    with engine.connect() as conn:
+        for month, month_rows in rows.items():
+            conn.execute(event_partition(month).insert(), month_rows)
+        WRITE_BATCH_SIZE.observe(len(events), table="log_events")
+        with DB_COMMIT_SECONDS.time(table="log_events"):
+            conn.commit()
+    LOG_EVENTS_INGESTED.inc(len(events))
+    return len(events)
+
+# Réception d'un lot d'événements de logs (corps JSON, éventuellement compressé)
+@app.post("/logs/events")
+async def receive_log_events(request: Request, agent_id: str = Depends(verify_token)):
+    # Corps déjà décompressé par DecompressRequestMiddleware
+    body = await request.body()
+    try:
+        events = [LogEvent(**e) for e in codec.loads(body)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid log events")
+    try:
+        count = await asyncio.to_thread(write_log_events, agent_id, events)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"received": count}
+
+# Recherche d'événements de logs (du plus récent au plus ancien), partition par partition
+@app.get("/logs/events")
+def search_log_events(agent_id: Optional[str] = None, host: Optional[str] = None, source: Optional[str] = None,
+                      severity: Optional[str] = None, rule: Optional[str] = None, q: Optional[str] = None,
+                      since: Optional[str] = None, until: Optional[str] = None,
+                      limit: int = Query(100, ge=1, le=1000), token_sub: str = Depends(verify_token)):
+    since_dt, until_dt = parse_date(since, "since"), parse_date(until, "until")
+    events = []
+    with engine.connect() as conn:
+        for month in event_months(since_dt, until_dt):
+            table = event_partition(month)
+            query = select(table)
+            for column, value in (("agent_id", agent_id), ("host", host), ("source", source),
+                                  ("severity", severity), ("rule", rule)):
+                if value:
+                    query = query.where(table.c[column] == value)
+            if q:
+                query = query.where(table.c.message.contains(q, autoescape=True))
+            if since_dt:
+                query = query.where(table.c.timestamp >= since_dt)
+            if until_dt:
+                query = query.where(table.c.timestamp <= until_dt)
+            query = query.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit - len(events))
+            for row in conn.execute(query):
+                events.append({
+                    "agent_id": row.agent_id,
+                    "timestamp": row.timestamp.isoformat(),
+                    "host": row.host,
+                    "source": row.source,
+                    "severity": row.severity,
+                    "message": row.message,
+                    "rule": row.rule,
+                })
+            if len(events) >= limit:
+                break
+    return events
+
+ASSET_COLUMNS = ("mac", "ip", "hostname", "device_type", "os", "network", "agent_id", "last_seen")
+# Taille des listes IN (...) pour relire les actifs existants (limite de variables SQLite)
+ASSET_LOOKUP_CHUNK = 500
+# Les soumissions sont appliquées l'une après l'autre (comparaison puis écriture sans conflit d'unicité)
+assets_lock = threading.Lock()
+ASSET_EVENTS = metrics.counter("shieldcli_asset_events_total", "Changements de l'inventaire des actifs par type")
+
+def load_assets(conn, hosts):
+    """
+    Actifs existants concernés par la soumission, lus par lots : ({mac: ligne}, {ip: ligne la plus récente}).
+    """
+    table = AssetDB.__table__
+    rows = {}
+    by_mac, by_ip = {}, {}
+    for column, values in ((table.c.mac, sorted({h["mac"] for h in hosts if h["mac"]})),
+                           (table.c.ip, sorted({h["ip"] for h in hosts if h["ip"]}))):
+        for i in range(0, len(values), ASSET_LOOKUP_CHUNK):
+            for found in conn.execute(select(table).where(column.in_(values[i:i + ASSET_LOOKUP_CHUNK]))).mappings():
+                # Une ligne trouvée par MAC et par IP reste un seul dictionnaire
+                row = rows.setdefault(found["id"], dict(found))
+                if row["mac"]:
+                    by_mac[row["mac"]] = row
+                current = by_ip.get(row["ip"])
+                if row["ip"] and (current is None or (row["last_seen"] or datetime.min) > (current["last_seen"] or datetime.min)):
+                    by_ip[row["ip"]] = row
+    return by_mac, by_ip
+
+# Applique un scan en une transaction : lecture groupée, comparaison en mémoire, écritures groupées
+def write_assets(agent_id, network, timestamp, hosts):
+    hosts = [normalize_host(h) for h in hosts]
+    table = AssetDB.__table__
+    with assets_lock, engine.connect() as conn:
+        by_mac, by_ip = load_assets(conn, hosts)
+        inserts, updates, events = diff_assets(hosts, by_mac, by_ip, timestamp, network, agent_id)
+        if inserts:
+            conn.execute(insert(table), [{k: v for k, v in row.items() if k != "id"} for row in inserts])
+        if updates:
+            conn.execute(update(table).where(table.c.id == bindparam("_id"))
+                         .values({column: bindparam("_" + column) for column in ASSET_COLUMNS}),
+                         [dict({"_" + column: row[column] for column in ASSET_COLUMNS}, _id=row["id"]) for row in updates])
+        if events:
+            conn.execute(insert(AssetEventDB.__table__), events)
+        WRITE_BATCH_SIZE.observe(len(hosts), table="assets")
+        with DB_COMMIT_SECONDS.time(table="assets"):
+            conn.commit()
+    for e in events:
+        ASSET_EVENTS.inc(change=e["change"])
+    return {"received": len(hosts), "new": len(inserts), "updated": len(updates), "events": len(events)}
+
+# Réception d'un scan de découverte (voir Discovery/subnet_discovery.py), éventuellement compressé
+@app.post("/assets")
+async def receive_assets(request: Request, agent_id: str = Depends(verify_token)):
+    body = await request.body()
+    try:
+        scan = AssetScan(**codec.loads(body))
+        timestamp = datetime.fromisoformat(scan.scanned_at) if scan.scanned_at else datetime.now(timezone.utc)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid asset scan")
+    return await asyncio.to_thread(write_assets, agent_id, scan.network, timestamp,
+                                   [host.model_dump() for host in scan.hosts])
+
+def asset_dict(row, fields):
+    return {field: value.isoformat() if isinstance(value, datetime) else value
+            for field, value in ((field, getattr(row, field)) for field in fields)}
+
+# Inventaire courant, des hôtes vus le plus récemment aux plus anciens
+@app.get("/assets")
+def search_assets(network: Optional[str] = None, ip: Optional[str] = None, mac: Optional[str] = None,
+                  agent_id: Optional[str] = None, seen_since: Optional[str] = None,
+                  limit: int = Query(1000, ge=1, le=10000), token_sub: str = Depends(verify_token)):
+    seen_since_dt = parse_date(seen_since, "seen_since")
+    table = AssetDB.__table__
+    query = select(table)
+    for column, value in (("network", network), ("ip", ip), ("agent_id", agent_id)):
+        if value:
+            query = query.where(table.c[column] == value)
+    if mac:
+        query = query.where(table.c.mac == normalize_mac(mac))
+    if seen_since_dt:
+        query = query.where(table.c.last_seen >= seen_since_dt)
+    query = query.order_by(table.c.last_seen.desc(), table.c.id.desc()).limit(limit)
+    fields = ("mac", "ip", "hostname", "device_type", "os", "network", "agent_id", "first_seen", "last_seen")
+    with engine.connect() as conn:
+        return [asset_dict(row, fields) for row in conn.execute(query)]
+
+# Historique des changements de l'inventaire (du plus récent au plus ancien)
+@app.get("/assets/events")
+def search_asset_events(change: Optional[str] = None, ip: Optional[str] = None, mac: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None,
+                        limit: int = Query(1000, ge=1, le=10000), token_sub: str = Depends(verify_token)):
+    since_dt, until_dt = parse_date(since, "since"), parse_date(until, "until")
+    table = AssetEventDB.__table__
+    query = select(table)
+    if change:
+        query = query.where(table.c.change == change)
+    if ip:
+        query = query.where(table.c.ip == ip)
+    if mac:
+        query = query.where(table.c.mac == normalize_mac(mac))
+    if since_dt:
+        query = query.where(table.c.timestamp >= since_dt)
+    if until_dt:
+        query = query.where(table.c.timestamp <= until_dt)
+    query = query.order_by(table.c.timestamp.desc(), table.c.id.desc()).limit(limit)
+    fields = ("timestamp", "agent_id", "network", "ip", "mac", "change", "old_value", "new_value")
+    with engine.connect() as conn:
+        return [asset_dict(row, fields) for row in conn.execute(query)]
+
+# État courant reconstruit d'un agent (dernier rapport complet + deltas)
+@app.get("/state/{agent_id}")
+def agent_state(agent_id: str, token_sub: str = Depends(verify_token)):
+    db = SessionLocal()
+    try:
+        state = db.get(AgentStateDB, agent_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail="Unknown agent")
+        return {
+            "seq": state.seq,
+            "last_seen": state.last_seen.isoformat() if state.last_seen else None,
+            "audit": json.loads(state.audit),
+            "integrity_alerts": json.loads(state.integrity_alerts),
+        }
+    finally:
+        db.close()
+
+DASHBOARD_FIELDS = ("audit", "integrity_alerts")
+DASHBOARD_PAGE_SIZE = 100
+
+def encode_cursor(timestamp, report_id):
+    return base64.urlsafe_b64encode(f"{timestamp.isoformat()}|{report_id}".encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        timestamp, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(report_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def parse_date(value, name):
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
+
+# Position strictement avant / après (timestamp, id) dans l'ordre du dashboard
+def before_position(timestamp, report_id=None):
+    if report_id is None:
+        return ReportDB.timestamp < timestamp
+    return or_(ReportDB.timestamp < timestamp, and_(ReportDB.timestamp == timestamp, ReportDB.id < report_id))
+
+def after_position(timestamp, report_id):
+    return or_(ReportDB.timestamp > timestamp, and_(ReportDB.timestamp == timestamp, ReportDB.id > report_id))
+
+def report_columns(fields):
+    columns = [ReportDB.id, ReportDB.timestamp, ReportDB.is_delta]
+    if "audit" in fields:
+        columns.append(ReportDB.audit)
+    if "integrity_alerts" in fields:
+        columns += [ReportDB.integrity_alerts, ReportDB.resolved_alerts]
+    return columns
+
+# Rejoue un rapport sur l'état courant (seuls les champs demandés sont décodés)
+def replay_report(state, r, fields):
+    if "audit" in fields:
+        audit = codec.loads(r.audit)
+        state["audit"] = apply_delta(state["audit"], [], audit, [], [])[0] if r.is_delta else audit
+    if "integrity_alerts" in fields:
+        alerts = codec.loads(r.integrity_alerts) if r.integrity_alerts else None
+        if r.is_delta:
+            # Lignes antérieures stockées avec "null" : traitées comme une liste vide
+            resolved = (codec.loads(r.resolved_alerts) if r.resolved_alerts else None) or []
+            state["integrity_alerts"] = apply_delta({}, state["integrity_alerts"] or [], {}, alerts or [], resolved)[1]
+        else:
+            state["integrity_alerts"] = alerts
+
+# État complet juste avant le début de la page : dernier rapport complet ou point de reprise,
+# puis deltas suivants (au plus REPORT_SNAPSHOT_EVERY rapports rejoués)
+def replay_base(db, agent_id, position, fields):
+    state = {"audit": {}, "integrity_alerts": []}
+    checkpoint = (db.query(ReportDB).options(load_only(ReportDB.id, ReportDB.timestamp, ReportDB.is_delta))
+                  .filter(ReportDB.agent_id == agent_id, position,
+                          or_(ReportDB.is_delta == 0, ReportDB.is_delta.is_(None), ReportDB.snapshot_audit.isnot(None)))
+                  .order_by(ReportDB.timestamp.desc(), ReportDB.id.desc()).first())
+    query = (db.query(ReportDB).options(load_only(*report_columns(fields)))
+             .filter(ReportDB.agent_id == agent_id, position))
+    if checkpoint and checkpoint.is_delta:
+        # Point de reprise : l'état est repris tel quel, seuls les rapports suivants sont rejoués
+        if "audit" in fields:
+            state["audit"] = codec.loads(checkpoint.snapshot_audit)
+        if "integrity_alerts" in fields:
+            state["integrity_alerts"] = codec.loads(checkpoint.snapshot_alerts) if checkpoint.snapshot_alerts else []
+        query = query.filter(after_position(checkpoint.timestamp, checkpoint.id))
+    elif checkpoint:
+        query = query.filter(or_(after_position(checkpoint.timestamp, checkpoint.id), ReportDB.id == checkpoint.id))
+    for r in query.order_by(ReportDB.timestamp, ReportDB.id).yield_per(500):
+        replay_report(state, r, fields)
+    return state
+
+# Génère les entrées du dashboard dans l'ordre (timestamp, id), sans charger tout l'historique
+def iter_dashboard(db, agent_id, start, since, until, fields, expand, limit=None):
+    query = (db.query(ReportDB).options(load_only(*report_columns(fields)))
+             .filter(ReportDB.agent_id == agent_id))
+    if since:
+        query = query.filter(ReportDB.timestamp >= since)
+    if until:
+        query = query.filter(ReportDB.timestamp <= until)
+    # position : rapports précédant la page, rejoués pour reconstruire l'état de départ
+    position = None
+    if start:
+        query = query.filter(after_position(*start))
+        position = or_(before_position(*start), and_(ReportDB.timestamp == start[0], ReportDB.id == start[1]))
+    elif since:
+        position = before_position(since)
+    query = query.order_by(ReportDB.timestamp, ReportDB.id)
+    if limit:
+        query = query.limit(limit)
+    state = {"audit": {}, "integrity_alerts": []}
+    if expand and position is not None:
+        state = replay_base(db, agent_id, position, fields)
+    for r in query.yield_per(500):
+        item = {"timestamp": r.timestamp.isoformat()}
+        if expand:
+            # Les rapports différentiels sont rejoués pour restituer l'état complet de chaque rapport
+            replay_report(state, r, fields)
+            for field in fields:
+                item[field] = state[field]
+        else:
+            item["delta"] = bool(r.is_delta)
+            if "audit" in fields:
+                item["audit"] = codec.loads(r.audit)
+            if "integrity_alerts" in fields:
+                item["integrity_alerts"] = codec.loads(r.integrity_alerts) if r.integrity_alerts else None
+                if r.is_delta:
+                    item["resolved_alerts"] = (codec.loads(r.resolved_alerts) if r.resolved_alerts else None) or []
+        yield (r.timestamp, r.id), item
+
+# Agents ayant échoué un contrôle sur une période : échec enregistré dans la période,
+# ou dernier résultat connu avant la période en échec
+@app.get("/checks/{check_id}/failures")
+def check_failures(check_id: str, since: Optional[str] = None, until: Optional[str] = None,
+                   token_sub: str = Depends(verify_token)):
+    since_dt, until_dt = parse_date(since, "since"), parse_date(until, "until")
+    db = SessionLocal()
+    try:
+        failures = {}
+        query = db.query(CheckResultDB.agent_id, func.min(CheckResultDB.timestamp), func.max(CheckResultDB.timestamp)).filter(
+            CheckResultDB.check_id == check_id, CheckResultDB.passed == 0)
+        if since_dt:
+            query = query.filter(CheckResultDB.timestamp >= since_dt)
+        if until_dt:
+            query = query.filter(CheckResultDB.timestamp <= until_dt)
+        for agent_id, first, last in query.group_by(CheckResultDB.agent_id):
+            failures[agent_id] = {"agent_id": agent_id, "first_failure": first.isoformat(), "last_failure": last.isoformat()}
+        if since_dt:
+            latest = (db.query(CheckResultDB.agent_id, func.max(CheckResultDB.timestamp).label("ts"))
+                      .filter(CheckResultDB.check_id == check_id, CheckResultDB.timestamp < since_dt)
+                      .group_by(CheckResultDB.agent_id).subquery())
+            carried = db.query(CheckResultDB.agent_id, CheckResultDB.timestamp).join(
+                latest, and_(CheckResultDB.agent_id == latest.c.agent_id, CheckResultDB.timestamp == latest.c.ts)
+            ).filter(CheckResultDB.check_id == check_id, CheckResultDB.passed == 0)
+            for agent_id, ts in carried:
+                failures.setdefault(agent_id, {"agent_id": agent_id, "first_failure": ts.isoformat(),
+                                               "last_failure": ts.isoformat()})
+        return sorted(failures.values(), key=lambda f: f["agent_id"])
+    finally:
+        db.close()
+
+# Recherche d'alertes sur toute la flotte (type, fichier, agent, période, alertes ouvertes)
+@app.get("/alerts")
+def search_alerts(type: Optional[str] = None, file: Optional[str] = None, agent_id: Optional[str] = None,
+                  since: Optional[str] = None, until: Optional[str] = None, open_only: bool = False,
+                  limit: int = Query(100, ge=1, le=1000), token_sub: str = Depends(verify_token)):
+    since_dt, until_dt = parse_date(since, "since"), parse_date(until, "until")
+    db = SessionLocal()
+    try:
+        query = db.query(AlertDB)
+        if type:
+            query = query.filter(AlertDB.type == type)
+        if file:
+            query = query.filter(AlertDB.file == file)
+        if agent_id:
+            query = query.filter(AlertDB.agent_id == agent_id)
+        if since_dt:
+            query = query.filter(AlertDB.timestamp >= since_dt)
+        if until_dt:
+            query = query.filter(AlertDB.timestamp <= until_dt)
+        if open_only:
+            query = query.filter(AlertDB.resolved_at.is_(None))
+        return [{
+            "agent_id": a.agent_id,
+            "type": a.type,
+            "file": a.file,
+            "msg": a.msg,
+            "timestamp": a.timestamp.isoformat(),
+            "resolved_at": a.resolved_at.isoformat() if a.resolved_at else None,
+        } for a in query.order_by(AlertDB.timestamp.desc(), AlertDB.id.desc()).limit(limit)]
+    finally:
+        db.close()
 
 # Route pour voir les derniers rapports
+# Pagination par curseur (en-tête X-Next-Cursor), filtres since/until, sélection des champs
+# (fields=integrity_alerts pour ignorer les audits) et format=ndjson pour un flux à mémoire constante.
+# expand=false renvoie les rapports tels que stockés (deltas non rejoués).
 @app.get("/dashboard/{agent_id}")
-def dashboard(agent_id: str, token_sub: str = Depends(verify_token)):
+def dashboard(agent_id: str, cursor: Optional[str] = None, since: Optional[str] = None, until: Optional[str] = None,
+              limit: Optional[int] = Query(None, ge=1, le=1000), fields: Optional[str] = None,
+              expand: bool = True, format: str = Query("json", pattern="^(json|ndjson)$"),
+              token_sub: str = Depends(verify_token)):
     # Optionnel: restreindre la visualisation si token_sub != agent_id ou admin
+    start = decode_cursor(cursor) if cursor else None
+    since_dt, until_dt = parse_date(since, "since"), parse_date(until, "until")
+    selected = [f for f in (fields.split(",") if fields else DASHBOARD_FIELDS) if f in DASHBOARD_FIELDS]
+
+    if format == "ndjson":
+        def stream():
+            db = SessionLocal()
+            try:
+                for _, item in iter_dashboard(db, agent_id, start, since_dt, until_dt, selected, expand, limit):
+                    yield codec.dumps(item) + b"\n"
+            finally:
+                db.close()
+        return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+    page_size = limit or DASHBOARD_PAGE_SIZE
     db = SessionLocal()
-    reports_db = db.query(ReportDB).filter(ReportDB.agent_id == agent_id).all()
-    result = []
-    for r in reports_db:
-        result.append({
-            "timestamp": r.timestamp.isoformat(),
-            "audit": json.loads(r.audit),
-            "integrity_alerts": json.loads(r.integrity_alerts) if r.integrity_alerts else None
-        })
-    db.close()
-    return result
+    try:
+        result = []
+        headers = {}
+        # Une entrée de plus que la page pour savoir s'il reste des rapports
+        for position, item in iter_dashboard(db, agent_id, start, since_dt, until_dt, selected, expand, page_size + 1):
+            if len(result) == page_size:
+                headers["X-Next-Cursor"] = encode_cursor(*last_position)
+                break
+            result.append(item)
+            last_position = position
+    finally:
+        db.close()
+    return FastJSONResponse(content=result, headers=headers)
+
+# Rétention : rapports bruts conservés REPORT_RETENTION_DAYS jours, puis seuls les changements d'état
+# des contrôles (check_results) ; 0 désactive la politique correspondante
+REPORT_RETENTION_DAYS = int(os.getenv("REPORT_RETENTION_DAYS", "90"))
+CHECK_ROLLUP_DAYS = int(os.getenv("CHECK_ROLLUP_DAYS", str(REPORT_RETENTION_DAYS)))
+RESOLVED_ALERT_RETENTION_DAYS = int(os.getenv("RESOLVED_ALERT_RETENTION_DAYS", "365"))
+LOG_EVENTS_RETENTION_MONTHS = int(os.getenv("LOG_EVENTS_RETENTION_MONTHS", "12"))
+RETENTION_INTERVAL = int(os.getenv("RETENTION_INTERVAL", "3600"))  # secondes, 0 : job désactivé
+RETENTION_START_DELAY = 60
+# Suppressions par lots courts : le thread écrivain de l'ingestion n'attend jamais plus d'un lot
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.05"))
+VACUUM_MAX_PAGES = int(os.getenv("VACUUM_MAX_PAGES", "10000"))
+
+RETENTION_DELETED = metrics.counter("shieldcli_retention_deleted_total", "Lignes supprimées par la rétention")
+RETENTION_SECONDS = metrics.histogram("shieldcli_retention_seconds", "Durée des passes de rétention")
+VACUUM_PAGES = metrics.counter("shieldcli_vacuum_pages_total", "Pages rendues par le vacuum incrémental")
+
+def utc_cutoff(days):
+    # Les dates sont stockées sans fuseau (UTC)
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+# Rapports antérieurs à cutoff : le dernier rapport de chaque agent avant cutoff devient un rapport complet
+# (état reconstruit) et les précédents sont supprimés. Le rejeu du dashboard part au plus de ce rapport.
+def compact_reports(cutoff):
+    db = SessionLocal()
+    try:
+        agents = [agent_id for (agent_id,) in db.query(AgentStateDB.agent_id)]
+    finally:
+        db.close()
+    deleted = 0
+    for agent_id in agents:
+        db = SessionLocal()
+        try:
+            boundary = (db.query(ReportDB).filter(ReportDB.agent_id == agent_id, ReportDB.timestamp < cutoff)
+                        .order_by(ReportDB.timestamp.desc(), ReportDB.id.desc()).first())
+            if boundary is None:
+                continue
+            if boundary.is_delta:
+                position = or_(before_position(boundary.timestamp, boundary.id), ReportDB.id == boundary.id)
+                state = replay_base(db, agent_id, position, DASHBOARD_FIELDS)
+                boundary.audit = json.dumps(state["audit"])
+                boundary.integrity_alerts = json.dumps(state["integrity_alerts"])
+                boundary.resolved_alerts = None
+                boundary.snapshot_audit = boundary.snapshot_alerts = None
+                boundary.is_delta = 0
+                db.commit()
+            start = (boundary.timestamp, boundary.id)
+        finally:
+            db.close()
+        # Le rapport de référence est écrit avant toute suppression : le dashboard reste cohérent entre deux lots
+        deleted += delete_where(engine, ReportDB.__table__,
+                                and_(ReportDB.agent_id == agent_id, before_position(*start)),
+                                RETENTION_BATCH_SIZE, RETENTION_BATCH_PAUSE)
+    RETENTION_DELETED.inc(deleted, table="reports")
+    return deleted
+
+# check_results antérieurs à cutoff : seuls les changements d'état sont conservés (un résultat identique
+# au précédent pour le même agent et le même contrôle est supprimé, ex. rapports complets répétés)
+def rollup_check_results(cutoff):
+    table = CheckResultDB.__table__
+    order = (table.c.check_id, table.c.timestamp, table.c.id)
+    deleted = 0
+    with engine.connect() as conn:
+        agents = conn.execute(select(AgentStateDB.agent_id)).scalars().all()
+    for agent_id in agents:
+        # Parcours par pages de RETENTION_BATCH_SIZE lignes dans l'ordre (contrôle, date), appuyé sur l'index
+        # (agent_id, check_id, timestamp) ; la dernière ligne d'une page sert de référence pour la suivante
+        previous = None
+        while True:
+            query = select(*order, table.c.value).where(table.c.agent_id == agent_id, table.c.timestamp < cutoff)
+            if previous is not None:
+                query = query.where(tuple_(*order) > tuple(previous[:3]))
+            with engine.connect() as conn:
+                rows = conn.execute(query.order_by(*order).limit(RETENTION_BATCH_SIZE)).all()
+            ids = []
+            for row in rows:
+                if previous is not None and row.check_id == previous.check_id and row.value == previous.value:
+                    ids.append(row.id)
+                previous = row
+            deleted += delete_ids(engine, table, ids, RETENTION_BATCH_SIZE, 0)
+            if len(rows) < RETENTION_BATCH_SIZE:
+                break
+            if RETENTION_BATCH_PAUSE:
+                time.sleep(RETENTION_BATCH_PAUSE)
+    RETENTION_DELETED.inc(deleted, table="check_results")
+    return deleted
+
+def prune_resolved_alerts(cutoff):
+    deleted = delete_where(engine, AlertDB.__table__, AlertDB.resolved_at < cutoff,
+                           RETENTION_BATCH_SIZE, RETENTION_BATCH_PAUSE)
+    RETENTION_DELETED.inc(deleted, table="alerts")
+    return deleted
+
+# Partitions d'événements de logs antérieures au mois month (AAAAMM) : supprimées d'un bloc
+def drop_event_partitions(month):
+    dropped = []
+    for name in event_months(until=datetime.strptime(month, "%Y%m") - timedelta(days=1)):
+        with event_partitions_lock:
+            table = event_partitions.pop(name, None)
+            if table is not None:
+                events_metadata.remove(table)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {LOG_EVENTS_PREFIX}{name}"))
+        dropped.append(name)
+    return dropped
+
+def months_ago(months):
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - months
+    return f"{index // 12:04d}{index % 12 + 1:02d}"
+
+def run_retention():
+    start = time.perf_counter()
+    summary = {}
+    if REPORT_RETENTION_DAYS:
+        summary["reports"] = compact_reports(utc_cutoff(REPORT_RETENTION_DAYS))
+    if CHECK_ROLLUP_DAYS:
+        summary["check_results"] = rollup_check_results(utc_cutoff(CHECK_ROLLUP_DAYS))
+    if RESOLVED_ALERT_RETENTION_DAYS:
+        summary["alerts"] = prune_resolved_alerts(utc_cutoff(RESOLVED_ALERT_RETENTION_DAYS))
+    if LOG_EVENTS_RETENTION_MONTHS:
+        summary["log_events"] = drop_event_partitions(months_ago(LOG_EVENTS_RETENTION_MONTHS - 1))
+    if engine.dialect.name == "sqlite":
+        pages = incremental_vacuum(engine, VACUUM_MAX_PAGES)
+        VACUUM_PAGES.inc(pages)
+        summary["vacuum_pages"] = pages
+    RETENTION_SECONDS.observe(time.perf_counter() - start)
+    if any(summary.values()):
+        print(f"Rétention : {summary} en {time.perf_counter() - start:.1f} s")
+    return summary
+
+retention_job = PeriodicJob(run_retention, RETENTION_INTERVAL, delay=min(RETENTION_START_DELAY, RETENTION_INTERVAL))
+
+@app.on_event("startup")
+def start_retention_job():
+    if engine.dialect.name == "sqlite" and os.getenv("AUTO_VACUUM_CONVERT") == "1" \
+            and auto_vacuum_mode(engine) != AUTO_VACUUM_INCREMENTAL:
+        print("Conversion de la base en auto_vacuum incrémental (VACUUM complet)...")
+        enable_incremental_vacuum(engine)
+    if RETENTION_INTERVAL > 0:
+        retention_job.start()
+
+@app.on_event("shutdown")
+def stop_retention_job():
+    retention_job.stop()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
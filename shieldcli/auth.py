@@ -0,0 +1,107 @@
+# Caches et compteurs de l'authentification de l'API
+# Les tokens déjà vérifiés sont conservés (LRU borné, jusqu'à leur expiration) pour éviter un
+# décodage + HMAC complet à chaque requête ; les requêtes sont comptées par agent.
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+class TokenCache:
+    """
+    Cache LRU {sha256(token): (sujet, exp)} des tokens vérifiés. Une entrée expirée est ignorée et supprimée.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        # Les tokens eux-mêmes ne sont pas conservés en mémoire
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[1] <= time.time():
+                del self.entries[key]
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, token, subject, exp):
+        if self.maxsize <= 0:
+            return
+        key = self.key(token)
+        with self.lock:
+            self.entries[key] = (subject, exp)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self.entries)
+
+class AgentRateCounters:
+    """
+    Compteurs de requêtes par agent : total, requêtes sur la dernière minute (fenêtre glissante
+    approchée par deux fenêtres fixes) et date de la dernière requête.
+    """
+
+    def __init__(self, window=60):
+        self.window = window
+        self.agents = {}
+        self.lock = threading.Lock()
+
+    def hit(self, agent_id, now=None):
+        now = now or time.time()
+        slot = int(now // self.window)
+        with self.lock:
+            counter = self.agents.get(agent_id)
+            if counter is None:
+                # [total, fenêtre courante, requêtes de la fenêtre courante, requêtes de la précédente, dernière requête]
+                counter = self.agents[agent_id] = [0, slot, 0, 0, now]
+            if counter[1] != slot:
+                counter[3] = counter[2] if counter[1] == slot - 1 else 0
+                counter[1] = slot
+                counter[2] = 0
+            counter[0] += 1
+            counter[2] += 1
+            counter[4] = now
+
+    def rate(self, counter, now):
+        slot = int(now // self.window)
+        if counter[1] == slot:
+            current, previous = counter[2], counter[3]
+        elif counter[1] == slot - 1:
+            current, previous = 0, counter[2]
+        else:
+            return 0.0
+        elapsed = (now % self.window) / self.window
+        return current + previous * (1 - elapsed)
+
+    def snapshot(self, now=None):
+        """
+        Retourne {agent: {"requests", "last_minute", "last_seen"}}.
+        """
+        now = now or time.time()
+        with self.lock:
+            return {
+                agent_id: {
+                    "requests": counter[0],
+                    "last_minute": round(self.rate(counter, now), 1),
+                    "last_seen": datetime.fromtimestamp(counter[4], timezone.utc).isoformat(),
+                }
+                for agent_id, counter in self.agents.items()
+            }
@@ -0,0 +1,89 @@
+# Encodage des échanges agent <-> API
+# JSON rapide (orjson s'il est installé, sinon json) et compression des corps HTTP
+# (gzip, zstd si le module zstandard est installé).
+
+import gzip
+import json
+import zlib
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Encodages acceptés pour les corps de requête, par ordre de préférence
+ENCODINGS = ("zstd", "gzip") if zstandard else ("gzip",)
+# En dessous de ce seuil, la compression coûte plus qu'elle ne rapporte
+COMPRESS_THRESHOLD = 1024
+
+def dumps(obj):
+    """
+    Sérialise en JSON (bytes UTF-8).
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode("utf-8")
+
+def loads(data):
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def compress(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if encoding == "zstd" and zstandard:
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def decompress(body, encoding, max_size):
+    """
+    Décompresse un corps de requête ; ValueError si l'encodage est inconnu, le corps invalide ou
+    si le résultat dépasse max_size octets (protection contre les bombes de décompression).
+    """
+    try:
+        if encoding == "gzip":
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            data = decoder.decompress(body, max_size + 1)
+            if len(data) > max_size or decoder.unconsumed_tail:
+                raise ValueError("Decompressed body too large")
+            if not decoder.eof:
+                raise ValueError("Truncated gzip body")
+            return data
+        if encoding == "zstd" and zstandard:
+            chunks = []
+            total = 0
+            with zstandard.ZstdDecompressor().stream_reader(body) as reader:
+                while True:
+                    chunk = reader.read(65536)
+                    if not chunk:
+                        break
+                    total += len(chunk)
+                    if total > max_size:
+                        raise ValueError("Decompressed body too large")
+                    chunks.append(chunk)
+            return b"".join(chunks)
+    except (zlib.error, OSError) as e:
+        raise ValueError(str(e))
+    except Exception as e:
+        if zstandard and isinstance(e, zstandard.ZstdError):
+            raise ValueError(str(e))
+        raise
+    raise ValueError(f"Unsupported encoding: {encoding}")
+
+def encode_body(payload, encoding="gzip", threshold=COMPRESS_THRESHOLD):
+    """
+    Prépare un corps de requête JSON, compressé au-delà de threshold octets.
+    Retourne (corps, en-têtes).
+    """
+    body = dumps(payload)
+    headers = {"Content-Type": "application/json"}
+    if encoding and len(body) >= threshold:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return body, headers
@@ -1,43 +1,105 @@
-import subprocess
-
-def audit_checks():
-    def run_cmd(cmd):
-        try:
-            result = subprocess.run(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
-            return result.returncode == 0
-        except Exception:
-            return False
+import os
+import re
+
+from shieldcli.compliance.engine import REGISTRY, ResultCache, check, command_output, load_profile, run_checks
+
+# Résultats des contrôles dont les fichiers d'entrée n'ont pas changé depuis le dernier audit
+CACHE_FILE = "compliance_cache.json"
+# Contrôles supplémentaires déclarés sans code (voir engine.load_profile), chargés s'il existe
+PROFILE_FILE = "compliance_profile.json"
+
+# Durées par contrôle du dernier audit (secondes), pour repérer les sondes lentes
+last_audit_durations = {}
 
-    checks = {
-        # 1.1.1.1 - Désactiver l'automontage
-        "1.1.1.1_no_automount": run_cmd("systemctl is-enabled autofs | grep -q 'disabled'"),
+# Sources partagées : chaque fichier est lu et analysé une seule fois par audit
+def passwd_entries(context):
+    def load():
+        entries = []
+        for line in context.read_text("/etc/passwd").splitlines():
+            fields = line.split(":")
+            if len(fields) >= 7:
+                entries.append(fields)
+        return entries
+    return context.get("passwd", load)
 
-        # 1.1.2 - Vérifier que /tmp est monté séparément
-        "1.1.2_tmp_separate": run_cmd("mount | grep -E '\s/tmp\s' | grep -q 'nodev'"),
+def mount_points(context):
+    def load():
+        mounts = {}
+        for line in context.read_text("/proc/mounts").splitlines():
+            fields = line.split()
+            if len(fields) >= 4:
+                # Les espaces des points de montage sont encodés en \040
+                mounts[fields[1].replace("\\040", " ")] = fields[3].split(",")
+        return mounts
+    return context.get("mounts", load)
 
-        # 1.4.1 - Activer AppArmor
-        "1.4.1_apparmor_enabled": run_cmd("aa-status | grep -q 'profiles are loaded'"),
+@check("1.1.1.1_no_automount", "Désactiver l'automontage")
+def check_no_automount(context, timeout):
+    _, out = command_output(["systemctl", "is-enabled", "autofs"], timeout)
+    return "disabled" in out
 
-        # 2.2.1.3 - Interdire le login root SSH
-        "2.2.1.3_no_ssh_root_login": run_cmd("grep -E '^PermitRootLogin\s+no' /etc/ssh/sshd_config"),
+@check("1.1.2_tmp_separate", "Vérifier que /tmp est monté séparément")
+def check_tmp_separate(context, timeout):
+    options = mount_points(context).get("/tmp")
+    return options is not None and "nodev" in options
 
-        # 3.1.1 - Vérifier les permissions de /etc/passwd
-        "3.1.1_passwd_permissions": run_cmd("stat -c %a /etc/passwd | grep -qE '^6[0-4][0-4]$'"),
+@check("1.4.1_apparmor_enabled", "Activer AppArmor")
+def check_apparmor_enabled(context, timeout):
+    _, out = command_output(["aa-status"], timeout)
+    return "profiles are loaded" in out
 
-        # 3.3.4 - Alerte sur tentatives d'accès root échouées
-        "3.3.4_failed_root_login": run_cmd("grep -q 'authentication failure.*user=root' /var/log/auth.log"),
+@check("2.2.1.3_no_ssh_root_login", "Interdire le login root SSH", inputs=["/etc/ssh/sshd_config"])
+def check_no_ssh_root_login(context, timeout):
+    return re.search(r"^PermitRootLogin\s+no", context.read_text("/etc/ssh/sshd_config"), re.M) is not None
 
-        # 4.1.1.1 - Configurer auditd
-        "4.1.1.1_auditd_installed": run_cmd("dpkg -s auditd | grep -q 'Status: install ok installed'"),
+@check("3.1.1_passwd_permissions", "Vérifier les permissions de /etc/passwd", inputs=["/etc/passwd"])
+def check_passwd_permissions(context, timeout):
+    return re.fullmatch(r"6[0-4][0-4]", format(context.stat("/etc/passwd").st_mode & 0o777, "o")) is not None
 
-        # 5.3.1 - Définir les politiques de mot de passe
-        "5.3.1_password_policies": run_cmd("grep -Eq '^PASS_MAX_DAYS\s+[0-9]{2,}' /etc/login.defs"),
+@check("3.3.4_failed_root_login", "Alerte sur tentatives d'accès root échouées", inputs=["/var/log/auth.log"])
+def check_failed_root_login(context, timeout):
+    pattern = re.compile(rb"authentication failure.*user=root")
+    with open(context.path("/var/log/auth.log"), "rb") as f:
+        return any(pattern.search(line) for line in f)
 
-        # 6.1.2 - Vérifier les fichiers UID 0
-        "6.1.2_only_root_uid0": run_cmd("awk -F: '($3 == 0) { print $1 }' /etc/passwd | grep -xq 'root'"),
+@check("4.1.1.1_auditd_installed", "Configurer auditd", inputs=["/var/lib/dpkg/status"])
+def check_auditd_installed(context, timeout):
+    _, out = command_output(["dpkg", "-s", "auditd"], timeout)
+    return "Status: install ok installed" in out
+
+@check("5.3.1_password_policies", "Définir les politiques de mot de passe", inputs=["/etc/login.defs"])
+def check_password_policies(context, timeout):
+    return re.search(r"^PASS_MAX_DAYS\s+[0-9]{2,}", context.read_text("/etc/login.defs"), re.M) is not None
+
+@check("6.1.2_only_root_uid0", "Vérifier les fichiers UID 0", inputs=["/etc/passwd"])
+def check_only_root_uid0(context, timeout):
+    return "root" in [fields[0] for fields in passwd_entries(context) if fields[2] == "0"]
+
+@check("6.2.1_no_empty_passwords", "Vérifier les comptes sans mot de passe", inputs=["/etc/shadow"])
+def check_no_empty_passwords(context, timeout):
+    for line in context.read_text("/etc/shadow").splitlines():
+        fields = line.split(":")
+        if len(fields) >= 2 and fields[1] in ("", "!"):
+            return False
+    return True
 
-        # 6.2.1 - Vérifier les comptes sans mot de passe
-        "6.2.1_no_empty_passwords": run_cmd("grep -E '^([^:]+:){1}!?:' /etc/shadow | wc -l | grep -q '^0$'"),
-    }
+def run_audit(workers=None, timeout=10, cache_path=CACHE_FILE, root=None):
+    """
+    Exécute tous les contrôles du registre en parallèle (cache désactivé si cache_path vaut None).
+    root : racine alternative des fichiers audités (voir engine.run_checks).
+    Retourne (résultats {contrôle: bool}, durées {contrôle: secondes}, contrôles servis par le cache).
+    """
+    if os.path.exists(PROFILE_FILE):
+        load_profile(PROFILE_FILE)
+    cache = ResultCache(cache_path) if cache_path else None
+    return run_checks(REGISTRY, workers, timeout, cache, root)
 
-    return checks
\ No newline at end of file
+def audit_checks(workers=None, timeout=10, cache_path=CACHE_FILE, root=None):
+    checks, durations, cached = run_audit(workers, timeout, cache_path, root)
+    last_audit_durations.clear()
+    last_audit_durations.update(durations)
+    slowest = max(durations, key=durations.get, default=None)
+    if slowest:
+        print(f"Conformité : {len(checks)} contrôle(s), {len(cached)} en cache, {sum(durations.values()):.2f} s cumulées "
+              f"(plus lent : {slowest}, {durations[slowest]:.2f} s)")
+    return checks
@@ -0,0 +1,274 @@
+# Moteur d'exécution des contrôles de conformité
+# Les contrôles sont déclarés dans un registre (décorateur @check) avec les fichiers dont ils
+# dépendent, exécutés en parallèle (pool borné) avec un délai maximal par contrôle ; les fichiers
+# système sont lus une seule fois par audit et partagés entre les contrôles. Le résultat d'un
+# contrôle est mis en cache, indexé par l'empreinte stat de ses fichiers d'entrée.
+
+import hashlib
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+try:
+    from shieldcli import metrics
+except ImportError:
+    metrics = None
+
+if metrics:
+    CHECK_SECONDS = metrics.histogram("shieldcli_compliance_check_seconds", "Durée d'exécution d'un contrôle de conformité")
+    CHECK_RUNS = metrics.counter("shieldcli_compliance_checks_total", "Contrôles de conformité par issue (pass, fail, timeout, cached)")
+
+# inputs : fichiers lus par le contrôle (None = non mis en cache, réévalué à chaque audit)
+Check = namedtuple("Check", ["id", "func", "description", "inputs"])
+
+REGISTRY = []
+
+def check(check_id, description="", inputs=None):
+    """
+    Décorateur d'enregistrement d'un contrôle : fonction(context, timeout) -> bool.
+    """
+    def register(func):
+        if any(c.id == check_id for c in REGISTRY):
+            raise ValueError(f"Contrôle déjà enregistré : {check_id}")
+        REGISTRY.append(Check(check_id, func, description, tuple(inputs) if inputs is not None else None))
+        return func
+    return register
+
+def resolve_path(path, root=None):
+    """
+    Chemin absolu du système audité rapporté sous root (ex. /etc/passwd -> root/etc/passwd).
+    """
+    if not root:
+        return path
+    return os.path.join(root, path.lstrip("/"))
+
+def input_signature(path):
+    """
+    Empreinte stat d'un fichier d'entrée : [taille, mtime_ns, ctime_ns, inode], None s'il est absent.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino]
+
+def code_version(func):
+    # Une modification du code du contrôle (ou de sa déclaration pour un profil) invalide le cache
+    code = func.__code__
+    closure = [cell.cell_contents for cell in func.__closure__ or ()]
+    return hashlib.sha256(code.co_code + repr((code.co_consts, closure)).encode()).hexdigest()[:16]
+
+def _profile_check(spec):
+    kind = spec["type"]
+    if kind == "regex":
+        # Motif recherché (ou absent si "expect" vaut false) dans un fichier, ligne par ligne
+        pattern, path, expect = spec["pattern"], spec["path"], spec.get("expect", True)
+        def run(context, timeout):
+            return (re.search(pattern, context.read_text(path), re.M) is not None) == expect
+        return run, [path]
+    if kind == "mode":
+        # Permissions du fichier incluses dans "max_mode" (ex. "644")
+        path, max_mode = spec["path"], int(spec["max_mode"], 8)
+        def run(context, timeout):
+            return context.stat(path).st_mode & 0o777 & ~max_mode == 0
+        return run, [path]
+    if kind == "command":
+        # Sortie d'une commande (sans shell) contenant "contains"
+        argv, contains = list(spec["argv"]), spec["contains"]
+        def run(context, timeout):
+            return contains in command_output(argv, timeout)[1]
+        return run, spec.get("inputs")
+    raise ValueError(f"Type de contrôle inconnu : {kind}")
+
+def load_profile(path):
+    """
+    Enregistre les contrôles déclarés dans un fichier JSON : liste de
+    {"id", "description", "type": "regex" | "mode" | "command", ...paramètres du type}.
+    Les contrôles déjà enregistrés (même identifiant) sont ignorés.
+    """
+    with open(path, "r") as f:
+        specs = json.load(f)
+    known = {c.id for c in REGISTRY}
+    for spec in specs:
+        if spec["id"] in known:
+            continue
+        func, inputs = _profile_check(spec)
+        check(spec["id"], spec.get("description", ""), inputs)(func)
+        known.add(spec["id"])
+
+class ResultCache:
+    """
+    Cache des résultats {contrôle: {"version", "inputs": {chemin: empreinte}, "result"}} sur disque.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+        self.dirty = False
+
+    def lookup(self, item, signatures):
+        entry = self.entries.get(item.id)
+        if entry and entry.get("version") == code_version(item.func) and entry.get("inputs") == signatures:
+            return entry["result"]
+        return None
+
+    def store(self, item, signatures, result):
+        self.entries[item.id] = {"version": code_version(item.func), "inputs": signatures, "result": result}
+        self.dirty = True
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+class CheckContext:
+    """
+    Sources partagées par les contrôles d'un même audit : chaque source (fichier lu, fichier
+    analysé...) est chargée au plus une fois, même si plusieurs contrôles la demandent en parallèle.
+    """
+
+    def __init__(self, root=None):
+        # root : racine alternative du système de fichiers (image montée, arborescence de test)
+        self.root = root
+        self.values = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def path(self, path):
+        return resolve_path(path, self.root)
+
+    def get(self, key, loader):
+        """
+        Retourne la source key, chargée par loader() au premier appel.
+        Une exception du chargement est mémorisée et relevée pour chaque contrôle qui en dépend.
+        """
+        with self.lock:
+            key_lock = self.locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.values:
+                try:
+                    self.values[key] = (True, loader())
+                except Exception as e:
+                    self.values[key] = (False, e)
+            ok, value = self.values[key]
+        if not ok:
+            raise value
+        return value
+
+    def read_text(self, path):
+        def load():
+            with open(self.path(path), "r", encoding="utf-8", errors="replace") as f:
+                return f.read()
+        return self.get(("text", path), load)
+
+    def stat(self, path):
+        return self.get(("stat", path), lambda: os.stat(self.path(path)))
+
+def command_output(argv, timeout):
+    """
+    Exécute une commande sans shell et retourne (code retour, stdout).
+    """
+    result = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True, errors="replace", timeout=timeout)
+    return result.returncode, result.stdout
+
+def default_workers(count):
+    # Les contrôles attendent surtout des sous-processus ou des E/S : quelques threads suffisent
+    return max(1, min(count, 8, (os.cpu_count() or 1) * 2))
+
+def run_checks(checks=None, workers=None, timeout=10, cache=None, root=None):
+    """
+    Exécute les contrôles (Check, par défaut tout le registre) en parallèle.
+    Un contrôle en erreur ou dépassant timeout secondes est considéré comme non conforme.
+    Avec un ResultCache, un contrôle dont les fichiers d'entrée n'ont pas changé n'est pas réévalué.
+    Avec root, les fichiers audités sont lus sous cette racine (les commandes restent celles du PATH).
+    Retourne (résultats {identifiant: bool}, durées {identifiant: secondes}, identifiants servis par le cache).
+    """
+    checks = REGISTRY if checks is None else checks
+    context = CheckContext(root)
+    started = {}
+    durations = {}
+    completed = set()
+
+    def run(item):
+        start = started[item.id] = time.perf_counter()
+        try:
+            result = bool(item.func(context, timeout))
+            completed.add(item.id)
+            return result
+        except Exception:
+            return False
+        finally:
+            durations[item.id] = time.perf_counter() - start
+
+    results = {}
+    cached = set()
+    timed_out = set()
+    signatures = {}
+    to_run = []
+    for item in checks:
+        if cache is not None and item.inputs is not None:
+            # Empreinte relevée avant l'évaluation : une modification pendant le contrôle invalide le cache
+            signatures[item.id] = {path: input_signature(resolve_path(path, root)) for path in item.inputs}
+            result = cache.lookup(item, signatures[item.id])
+            if result is not None:
+                results[item.id] = result
+                durations[item.id] = 0.0
+                cached.add(item.id)
+                continue
+        to_run.append(item)
+
+    if to_run:
+        pool = ThreadPoolExecutor(max_workers=workers or default_workers(len(to_run)))
+        try:
+            futures = [(item, pool.submit(run, item)) for item in to_run]
+            for item, future in futures:
+                # Le délai court à partir du démarrage du contrôle, pas de sa mise en file d'attente
+                while True:
+                    start = started.get(item.id)
+                    wait = 0.05 if start is None else max(0, start + timeout - time.perf_counter())
+                    try:
+                        results[item.id] = future.result(timeout=wait)
+                        break
+                    except TimeoutError:
+                        if start is not None:
+                            results[item.id] = False
+                            durations.setdefault(item.id, timeout)
+                            timed_out.add(item.id)
+                            break
+        finally:
+            # Un contrôle bloqué ne doit pas retenir l'audit : le pool est libéré sans attendre
+            pool.shutdown(wait=False)
+
+    if cache is not None:
+        # Les erreurs et dépassements de délai sont transitoires : seuls les résultats aboutis sont conservés
+        for item in to_run:
+            if item.id in signatures and item.id in completed and item.id not in timed_out:
+                cache.store(item, signatures[item.id], results[item.id])
+        cache.save()
+
+    if metrics:
+        for item in checks:
+            if item.id in cached:
+                CHECK_RUNS.inc(check=item.id, outcome="cached")
+                continue
+            outcome = "timeout" if item.id in timed_out else ("pass" if results[item.id] else "fail")
+            CHECK_RUNS.inc(check=item.id, outcome=outcome)
+            CHECK_SECONDS.observe(durations.get(item.id, timeout), check=item.id)
+
+    ordered = [item.id for item in checks]
+    return ({check_id: results[check_id] for check_id in ordered},
+            {check_id: durations.get(check_id, timeout) for check_id in ordered}, cached)
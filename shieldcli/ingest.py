@@ -0,0 +1,89 @@
+# File d'écriture en mémoire pour l'ingestion des rapports
+# Les requêtes HTTP déposent leurs rapports dans la file ; un thread écrivain les regroupe
+# et les écrit en une seule transaction par intervalle / taille de lot (un seul fsync SQLite).
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+class WriteQueue:
+    """
+    process_batch(items) est appelé dans le thread écrivain avec une liste d'éléments et doit
+    retourner une liste de résultats de même longueur (une exception par élément en échec).
+    """
+
+    def __init__(self, process_batch, max_batch=500, flush_interval=0.05):
+        self.process_batch = process_batch
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.stopping = False
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping = False
+                self.thread = threading.Thread(target=self._run, name="ingest-writer", daemon=True)
+                self.thread.start()
+
+    def submit(self, item):
+        """
+        Ajoute un élément à la file et retourne un Future résolu après le commit du lot.
+        """
+        future = Future()
+        self.start()
+        self.queue.put((item, future))
+        return future
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def stop(self, timeout=5):
+        """
+        Vide la file puis arrête le thread écrivain.
+        """
+        if self.thread is None:
+            return
+        self.stopping = True
+        self.queue.put(None)
+        self.thread.join(timeout)
+
+    def _run(self):
+        while True:
+            first = self.queue.get()
+            if first is None:
+                if self.stopping and self.queue.empty():
+                    return
+                continue
+            batch = [first]
+            # Regroupe les éléments arrivés pendant l'intervalle, dans la limite de max_batch
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self.queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    continue
+                batch.append(entry)
+            self._flush(batch)
+            if self.stopping and self.queue.empty():
+                return
+
+    def _flush(self, batch):
+        items = [item for item, _ in batch]
+        try:
+            results = self.process_batch(items)
+        except Exception as e:
+            results = [e] * len(items)
+        for (_, future), result in zip(batch, results):
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
@@ -6,10 +6,24 @@
 #   python shieldcli/integrity/file_monitor.py
 # Les fichiers de config doivent rester accessibles à la racine ou être référencés correctement.
 
-import time
 import json
 import os
-import hashlib
+from functools import partial
+
+# Import compatible avec "python shieldcli/integrity/file_monitor.py" et l'import depuis agent.py
+try:
+    from shieldcli.integrity.hasher import (hash_file, hash_files, format_throughput, default_workers,
+                                            make_pool, throughput_stats)
+    from shieldcli.integrity.merkle import FILE, TreeBuilder
+    from shieldcli.integrity.store import BaselineRecord, BaselineStore, migrate_json, record_signature, write_store
+    from shieldcli.integrity.walker import rules_from_config, walk
+    from shieldcli.integrity.watcher import watch
+except ImportError:
+    from hasher import hash_file, hash_files, format_throughput, default_workers, make_pool, throughput_stats
+    from merkle import FILE, TreeBuilder
+    from store import BaselineRecord, BaselineStore, migrate_json, record_signature, write_store
+    from walker import rules_from_config, walk
+    from watcher import watch
 
 def compute_checksum(file_path):
     """
@@ -17,21 +31,14 @@ def compute_checksum(file_path):
     Retourne le hash sous forme de chaîne hexadécimale, ou None en cas d'erreur.
     """
     try:
-        with open(file_path, 'rb') as f:
-            file_hash = hashlib.sha256()
-            while True:
-                chunk = f.read(8192)
-                if not chunk:
-                    break
-                file_hash.update(chunk)
-        return file_hash.hexdigest()
+        return hash_file(file_path)[0]
     except Exception as e:
         print(f"Erreur lors du calcul du checksum pour {file_path}: {e}")
         return None
 
 def load_checksums(checksum_path):
     """
-    Charge les checksums depuis un fichier JSON.
+    Charge les checksums depuis un fichier JSON (ancien format, voir store.py).
     Retourne un dictionnaire {chemin: checksum}.
     """
     if os.path.exists(checksum_path):
@@ -45,7 +52,7 @@ def load_checksums(checksum_path):
 
 def save_checksums(checksum_path, checksums):
     """ 
-    Sauvegarde les checksums dans un fichier JSON.
+    Sauvegarde les checksums dans un fichier JSON (ancien format, voir store.py).
     """
     try:
         with open(checksum_path, 'w') as f:
@@ -53,6 +60,12 @@ def save_checksums(checksum_path, checksums):
     except Exception as e:
         print(f"Erreur lors de la sauvegarde des checksums: {e}")
 
+def stat_signature(st):
+    """
+    Construit l'empreinte stat utilisée par le mode incrémental : [taille, mtime_ns, ctime_ns, inode].
+    """
+    return [st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino]
+
 def get_permissions(file_path):
     """
     Retroune les permissions du fichier sous forme d'entier (mode octal).
@@ -63,15 +76,98 @@ def get_permissions(file_path):
         print(f"Erreur lors de la récupération des permissions pour {file_path}: {e}")
         return None
 
-def run_integrity_check():
+def iter_files(paths, rules=None):
+    """
+    Parcourt les chemins configurés (fichiers ou dossiers) et génère les chemins de fichiers
+    retenus par les règles de parcours (voir walker.py).
+    """
+    for file_path, _ in walk(paths, rules):
+        yield file_path
+
+def max_hash_rate(config):
+    """
+    Budget de lecture du hachage ("hash_max_mb_per_s" de monitor_config.json) en octets/s, None sans limite.
+    """
+    rate = config.get("hash_max_mb_per_s")
+    return int(rate * 1024 * 1024) if rate else None
+
+def build_baseline(paths, workers=None, executor="thread", rules=None, max_bytes_per_s=None):
+    """
+    Construit la base de référence en hachant les fichiers en parallèle.
+    Le stat relevé pendant le parcours sert à la fois à l'empreinte et aux permissions.
+    Retourne une liste de BaselineRecord.
+    """
+    # Le stat est pris avant le hachage : une écriture concurrente forcera un re-hachage
+    stats = dict(walk(paths, rules))
+    digests, throughput = hash_files(stats, workers=workers, executor=executor, max_bytes_per_s=max_bytes_per_s)
+    records = []
+    for file_path, checksum in digests.items():
+        if checksum:
+            st = stats[file_path]
+            records.append(BaselineRecord(file_path, bytes.fromhex(checksum), st.st_mode & 0o777,
+                                          *stat_signature(st)))
+    print(f"Base de référence : {format_throughput(throughput)}")
+    return records
+
+def get_store_path(racine, config):
+    return os.path.join(racine, config.get("baseline_store", "baseline.db"))
+
+def open_store(racine, config):
+    """
+    Ouvre la base de référence SQLite. Si elle n'existe pas encore mais qu'une ancienne base
+    checksums.json est présente, celle-ci est migrée une fois pour toutes.
+    """
+    store_path = get_store_path(racine, config)
+    checksum_path = os.path.join(racine, "checksums.json")
+    if not os.path.exists(store_path) and os.path.exists(checksum_path):
+        migrated = migrate_json(checksum_path, os.path.join(racine, "permissions_ref.json"), store_path)
+        print(f"Migration de checksums.json vers {store_path} : {migrated} fichier(s)")
+    return BaselineStore(store_path)
+
+def file_children(racine, config, overrides, directory):
+    """
+    Fichiers directement contenus dans directory, relus dans la base de référence :
+    {nom: (FILE, digest)}, avec les digests courants de overrides (None : fichier exclu).
+    """
+    prefix = directory if directory.endswith(os.sep) else directory + os.sep
+    children = {}
+    store = open_store(racine, config)
+    try:
+        for file_path, digest in store.digests_under(prefix):
+            name = file_path[len(prefix):]
+            if os.sep in name:
+                continue
+            digest = overrides.get(file_path, digest)
+            if digest is not None:
+                children[name] = (FILE, digest)
+    finally:
+        store.close()
+    return children
+
+# Fichiers de la base traités par lot lors d'une vérification (mémoire bornée par lot)
+HASH_BATCH_SIZE = 4096
+
+# Statistiques de la dernière passe de run_integrity_check (fichiers ignorés / re-hachés)
+last_scan_stats = {}
+# Arbre de Merkle de l'état courant calculé par la dernière passe :
+# {"roots": [...], "tree": {...}, "files": dossier -> fichiers du dossier (voir merkle.node_payload)}
+last_merkle = {}
+
+def run_integrity_check(incremental=None, paranoid_every=None, racine=None):
     """
     Fonction à appeler par l'agent pour obtenir les alertes d'intégrité et de permissions.
     Retourne une liste d'alertes (dictionnaires).
+    racine : dossier contenant monitor_config.json et la base de référence (par défaut la racine du projet).
+
+    La base de référence est lue en flux depuis baseline.db (voir store.py).
+    En mode incrémental (clé "incremental" de monitor_config.json), seuls les fichiers dont
+    l'empreinte stat (taille, mtime_ns, ctime_ns, inode) a changé sont re-hachés.
+    Avec "paranoid_every": N, une passe complète est forcée toutes les N exécutions.
+    Les compteurs de la passe sont disponibles dans last_scan_stats, et l'arbre de Merkle
+    de l'état courant (un digest par dossier, voir merkle.py) dans last_merkle.
     """
-    racine = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    racine = racine or os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     config_path = os.path.join(racine, "monitor_config.json")
-    checksum_path = os.path.join(racine, "checksums.json")
-    permissions_path = os.path.join(racine, "permissions_ref.json")
     alerts = []
     if not os.path.exists(config_path):
         alerts.append({"type": "error", "msg": f"Fichier de configuration introuvable: {config_path}"})
@@ -86,30 +182,117 @@ def run_integrity_check():
     if not paths:
         alerts.append({"type": "error", "msg": "Aucun chemin à surveiller dans la config."})
         return alerts
-    current_checksums = load_checksums(checksum_path)
-    if os.path.exists(permissions_path):
-        with open(permissions_path, "r") as f:
-            permissions_ref = json.load(f).get("permissions", {})
-    else:
-        permissions_ref = {}
-    for file_path, ref_checksum in current_checksums.items():
-        if os.path.exists(file_path):
-            new_checksum = compute_checksum(file_path)
-            if new_checksum and new_checksum != ref_checksum:
-                alerts.append({"type": "checksum", "file": file_path, "msg": "Modification détectée"})
-            current_perms = get_permissions(file_path)
-            ref_perms = permissions_ref.get(file_path)
-            if ref_perms and current_perms and current_perms != ref_perms:
-                alerts.append({"type": "permissions", "file": file_path, "msg": f"Permissions modifiées (réf: {ref_perms}, actuel: {current_perms})"})
-        else:
-            alerts.append({"type": "missing", "file": file_path, "msg": "Fichier manquant"})
+    if incremental is None:
+        incremental = config.get("incremental", False)
+    if paranoid_every is None:
+        paranoid_every = config.get("paranoid_every", 0)
+    workers = config.get("hash_workers")
+    executor = config.get("hash_executor", "thread")
+
+    store = open_store(racine, config)
+    try:
+        # Passe "paranoïaque" : re-hachage complet toutes les N exécutions
+        full_pass = not incremental
+        if incremental:
+            runs = store.get_meta("runs", 0) + 1
+            if paranoid_every and runs % paranoid_every == 0:
+                full_pass = True
+            store.set_meta("runs", runs)
+
+        # Parcours en flux de la base, par lots de HASH_BATCH_SIZE fichiers : stat de chaque fichier,
+        # hachage parallèle de ceux à re-hacher, puis ajout des digests à l'arbre de Merkle (dans l'ordre
+        # des chemins). La mémoire reste bornée par la taille d'un lot et le nombre de dossiers.
+        builder = TreeBuilder(paths)
+        # Fichiers dont le digest courant diffère de la référence (None : manquant ou illisible)
+        overrides = {}
+        refreshed = []
+        batch = []
+        counts = {"hashed": 0, "skipped": 0, "files": 0, "bytes": 0, "errors": 0, "seconds": 0.0}
+        max_bytes_per_s = max_hash_rate(config)
+        if workers is None:
+            workers = default_workers(executor)
+        pool = make_pool(workers, executor)
+
+        def process_batch():
+            to_hash = [record.path for record, signature, rehash in batch if rehash]
+            digests, throughput = hash_files(to_hash, workers=workers, executor=executor,
+                                             max_bytes_per_s=max_bytes_per_s, pool=pool)
+            for key in ("files", "bytes", "errors", "seconds"):
+                counts[key] += throughput[key]
+            counts["hashed"] += len(to_hash)
+            for record, signature, rehash in batch:
+                file_path = record.path
+                if not rehash:
+                    builder.add(file_path, record.digest)
+                    continue
+                new_checksum = digests[file_path]
+                if not new_checksum:
+                    overrides[file_path] = None
+                    continue
+                digest = bytes.fromhex(new_checksum)
+                builder.add(file_path, digest)
+                if digest != record.digest:
+                    overrides[file_path] = digest
+                    alerts.append({"type": "checksum", "file": file_path, "msg": "Modification détectée"})
+                elif incremental and record_signature(record) != signature:
+                    # Contenu identique (ex: touch) : on rafraîchit l'empreinte pour ignorer le fichier ensuite
+                    refreshed.append(record._replace(size=signature[0], mtime_ns=signature[1],
+                                                     ctime_ns=signature[2], inode=signature[3]))
+            batch.clear()
+
+        try:
+            for record in store:
+                file_path = record.path
+                try:
+                    st = os.stat(file_path)
+                except FileNotFoundError:
+                    alerts.append({"type": "missing", "file": file_path, "msg": "Fichier manquant"})
+                    overrides[file_path] = None
+                    continue
+                except Exception as e:
+                    print(f"Erreur lors de la récupération des stats pour {file_path}: {e}")
+                    overrides[file_path] = None
+                    continue
+                signature = stat_signature(st)
+                rehash = full_pass or record_signature(record) != signature
+                if not rehash:
+                    counts["skipped"] += 1
+                batch.append((record, signature, rehash))
+                # Les permissions sont vérifiées à chaque passe à partir du même stat
+                current_perms = st.st_mode & 0o777
+                if record.mode is not None and current_perms != record.mode:
+                    alerts.append({"type": "permissions", "file": file_path, "msg": f"Permissions modifiées (réf: {oct(record.mode)}, actuel: {oct(current_perms)})"})
+                if len(batch) >= HASH_BATCH_SIZE:
+                    process_batch()
+            process_batch()
+        finally:
+            if pool:
+                pool.shutdown()
+        if refreshed:
+            store.update_stats(refreshed)
+    finally:
+        store.close()
+
+    # L'arbre ne garde que les dossiers : les fichiers d'un dossier sont relus dans la base à la demande
+    last_merkle.clear()
+    last_merkle.update({"roots": paths, "tree": builder.finish(),
+                        "files": partial(file_children, racine, config, overrides)})
+
+    hashed, skipped = counts["hashed"], counts["skipped"]
+    throughput = throughput_stats(counts["files"], counts["bytes"], counts["errors"], counts["seconds"])
+    last_scan_stats.clear()
+    last_scan_stats.update({"hashed": hashed, "skipped": skipped, "full_pass": full_pass})
+    last_scan_stats.update(throughput)
+    if incremental:
+        print(f"Intégrité : {hashed} fichier(s) re-haché(s), {skipped} ignoré(s) (stat inchangé)"
+              + (" [passe complète]" if full_pass else ""))
+    print(f"Intégrité : {format_throughput(throughput)}")
     return alerts
 
 if __name__ == "__main__":
     # Les fichiers de config sont à la racine du projet
     racine = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     config_path = os.path.join(racine, "monitor_config.json")
-    checksum_path = os.path.join(racine, "checksums.json")
 
     if not os.path.exists(config_path):
         print(f"Fichier de configuration introuvable: {config_path}")
@@ -125,51 +308,26 @@ if __name__ == "__main__":
             print("Aucun chemin à surveiller dans le fichier de configuration.")
         else:
             # Réinitialisation de la base de référence à chaque exécution
-            checksums = {}
-            permissions_ref = {}
-            for path in paths:
-                if os.path.isfile(path):
-                    checksum = compute_checksum(path)
-                    perms = get_permissions(path)
-                    if checksum:
-                        checksums[path] = checksum
-                    if perms:
-                        permissions_ref[path] = perms
-                elif os.path.isdir(path):
-                    for root, _, files in os.walk(path):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            checksum = compute_checksum(file_path)
-                            perms = get_permissions(file_path)
-                            if checksum:
-                                checksums[file_path] = checksum
-                            if perms:
-                                permissions_ref[file_path] = perms
-            save_checksums(checksum_path, checksums)
-            # Sauvegarde des permissions de référence
-            with open(os.path.join(racine, "permissions_ref.json"), "w") as f:
-                json.dump({"permissions": permissions_ref}, f, indent=4)
+            rules = rules_from_config(config)
+            records = build_baseline(
+                paths, workers=config.get("hash_workers"), executor=config.get("hash_executor", "thread"),
+                rules=rules, max_bytes_per_s=max_hash_rate(config))
+            # Nouvelle base (écriture atomique) : le compteur de passes du mode incrémental repart de zéro
+            write_store(get_store_path(racine, config), records, meta={"runs": 0})
+            del records
             print("Base de référence des checksums et permissions réinitialisée.")
 
-            # Vérification périodique des checksums et permissions
+            # Surveillance événementielle (inotify) ou polling par stat en repli
+            store = open_store(racine, config)
             try:
-                while True:
-                    time.sleep(10)  # Vérifie toutes les 10 secondes
-                    current_checksums = load_checksums(checksum_path)
-                    # Chargement des permissions de référence
-                    with open(os.path.join(racine, "permissions_ref.json"), "r") as f:
-                        permissions_ref = json.load(f).get("permissions", {})
-                    for file_path, ref_checksum in current_checksums.items():
-                        if os.path.exists(file_path):
-                            new_checksum = compute_checksum(file_path)
-                            if new_checksum and new_checksum != ref_checksum:
-                                print(f"[ALERTE] Modification détectée (checksum) : {file_path}")
-                            # Vérification des permissions
-                            current_perms = get_permissions(file_path)
-                            ref_perms = permissions_ref.get(file_path)
-                            if ref_perms and current_perms and current_perms != ref_perms:
-                                print(f"[ALERTE] Permissions modifiées : {file_path} (réf: {ref_perms}, actuel: {current_perms})")
-                        else:
-                            print(f"[ALERTE] Fichier manquant : {file_path}")
+                watch(paths, store,
+                      mode=config.get("watch_mode", "auto"),
+                      debounce=config.get("watch_debounce", 0.5),
+                      poll_interval=config.get("poll_interval", 10),
+                      workers=config.get("hash_workers"),
+                      executor=config.get("hash_executor", "thread"),
+                      rules=rules, max_bytes_per_s=max_hash_rate(config))
             except KeyboardInterrupt:
                 print("Arrêt de la surveillance d'intégrité.")
+            finally:
+                store.close()
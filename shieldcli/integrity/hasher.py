@@ -0,0 +1,194 @@
+# Moteur de hachage parallèle pour ShieldCLI
+# Utilisé à la fois par la construction de la base de référence et par la vérification d'intégrité.
+
+import hashlib
+import mmap
+import os
+import threading
+import time
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+# Instrumentation disponible lorsque le module est importé depuis le package (agent, API)
+try:
+    from shieldcli import metrics
+except ImportError:
+    metrics = None
+
+if metrics:
+    FILES_HASHED = metrics.counter("shieldcli_files_hashed_total", "Fichiers hachés")
+    BYTES_READ = metrics.counter("shieldcli_hash_bytes_read_total", "Octets lus pour le hachage")
+    HASH_ERRORS = metrics.counter("shieldcli_hash_errors_total", "Erreurs de lecture lors du hachage")
+    HASH_SECONDS = metrics.histogram("shieldcli_hash_seconds", "Durée de hachage d'un fichier")
+    HASH_FILE_BYTES = metrics.histogram("shieldcli_hash_file_bytes", "Taille des fichiers hachés", metrics.SIZE_BUCKETS)
+
+# Au-delà de ce seuil, le fichier est haché via mmap (pas de copie dans un buffer Python)
+MMAP_THRESHOLD = 64 * 1024 * 1024
+# Taille des tranches passées à hashlib lors d'un hachage mmap
+MMAP_SLICE = 8 * 1024 * 1024
+
+def buffer_size(file_size):
+    """
+    Choisit une taille de buffer de lecture adaptée à la taille du fichier.
+    """
+    if file_size < 64 * 1024:
+        return 64 * 1024
+    if file_size < 16 * 1024 * 1024:
+        return 256 * 1024
+    return 1024 * 1024
+
+class Throttle:
+    """
+    Budget de lecture en octets par seconde, partagé par les threads d'un processus.
+    Chaque lecture est décomptée puis le worker attend que le budget soit revenu à zéro :
+    le débit cumulé des workers ne dépasse pas rate, quelle que soit la taille des lectures.
+    """
+
+    def __init__(self, rate):
+        self.rate = rate
+        self.allowance = 0.0
+        self.last = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self, n):
+        with self.lock:
+            now = time.monotonic()
+            # Au plus une seconde de budget non utilisé est conservée (pas de rafale après une pause)
+            self.allowance = min(self.rate, self.allowance + (now - self.last) * self.rate) - n
+            self.last = now
+            wait = -self.allowance / self.rate if self.allowance < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+    # Copie envoyée aux workers d'un pool de processus : verrou et horloge recréés
+    def __getstate__(self):
+        return {"rate": self.rate}
+
+    def __setstate__(self, state):
+        self.__init__(state["rate"])
+
+def hash_file(file_path, throttle=None):
+    """
+    Calcule le hash SHA256 d'un fichier.
+    Retourne un tuple (hash hexadécimal, octets lus). Lève une exception en cas d'erreur.
+    throttle : Throttle optionnel limitant le débit de lecture.
+    """
+    file_hash = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, len(mm), MMAP_SLICE):
+                        if throttle:
+                            throttle.consume(min(MMAP_SLICE, len(mm) - offset))
+                        file_hash.update(view[offset:offset + MMAP_SLICE])
+                    read = len(mm)
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(buffer_size(size))
+            view = memoryview(buf)
+            read = 0
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                file_hash.update(view[:n])
+                read += n
+                if throttle:
+                    throttle.consume(n)
+    return file_hash.hexdigest(), read
+
+def _hash_task(file_path, throttle=None):
+    # Les exceptions sont converties en message pour rester sérialisables (pool de processus) ;
+    # la durée est mesurée dans le worker et enregistrée par le processus principal
+    start = time.perf_counter()
+    try:
+        digest, read = hash_file(file_path, throttle)
+        return file_path, digest, read, None, time.perf_counter() - start
+    except Exception as e:
+        return file_path, None, 0, str(e), time.perf_counter() - start
+
+def default_workers(executor="thread"):
+    cpus = os.cpu_count() or 1
+    if executor == "process":
+        return cpus
+    # Les threads passent une partie de leur temps en attente d'I/O
+    return min(32, cpus * 2)
+
+def make_pool(workers=None, executor="thread"):
+    """
+    Pool de workers réutilisable entre plusieurs appels à hash_files (hachage par lots),
+    ou None si un seul worker est demandé. À fermer par l'appelant (shutdown()).
+    """
+    if workers is None:
+        workers = default_workers(executor)
+    if workers <= 1:
+        return None
+    pool_cls = ProcessPoolExecutor if executor == "process" else ThreadPoolExecutor
+    return pool_cls(max_workers=workers)
+
+def throughput_stats(files, total_bytes, errors, elapsed):
+    return {
+        "files": files,
+        "bytes": total_bytes,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "mb_per_s": round(total_bytes / (1024 * 1024) / elapsed, 2) if elapsed else 0.0,
+        "files_per_s": round(files / elapsed, 2) if elapsed else 0.0,
+    }
+
+def hash_files(file_paths, workers=None, executor="thread", max_bytes_per_s=None, pool=None):
+    """
+    Hache une liste de fichiers avec un pool de workers (threads par défaut, "process" en option).
+    hashlib relâche le GIL sur les gros update(), ce qui rend les threads efficaces.
+    max_bytes_per_s limite le débit de lecture total (réparti entre les processus en mode "process").
+    pool : pool existant (voir make_pool), conservé ouvert après l'appel ; workers doit alors
+    correspondre à sa taille.
+    Retourne un tuple ({chemin: hash ou None}, statistiques de débit).
+    """
+    file_paths = list(file_paths)
+    if workers is None:
+        workers = default_workers(executor)
+    shared = pool is not None
+    task = _hash_task
+    if max_bytes_per_s:
+        processes = workers if executor == "process" and workers > 1 and len(file_paths) > 1 else 1
+        task = partial(_hash_task, throttle=Throttle(max_bytes_per_s / processes))
+    results = {}
+    total_bytes = 0
+    errors = 0
+    start = time.perf_counter()
+    if workers <= 1 or len(file_paths) <= 1:
+        outputs = map(task, file_paths)
+    else:
+        if not shared:
+            pool = make_pool(workers, executor)
+        chunksize = max(1, len(file_paths) // (workers * 8)) if executor == "process" else 1
+        outputs = pool.map(task, file_paths, chunksize=chunksize)
+    try:
+        for file_path, digest, read, error, seconds in outputs:
+            if error:
+                print(f"Erreur lors du calcul du checksum pour {file_path}: {error}")
+                errors += 1
+            results[file_path] = digest
+            total_bytes += read
+            if metrics:
+                HASH_SECONDS.observe(seconds)
+                if not error:
+                    HASH_FILE_BYTES.observe(read)
+    finally:
+        if pool and not shared:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+    if metrics:
+        FILES_HASHED.inc(len(file_paths) - errors)
+        BYTES_READ.inc(total_bytes)
+        HASH_ERRORS.inc(errors)
+    return results, throughput_stats(len(file_paths), total_bytes, errors, elapsed)
+
+def format_throughput(stats):
+    return (f"{stats['files']} fichier(s), {stats['bytes'] / (1024 * 1024):.1f} Mo en {stats['seconds']} s "
+            f"({stats['mb_per_s']} Mo/s, {stats['files_per_s']} fichiers/s)")
@@ -0,0 +1,180 @@
+# Empreintes Merkle par dossier pour ShieldCLI
+# Le digest d'un dossier est le SHA256 de la liste triée de ses enfants (type, nom, digest) :
+# deux arbres identiques ont la même racine, et seuls les sous-arbres modifiés diffèrent.
+
+import hashlib
+import os
+
+FILE = "f"
+DIR = "d"
+
+def node_digest(children):
+    """
+    Calcule le digest d'un dossier à partir de ses enfants {nom: (type, digest)}.
+    """
+    h = hashlib.sha256()
+    for name in sorted(children):
+        kind, digest = children[name]
+        h.update(kind.encode())
+        h.update(b"\0")
+        h.update(name.encode("utf-8", "surrogateescape"))
+        h.update(b"\0")
+        h.update(digest)
+    return h.digest()
+
+def _root_of(path, roots):
+    best = None
+    for root in roots:
+        if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+            if best is None or len(root) > len(best):
+                best = root
+    return best
+
+def build_tree(entries, roots):
+    """
+    Construit l'arbre de Merkle des chemins surveillés.
+    entries : itérable de (chemin, digest brut) pour chaque fichier (par ex. résultats de compute_checksum).
+    roots : chemins configurés (fichiers ou dossiers).
+    Retourne {chemin: (type, digest, enfants)} où enfants vaut {nom: (type, digest)} pour un dossier
+    et None pour un fichier racine.
+    """
+    dirs = {}
+    tree = {}
+    for path, digest in entries:
+        root = _root_of(path, roots)
+        if root is None:
+            continue
+        if path == root:
+            tree[root] = (FILE, digest, None)
+            continue
+        root = root.rstrip(os.sep) or root
+        dirs.setdefault(root, {})
+        parent, name = os.path.split(path)
+        dirs.setdefault(parent, {})[name] = (FILE, digest)
+        # Enregistre la chaîne de dossiers jusqu'à la racine configurée
+        while parent != root:
+            grandparent, dirname = os.path.split(parent)
+            siblings = dirs.setdefault(grandparent, {})
+            if dirname in siblings or grandparent == parent:
+                break
+            siblings[dirname] = (DIR, None)
+            parent = grandparent
+    # Les dossiers les plus profonds d'abord : leurs digests alimentent ceux de leurs parents
+    for path in sorted(dirs, key=lambda p: p.count(os.sep), reverse=True):
+        children = dirs[path]
+        digest = node_digest(children)
+        tree[path] = (DIR, digest, children)
+        parent, name = os.path.split(path)
+        if parent in dirs and name in dirs[parent]:
+            dirs[parent][name] = (DIR, digest)
+    return tree
+
+def _is_under(path, directory):
+    return path.startswith(directory if directory.endswith(os.sep) else directory + os.sep)
+
+class TreeBuilder:
+    """
+    Construction en flux de l'arbre de Merkle, pour des fichiers fournis dans l'ordre des chemins
+    (ordre de la base de référence) : le sous-arbre d'un dossier est alors contigu, et un dossier est
+    clos dès que le parcours en sort. Seuls les dossiers ouverts (la branche courante) gardent
+    leurs enfants ; l'arbre produit ne contient que les digests des dossiers et de leurs sous-dossiers,
+    les fichiers sont fournis à la demande à node_payload.
+    Le digest obtenu est identique à celui de build_tree.
+    """
+
+    def __init__(self, roots):
+        self.roots = roots
+        self.tree = {}
+        # Par racine configurée : pile [(dossier, enfants {nom: (type, digest)})] de la branche ouverte
+        self.stacks = {}
+
+    def _close(self, stack):
+        path, children = stack.pop()
+        digest = node_digest(children)
+        self.tree[path] = (DIR, digest, {name: child for name, child in children.items() if child[0] == DIR})
+        if stack:
+            stack[-1][1][os.path.split(path)[1]] = (DIR, digest)
+
+    def add(self, path, digest):
+        root = _root_of(path, self.roots)
+        if root is None:
+            return
+        if path == root:
+            self.tree[root] = (FILE, digest, None)
+            return
+        root = root.rstrip(os.sep) or root
+        stack = self.stacks.setdefault(root, [])
+        parent, name = os.path.split(path)
+        # Ferme les dossiers dont le parcours est sorti, puis ouvre la branche jusqu'au parent
+        while stack and stack[-1][0] != parent and not _is_under(parent, stack[-1][0]):
+            self._close(stack)
+        if not stack:
+            stack.append((root, {}))
+        missing = []
+        directory = parent
+        while directory != stack[-1][0]:
+            missing.append(directory)
+            directory = os.path.dirname(directory)
+        for directory in reversed(missing):
+            stack.append((directory, {}))
+        stack[-1][1][name] = (FILE, digest)
+
+    def finish(self):
+        for stack in self.stacks.values():
+            while stack:
+                self._close(stack)
+        return self.tree
+
+def root_payload(tree, roots):
+    """
+    Résumé O(1) par chemin configuré : {racine: {"kind": type, "digest": hex}}.
+    """
+    payload = {}
+    for root in roots:
+        node = tree.get(root.rstrip(os.sep) or root)
+        if node:
+            payload[root.rstrip(os.sep) or root] = {"kind": node[0], "digest": node[1].hex()}
+    return payload
+
+def node_payload(tree, path, files=None):
+    """
+    Détail d'un dossier pour la descente : {"kind", "digest", "children": {nom: [type, hex]}}.
+    files : fonction dossier -> {nom: (FILE, digest)} pour un arbre construit par TreeBuilder,
+    dont les noeuds ne gardent que les sous-dossiers.
+    """
+    kind, digest, children = tree[path]
+    payload = {"kind": kind, "digest": digest.hex()}
+    if children is not None and files is not None:
+        children = dict(children, **files(path))
+    if children is not None:
+        payload["children"] = {name: [k, d.hex()] for name, (k, d) in children.items()}
+    return payload
+
+def join(path, name):
+    # Côté API, le séparateur est déduit du chemin envoyé par l'agent (Linux ou Windows)
+    sep = "\\" if "\\" in path and "/" not in path else "/"
+    return path + name if path.endswith(sep) else path + sep + name
+
+def diff_children(path, previous, current):
+    """
+    Compare deux listes d'enfants sérialisées ({nom: [type, hex]}).
+    Retourne (sous-dossiers à explorer, changements de fichiers [{"file", "change"}]).
+    """
+    previous = previous or {}
+    to_visit = []
+    changes = []
+    for name, (kind, digest) in current.items():
+        child = join(path, name)
+        old = previous.get(name)
+        if old is not None and old[0] == kind and old[1] == digest:
+            continue
+        if kind == DIR:
+            to_visit.append(child)
+            if old is not None and old[0] == FILE:
+                changes.append({"file": child, "change": "removed"})
+        else:
+            changes.append({"file": child, "change": "modified" if old and old[0] == FILE else "added"})
+    for name, (kind, _) in previous.items():
+        if name not in current:
+            changes.append({"file": join(path, name), "change": "removed" if kind == FILE else "removed_dir"})
+    return to_visit, changes
@@ -0,0 +1,249 @@
+# Base de référence compacte (SQLite) pour ShieldCLI
+# Remplace checksums.json et permissions_ref.json : un enregistrement par fichier avec
+# le digest SHA256 brut (32 octets), le mode, la taille, mtime/ctime et l'inode.
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from collections import namedtuple
+
+BaselineRecord = namedtuple("BaselineRecord", ["path", "digest", "mode", "size", "mtime_ns", "ctime_ns", "inode"])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    digest BLOB NOT NULL,
+    mode INTEGER,
+    size INTEGER,
+    mtime_ns INTEGER,
+    ctime_ns INTEGER,
+    inode INTEGER
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+def record_signature(record):
+    """
+    Empreinte stat d'un enregistrement, au format de file_monitor.stat_signature.
+    """
+    return [record.size, record.mtime_ns, record.ctime_ns, record.inode]
+
+class BaselineStore:
+    """
+    Accès à la base de référence : recherche par chemin, itération en flux (sans tout charger
+    en mémoire) et mise à jour transactionnelle des empreintes stat.
+    """
+
+    def __init__(self, store_path):
+        self.store_path = store_path
+        self.conn = sqlite3.connect(store_path)
+        self.conn.executescript(SCHEMA)
+
+    def get(self, path):
+        row = self.conn.execute(
+            "SELECT path, digest, mode, size, mtime_ns, ctime_ns, inode FROM files WHERE path = ?", (path,)
+        ).fetchone()
+        return BaselineRecord(*row) if row else None
+
+    def __contains__(self, path):
+        return self.conn.execute("SELECT 1 FROM files WHERE path = ?", (path,)).fetchone() is not None
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def __iter__(self):
+        cursor = self.conn.execute("SELECT path, digest, mode, size, mtime_ns, ctime_ns, inode FROM files ORDER BY path")
+        for row in cursor:
+            yield BaselineRecord(*row)
+
+    def paths(self):
+        for row in self.conn.execute("SELECT path FROM files ORDER BY path"):
+            yield row[0]
+
+    def paths_under(self, prefix):
+        """
+        Chemins de référence situés sous un dossier (prefix terminé par le séparateur).
+        """
+        # Intervalle [prefix, prefix + U+10FFFF) : utilise l'index de la clé primaire
+        for row in self.conn.execute("SELECT path FROM files WHERE path >= ? AND path < ? ORDER BY path",
+                                     (prefix, prefix + "\U0010ffff")):
+            yield row[0]
+
+    def digests_under(self, prefix):
+        """
+        Couples (chemin, digest) de référence situés sous un dossier (prefix terminé par le séparateur).
+        """
+        for row in self.conn.execute("SELECT path, digest FROM files WHERE path >= ? AND path < ? ORDER BY path",
+                                     (prefix, prefix + "\U0010ffff")):
+            yield row[0], row[1]
+
+    def get_meta(self, key, default=None):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def set_meta(self, key, value):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+
+    def update_stats(self, records):
+        """
+        Met à jour l'empreinte stat de fichiers dont le contenu n'a pas changé (une seule transaction).
+        """
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE files SET size = ?, mtime_ns = ?, ctime_ns = ?, inode = ? WHERE path = ?",
+                [(r.size, r.mtime_ns, r.ctime_ns, r.inode, r.path) for r in records])
+
+    def close(self):
+        self.conn.close()
+
+def write_store(store_path, records, meta=None):
+    """
+    Écrit une nouvelle base de référence de façon atomique : fichier temporaire puis renommage.
+    records est un itérable de BaselineRecord (consommé en flux).
+    """
+    directory = os.path.dirname(os.path.abspath(store_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".baseline-", suffix=".db", dir=directory)
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("PRAGMA journal_mode = OFF")
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.executescript(SCHEMA)
+            with conn:
+                conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)", records)
+                for key, value in (meta or {}).items():
+                    conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+        finally:
+            conn.close()
+        # Le fichier temporaire doit être sur disque avant de remplacer l'ancienne base
+        with open(tmp_path, "rb+") as f:
+            os.fsync(f.fileno())
+        os.replace(tmp_path, store_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def migrate_json(checksum_path, permissions_path, store_path):
+    """
+    Migration unique depuis checksums.json / permissions_ref.json vers la base SQLite.
+    Retourne le nombre de fichiers migrés.
+    """
+    with open(checksum_path, "r") as f:
+        data = json.load(f)
+    checksums = data.get("checksums", {})
+    stats = data.get("stats", {})
+    permissions = {}
+    if permissions_path and os.path.exists(permissions_path):
+        with open(permissions_path, "r") as f:
+            permissions = json.load(f).get("permissions", {})
+
+    def records():
+        for path, checksum in checksums.items():
+            perms = permissions.get(path)
+            size, mtime_ns, ctime_ns, inode = stats.get(path) or (None, None, None, None)
+            yield BaselineRecord(path, bytes.fromhex(checksum), int(perms, 8) if perms else None,
+                                 size, mtime_ns, ctime_ns, inode)
+
+    write_store(store_path, records(), meta={"runs": 0, "migrated_from": os.path.basename(checksum_path)})
+    return len(checksums)
+
+def _current_rss_kb():
+    # RSS courant (Linux) ; à défaut, pic RSS du processus
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en Ko sous Linux
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+def _bench_load(fmt, directory, lookups):
+    """
+    Charge la base dans un processus isolé et affiche sur stdout :
+    "temps_recherche_s temps_parcours_s rss_ko".
+    """
+    base_rss = _current_rss_kb()
+    start = time.perf_counter()
+    if fmt == "json":
+        # Le format JSON impose de tout parser avant la moindre recherche
+        with open(os.path.join(directory, "checksums.json")) as f:
+            checksums = json.load(f)["checksums"]
+        with open(os.path.join(directory, "permissions_ref.json")) as f:
+            permissions = json.load(f)["permissions"]
+        found = sum(1 for path in lookups if path in checksums and permissions.get(path))
+        lookup_time = time.perf_counter() - start
+        count = sum(1 for path in checksums if permissions.get(path))
+    else:
+        store = BaselineStore(os.path.join(directory, "baseline.db"))
+        found = sum(1 for path in lookups if store.get(path))
+        lookup_time = time.perf_counter() - start
+        count = sum(1 for record in store if record.mode is not None)
+    elapsed = time.perf_counter() - start
+    rss = _current_rss_kb() - base_rss
+    assert found == len(lookups) and count
+    print(f"{lookup_time:.4f} {elapsed:.4f} {rss}")
+
+def benchmark(count=200000):
+    """
+    Compare le chargement JSON (checksums.json + permissions_ref.json) et SQLite sur une base synthétique.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        checksums = {}
+        stats = {}
+        permissions = {}
+        for i in range(count):
+            path = f"/srv/data/{i % 1000:03d}/file_{i}.bin"
+            checksums[path] = os.urandom(32).hex()
+            stats[path] = [i, i * 1000, i * 1000, i]
+            permissions[path] = "0o644"
+        checksum_path = os.path.join(directory, "checksums.json")
+        permissions_path = os.path.join(directory, "permissions_ref.json")
+        with open(checksum_path, "w") as f:
+            json.dump({"checksums": checksums, "stats": stats}, f, indent=4)
+        with open(permissions_path, "w") as f:
+            json.dump({"permissions": permissions}, f, indent=4)
+        del checksums, stats, permissions
+        migrate_json(checksum_path, permissions_path, os.path.join(directory, "baseline.db"))
+
+        print(f"Base synthétique de {count} fichiers")
+        sizes = {
+            "json": os.path.getsize(checksum_path) + os.path.getsize(permissions_path),
+            "sqlite": os.path.getsize(os.path.join(directory, "baseline.db")),
+        }
+        for fmt in ("json", "sqlite"):
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "_load", fmt, directory, str(count)],
+                                 capture_output=True, text=True, check=True).stdout.split()
+            print(f"  {fmt:<6} : taille {sizes[fmt] / (1024 * 1024):.1f} Mo, "
+                  f"1000 recherches {float(out[0]):.3f} s, parcours complet {float(out[1]):.3f} s, "
+                  f"RSS +{int(out[2]) / 1024:.1f} Mo")
+
+if __name__ == "__main__":
+    racine = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    command = sys.argv[1] if len(sys.argv) > 1 else "migrate"
+    if command == "migrate":
+        store_path = os.path.join(racine, "baseline.db")
+        migrated = migrate_json(os.path.join(racine, "checksums.json"),
+                                os.path.join(racine, "permissions_ref.json"), store_path)
+        print(f"{migrated} fichier(s) migré(s) vers {store_path}")
+    elif command == "bench":
+        benchmark(int(sys.argv[2]) if len(sys.argv) > 2 else 200000)
+    elif command == "_load":
+        total = int(sys.argv[4])
+        _bench_load(sys.argv[2], sys.argv[3],
+                    [f"/srv/data/{i % 1000:03d}/file_{i}.bin" for i in range(0, total, max(1, total // 1000))])
+    else:
+        print("Usage : python shieldcli/integrity/store.py [migrate | bench [N]]")
@@ -0,0 +1,130 @@
+# Parcours des arborescences surveillées pour ShieldCLI
+# Basé sur os.scandir : le type de chaque entrée vient du dossier lu (pas de stat pour les dossiers)
+# et le stat d'un fichier est fait une seule fois puis réutilisé (empreinte, permissions, taille).
+# Règles de sélection : motifs include / exclude compilés, taille maximale, fichiers réguliers
+# uniquement (sockets, FIFO et périphériques ignorés), liens symboliques non suivis par défaut.
+
+import fnmatch
+import os
+import re
+import stat
+
+class WalkRules:
+    """
+    include : motifs de fichiers à retenir (tous si vide) ; exclude : motifs de fichiers ou de dossiers
+    à ignorer (un dossier exclu n'est pas parcouru). Un motif contenant "/" porte sur le chemin complet
+    (ex. "*/cache/*"), sinon sur le nom (ex. "*.log"). max_size en octets (None = sans limite).
+    """
+
+    def __init__(self, include=None, exclude=None, max_size=None, follow_symlinks=False):
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+        self.max_size = max_size
+        self.follow_symlinks = follow_symlinks
+
+    @staticmethod
+    def _normalize(value):
+        if os.sep == "/":
+            return value
+        # Windows : motifs et chemins comparés sans tenir compte de la casse, avec des "/"
+        return os.path.normcase(value).replace(os.sep, "/")
+
+    @classmethod
+    def _compile(cls, patterns):
+        # Un seul regex par catégorie (chemin / nom) plutôt qu'un fnmatch par motif et par fichier
+        by_path = [fnmatch.translate(cls._normalize(p)) for p in patterns or [] if "/" in p or "\\" in p]
+        by_name = [fnmatch.translate(cls._normalize(p)) for p in patterns or [] if "/" not in p and "\\" not in p]
+        return (re.compile("|".join(by_path)) if by_path else None,
+                re.compile("|".join(by_name)) if by_name else None)
+
+    def _matches(self, compiled, path, name):
+        by_path, by_name = compiled
+        return bool((by_name and by_name.match(self._normalize(name)))
+                    or (by_path and by_path.match(self._normalize(path))))
+
+    def excluded(self, path, name):
+        return self._matches(self.exclude, path, name)
+
+    def selected(self, path, name):
+        if self.excluded(path, name):
+            return False
+        return self.include == (None, None) or self._matches(self.include, path, name)
+
+def rules_from_config(config):
+    """
+    Règles de parcours de monitor_config.json : "include", "exclude", "max_size_mb", "follow_symlinks".
+    """
+    max_size_mb = config.get("max_size_mb")
+    return WalkRules(config.get("include"), config.get("exclude"),
+                     int(max_size_mb * 1024 * 1024) if max_size_mb else None,
+                     config.get("follow_symlinks", False))
+
+def walk(paths, rules=None):
+    """
+    Générateur (chemin, os.stat_result) des fichiers réguliers retenus sous les chemins configurés.
+    Un chemin configuré qui désigne directement un fichier est retenu sans appliquer les motifs ;
+    les chemins configurés eux-mêmes sont toujours résolus, même s'il s'agit de liens symboliques.
+    """
+    rules = rules or WalkRules()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            print(f"Erreur lors de la récupération des stats pour {path}: {e}")
+            continue
+        if stat.S_ISDIR(st.st_mode):
+            yield from _walk_tree(path, st, rules)
+        elif stat.S_ISREG(st.st_mode) and (rules.max_size is None or st.st_size <= rules.max_size):
+            yield path, st
+
+def iter_dirs(paths, rules=None):
+    """
+    Générateur des dossiers parcourus (racines comprises), dossiers exclus ignorés.
+    """
+    rules = rules or WalkRules()
+    for path in paths:
+        if os.path.isdir(path):
+            yield path
+            yield from _walk_tree(path, None, rules, dirs=True)
+
+def _walk_tree(root, root_st, rules, dirs=False):
+    follow = rules.follow_symlinks
+    # Liens suivis : les dossiers déjà visités (dev, inode) sont ignorés pour éviter les boucles
+    visited = {(root_st.st_dev, root_st.st_ino)} if follow and root_st is not None else set()
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError as e:
+            print(f"Erreur lors du parcours de {directory}: {e}")
+            continue
+        subdirs = []
+        for entry in entries:
+            try:
+                if not follow and entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=follow):
+                    if rules.excluded(entry.path, entry.name):
+                        continue
+                    if follow:
+                        st = entry.stat()
+                        if (st.st_dev, st.st_ino) in visited:
+                            continue
+                        visited.add((st.st_dev, st.st_ino))
+                    subdirs.append(entry.path)
+                    continue
+                # Sockets, FIFO, périphériques : ni fichier ni dossier pour scandir
+                if dirs or not entry.is_file(follow_symlinks=follow) or not rules.selected(entry.path, entry.name):
+                    continue
+                st = entry.stat(follow_symlinks=follow)
+            except OSError as e:
+                print(f"Erreur lors de la récupération des stats pour {entry.path}: {e}")
+                continue
+            if rules.max_size is None or st.st_size <= rules.max_size:
+                yield entry.path, st
+        if dirs:
+            yield from subdirs
+        # Parcours en profondeur dans l'ordre de lecture des dossiers
+        stack.extend(reversed(subdirs))
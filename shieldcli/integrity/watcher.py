@@ -0,0 +1,273 @@
+# Surveillance événementielle des fichiers pour ShieldCLI
+# Utilise inotify (Linux, binding ctypes local) et se replie sur un polling par stat ailleurs.
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+try:
+    from shieldcli.integrity.hasher import hash_files
+    from shieldcli.integrity.walker import iter_dirs
+except ImportError:
+    from hasher import hash_files
+    from walker import iter_dirs
+
+# Constantes inotify (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; char name[]; }
+_EVENT_HEADER = struct.Struct("iIII")
+
+# Valeur renvoyée par read_events quand tous les fichiers doivent être revérifiés (file d'événements saturée)
+ALL = None
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+_libc = _load_libc()
+
+def inotify_available():
+    return _libc is not None
+
+class InotifyWatcher:
+    """
+    Watcher inotify récursif : un watch par dossier, ajouté automatiquement pour les nouveaux dossiers.
+    read_events() retourne les chemins touchés ; un dossier supprimé/déplacé est suffixé par os.sep.
+    """
+
+    def __init__(self, paths, rules=None):
+        if _libc is None:
+            raise OSError(errno.ENOSYS, "inotify indisponible")
+        self.fd = _libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.wds = {}
+        # Les dossiers exclus par les règles de parcours (caches, logs...) ne sont pas surveillés
+        self.rules = rules
+        try:
+            for path in paths:
+                if os.path.isdir(path):
+                    self.add_tree(path)
+                else:
+                    # Un fichier est surveillé via son dossier parent pour survivre aux remplacements (rename)
+                    self.add_watch(os.path.dirname(os.path.abspath(path)))
+        except OSError:
+            self.close()
+            raise
+
+    def add_watch(self, directory):
+        wd = _libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK | IN_ONLYDIR | IN_DONT_FOLLOW)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                return None
+            # ENOSPC : limite fs.inotify.max_user_watches atteinte
+            raise OSError(err, f"inotify_add_watch({directory}): {os.strerror(err)}")
+        self.wds[wd] = directory
+        return wd
+
+    def add_tree(self, root):
+        if self.rules and self.rules.excluded(root, os.path.basename(root)):
+            return
+        for directory in iter_dirs([root], self.rules):
+            self.add_watch(directory)
+
+    def read_events(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        touched = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                touched.append(ALL)
+                continue
+            directory = self.wds.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.wds[wd]
+                continue
+            path = os.path.join(directory, os.fsdecode(name)) if name else directory
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Nouveau dossier : watches récursifs, et son contenu est revérifié
+                    try:
+                        self.add_tree(path)
+                    except OSError as e:
+                        print(f"Erreur lors de l'ajout du watch pour {path}: {e}")
+                touched.append(path + os.sep)
+            elif mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                touched.append(directory + os.sep)
+            else:
+                touched.append(path)
+        return touched
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    """
+    Repli sans inotify : compare toutes les poll_interval secondes l'empreinte stat des fichiers de référence.
+    """
+
+    def __init__(self, file_paths, poll_interval=10):
+        self.poll_interval = poll_interval
+        self.signatures = {path: self._signature(path) for path in file_paths}
+        self.next_poll = time.monotonic() + poll_interval
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_mode)
+
+    def read_events(self, timeout=None):
+        delay = max(0.0, self.next_poll - time.monotonic())
+        if timeout is not None and timeout < delay:
+            time.sleep(timeout)
+            return []
+        time.sleep(delay)
+        self.next_poll = time.monotonic() + self.poll_interval
+        touched = []
+        for path, previous in self.signatures.items():
+            current = self._signature(path)
+            if current != previous:
+                self.signatures[path] = current
+                touched.append(path)
+        return touched
+
+    def close(self):
+        pass
+
+def check_files(file_paths, store, workers=None, executor="thread", max_bytes_per_s=None):
+    """
+    Vérifie un sous-ensemble de fichiers de la base de référence (BaselineStore).
+    max_bytes_per_s : budget de lecture du hachage (voir hasher.Throttle).
+    Retourne une liste d'alertes au même format que run_integrity_check.
+    """
+    alerts = []
+    existing = {}
+    for file_path in file_paths:
+        record = store.get(file_path)
+        if record is None:
+            continue
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            alerts.append({"type": "missing", "file": file_path, "msg": "Fichier manquant"})
+            continue
+        except Exception as e:
+            print(f"Erreur lors de la récupération des stats pour {file_path}: {e}")
+            continue
+        existing[file_path] = record
+        current_perms = st.st_mode & 0o777
+        if record.mode is not None and current_perms != record.mode:
+            alerts.append({"type": "permissions", "file": file_path, "msg": f"Permissions modifiées (réf: {oct(record.mode)}, actuel: {oct(current_perms)})"})
+    digests, _ = hash_files(existing, workers=workers, executor=executor, max_bytes_per_s=max_bytes_per_s)
+    for file_path, new_checksum in digests.items():
+        if new_checksum and bytes.fromhex(new_checksum) != existing[file_path].digest:
+            alerts.append({"type": "checksum", "file": file_path, "msg": "Modification détectée"})
+    return alerts
+
+def print_alert(alert):
+    print(f"[ALERTE] {alert['msg']} : {alert.get('file', '')}")
+
+def watch(paths, store, on_alert=print_alert, mode="auto", debounce=0.5,
+          max_delay=5, poll_interval=10, workers=None, executor="thread", rules=None, max_bytes_per_s=None):
+    """
+    Boucle de surveillance : seuls les fichiers de référence ayant reçu un événement
+    (écriture, attributs, déplacement, suppression) sont re-vérifiés.
+    Les rafales d'événements sur un même fichier sont regroupées pendant `debounce` secondes
+    (au plus `max_delay` secondes pour un fichier modifié en continu).
+    mode : "auto" (inotify si disponible), "inotify" ou "poll".
+    rules : règles de parcours (walker.WalkRules), les dossiers exclus ne sont pas surveillés.
+    max_bytes_per_s : budget de lecture du re-hachage (une rafale d'événements ne sature pas le disque).
+    """
+    watcher = None
+    if mode in ("auto", "inotify"):
+        try:
+            watcher = InotifyWatcher(paths, rules)
+            print(f"Surveillance inotify active ({len(watcher.wds)} dossier(s)).")
+        except OSError as e:
+            if mode == "inotify":
+                raise
+            print(f"inotify indisponible ({e}), repli sur le polling toutes les {poll_interval} s.")
+    if watcher is None:
+        watcher = PollingWatcher(store.paths(), poll_interval)
+
+    # {chemin: (premier événement, dernier événement)}
+    pending = {}
+
+    def touch(path, now):
+        first = pending[path][0] if path in pending else now
+        pending[path] = (first, now)
+
+    try:
+        while True:
+            for path in watcher.read_events(debounce if pending else None):
+                now = time.monotonic()
+                if path is ALL:
+                    for f in store.paths():
+                        touch(f, now)
+                elif path.endswith(os.sep):
+                    # Dossier créé, supprimé ou déplacé : tous les fichiers de référence dessous
+                    for f in store.paths_under(path):
+                        touch(f, now)
+                elif path in store:
+                    touch(path, now)
+            now = time.monotonic()
+            ready = [path for path, (first, last) in pending.items()
+                     if now - last >= debounce or now - first >= max_delay]
+            if not ready:
+                continue
+            for path in ready:
+                del pending[path]
+            for alert in check_files(ready, store, workers=workers, executor=executor,
+                                     max_bytes_per_s=max_bytes_per_s):
+                on_alert(alert)
+    finally:
+        watcher.close()
@@ -0,0 +1,99 @@
+# Inventaire des actifs découverts (voir Discovery/subnet_discovery.py)
+# Un actif est identifié par son adresse MAC lorsqu'elle est connue, sinon par son IP (hôtes hors du
+# segment local, sans MAC). Une soumission est comparée à l'inventaire en mémoire : seuls les
+# changements (nouvel hôte, changement d'IP ou de MAC, changement d'OS) produisent un événement.
+
+import re
+
+UNKNOWN = ("", "inconnu", "unknown", None)
+HEX_MAC = re.compile(r"[0-9a-f]{12}")
+
+def normalize_mac(mac):
+    """
+    MAC en minuscules séparée par ':' ; None si elle est absente ou invalide ("Inconnu"...).
+    """
+    if not mac:
+        return None
+    digits = str(mac).lower().replace(":", "").replace("-", "").replace(".", "")
+    if not HEX_MAC.fullmatch(digits):
+        return None
+    return ":".join((digits[0:2], digits[2:4], digits[4:6], digits[6:8], digits[8:10], digits[10:12]))
+
+def known(value):
+    return None if value is None or str(value).strip().lower() in UNKNOWN else str(value).strip()
+
+def normalize_host(host):
+    return {
+        "ip": known(host.get("ip")),
+        "mac": normalize_mac(host.get("mac")),
+        "hostname": known(host.get("hostname")),
+        "device_type": known(host.get("device_type")),
+        "os": known(host.get("os")),
+    }
+
+def diff_assets(hosts, by_mac, by_ip, timestamp, network=None, agent_id=None):
+    """
+    Applique une soumission d'hôtes normalisés à l'inventaire existant.
+    by_mac {mac: ligne} et by_ip {ip: ligne la plus récente} contiennent les actifs existants
+    concernés (dictionnaires avec "id") ; ils sont mis à jour au fil de la soumission.
+    Retourne (lignes à insérer, lignes existantes modifiées, événements).
+    """
+    inserts = []
+    updates = {}
+    events = []
+
+    def event(row, change, old=None, new=None):
+        events.append({"timestamp": timestamp, "agent_id": agent_id, "network": network, "ip": row["ip"],
+                       "mac": row["mac"], "change": change, "old_value": old, "new_value": new})
+
+    def touch(row):
+        if row.get("id") is not None:
+            updates[row["id"]] = row
+
+    for host in hosts:
+        mac, ip = host["mac"], host["ip"]
+        if not mac and not ip:
+            continue
+        row = by_mac.get(mac) if mac else None
+        previous = None
+        if row is None and ip:
+            at_ip = by_ip.get(ip)
+            if at_ip is not None and (not mac or not at_ip["mac"]):
+                # Même hôte vu sans MAC (scan distant) ou dont la MAC n'était pas encore connue
+                row = at_ip
+                if mac:
+                    row["mac"] = mac
+                    by_mac[mac] = row
+            elif at_ip is not None:
+                # L'IP est désormais portée par une autre interface
+                previous = at_ip
+        if row is None:
+            row = {"id": None, "mac": mac, "ip": ip, "hostname": host["hostname"],
+                   "device_type": host["device_type"], "os": host["os"], "network": network,
+                   "agent_id": agent_id, "first_seen": timestamp, "last_seen": timestamp}
+            inserts.append(row)
+            if mac:
+                by_mac[mac] = row
+            if ip:
+                by_ip[ip] = row
+            if previous is not None:
+                event(row, "mac_changed", previous["mac"], mac)
+            else:
+                event(row, "new", None, mac or ip)
+            continue
+        if ip and row["ip"] != ip:
+            old_ip, row["ip"] = row["ip"], ip
+            by_ip[ip] = row
+            event(row, "ip_changed", old_ip, ip)
+        if host["os"] and row["os"] != host["os"]:
+            event(row, "os_changed", row["os"], host["os"])
+            row["os"] = host["os"]
+        # Informations complétées sans événement (résolution DNS, base OUI plus récente)
+        for field in ("hostname", "device_type"):
+            if host[field]:
+                row[field] = host[field]
+        row["network"] = network or row["network"]
+        row["agent_id"] = agent_id or row["agent_id"]
+        row["last_seen"] = timestamp
+        touch(row)
+    return inserts, list(updates.values()), events
@@ -0,0 +1,75 @@
+# Événements de logs structurés
+# Chaque ligne retenue devient un événement {timestamp, host, source, severity, message, rule}
+# envoyé à l'API par l'agent (au lieu des fichiers TXT/CSV bruts).
+
+import datetime
+import re
+
+try:
+    from shieldcli.logs.line_filter import REGEX_CHARS, TimestampParser
+except ImportError:
+    from line_filter import REGEX_CHARS, TimestampParser
+
+SEVERITIES = ('debug', 'info', 'notice', 'warning', 'error', 'critical')
+DEFAULT_SEVERITY = 'notice'
+
+def make_event(timestamp, host, source, severity, message, rule=None):
+    return {
+        'timestamp': timestamp,
+        'host': host,
+        'source': source,
+        'severity': severity,
+        'message': message,
+        'rule': rule,
+    }
+
+def compile_rules(keywords):
+    """
+    Retourne une fonction line -> premier mot-clé (règle) présent dans la ligne, ou None.
+    """
+    rules = []
+    for kw in keywords or []:
+        if REGEX_CHARS.intersection(kw):
+            pattern = re.compile(kw, re.IGNORECASE)
+            rules.append((kw, lambda line, pattern=pattern: pattern.search(line) is not None))
+        else:
+            literal = kw.lower()
+            rules.append((kw, lambda line, literal=literal: literal in line.lower()))
+
+    def rule_of(line):
+        for kw, matches in rules:
+            if matches(line):
+                return kw
+        return None
+    return rule_of
+
+class EventBuilder:
+    """
+    Convertit une ligne syslog / RFC3339 retenue en événement structuré.
+    severities : {mot-clé: sévérité} ; host par défaut si la ligne n'en contient pas.
+    """
+
+    def __init__(self, keywords, severities=None, host=None, year=None):
+        self.rule_of = compile_rules(keywords)
+        self.severities = severities or {}
+        self.host = host
+        self.parse = TimestampParser(year or datetime.datetime.now().year)
+
+    def __call__(self, source, line):
+        dt = self.parse(line)
+        host = self.host
+        message = line
+        if dt is not None:
+            # "Jun  1 10:00:00 hôte programme: message" / "2025-06-01T10:00:00+02:00 hôte programme: message"
+            if line[:1].isdigit():
+                rest = line.split(' ', 1)[1] if ' ' in line else ''
+            else:
+                rest = line[15:]
+            parts = rest.split(None, 1)
+            if parts:
+                host = parts[0]
+                message = parts[1] if len(parts) > 1 else ''
+        rule = self.rule_of(line)
+        severity = self.severities.get(rule, DEFAULT_SEVERITY) if rule else DEFAULT_SEVERITY
+        return make_event(dt.isoformat() if dt else datetime.datetime.now().isoformat(timespec='seconds'),
+                          host, source, severity, message.strip(), rule)
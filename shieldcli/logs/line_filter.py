@@ -0,0 +1,104 @@
+# Filtre rapide des lignes de logs
+# Le filtre est compilé une fois par exécution : recherche littérale ou expression régulière
+# unique pour tous les mots-clés, analyseur d'horodatage syslog / RFC3339 sans strptime avec un
+# cache par seconde, et fenêtre temporelle vérifiée avant les mots-clés.
+
+import datetime
+import functools
+import re
+
+MONTHS = {name: i for i, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+class TimestampParser:
+    """
+    Horodatage en début de ligne : syslog ("Jun  1 10:00:00", année fournie) ou RFC3339
+    ("2025-06-01T10:00:00..." : fuseau et fractions de seconde ignorés). Retourne None sinon.
+    Les lignes consécutives d'une même seconde réutilisent le résultat précédent.
+    """
+
+    def __init__(self, year):
+        self.year = year
+        # (clé, résultat) remplacé d'un bloc : un filtre partagé entre threads reste cohérent
+        self.last = (None, None)
+
+    def __call__(self, line):
+        rfc3339 = line[:1].isdigit()
+        key = line[:19] if rfc3339 else line[:15]
+        last_key, last = self.last
+        if key == last_key:
+            return last
+        try:
+            if rfc3339:
+                if key[4] != '-' or key[7] != '-' or key[10] not in 'T ' or key[13] != ':' or key[16] != ':':
+                    raise ValueError
+                dt = datetime.datetime(int(key[:4]), int(key[5:7]), int(key[8:10]),
+                                       int(key[11:13]), int(key[14:16]), int(key[17:19]))
+            else:
+                if key[3] != ' ' or key[6] != ' ' or key[9] != ':' or key[12] != ':':
+                    raise ValueError
+                dt = datetime.datetime(self.year, MONTHS[key[:3]], int(key[4:6]),
+                                       int(key[7:9]), int(key[10:12]), int(key[13:15]))
+        except (ValueError, KeyError, IndexError):
+            dt = None
+        self.last = (key, dt)
+        return dt
+
+# Caractères ayant un sens particulier dans une expression régulière
+REGEX_CHARS = set('.^$*+?{}[]\\|()')
+
+def compile_keywords(keywords):
+    """
+    Retourne une fonction line -> bool équivalente à re.search (insensible à la casse) sur chacun
+    des mots-clés, ou None sans mot-clé. Des mots-clés littéraux sont recherchés sur la ligne en
+    minuscules (nettement plus rapide que le mode IGNORECASE de re), les autres sont réunis dans
+    une seule expression régulière.
+    """
+    if not keywords:
+        return None
+    if not any(REGEX_CHARS.intersection(kw) for kw in keywords):
+        literals = [kw.lower() for kw in keywords]
+        if len(literals) == 1:
+            literal = literals[0]
+            return lambda line: literal in line.lower()
+
+        def search(line):
+            lowered = line.lower()
+            for literal in literals:
+                if literal in lowered:
+                    return True
+            return False
+        return search
+    pattern = re.compile('|'.join(f'(?:{kw})' for kw in keywords), re.IGNORECASE)
+    return lambda line: pattern.search(line) is not None
+
+def compile_filter(since, until, keywords, year=None):
+    """
+    Retourne une fonction line -> bool équivalente à filter_line(line, since, until, keywords).
+    """
+    search = compile_keywords(keywords)
+    parse = TimestampParser(year or datetime.datetime.now().year) if since or until else None
+
+    def match(line):
+        # Fenêtre temporelle d'abord : l'horodatage est en cache pour les lignes d'une même seconde
+        if parse:
+            dt = parse(line)
+            if dt is not None:
+                if since and dt < since:
+                    return False
+                if until and dt > until:
+                    return False
+        return search is None or search(line)
+
+    return match
+
+@functools.lru_cache(maxsize=32)
+def _cached_filter(since, until, keywords, year):
+    return compile_filter(since, until, list(keywords), year)
+
+def cached_filter(since, until, keywords, year=None):
+    """
+    compile_filter mis en cache par (since, until, mots-clés, année) : les appels ligne par ligne
+    avec les mêmes paramètres réutilisent le même filtre compilé.
+    """
+    return _cached_filter(since, until, tuple(keywords or ()), year or datetime.date.today().year)
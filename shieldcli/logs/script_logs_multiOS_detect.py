@@ -2,9 +2,19 @@ import json
 import os
 import csv
 import datetime
-import re
 import platform
 
+try:
+    from shieldcli.logs.events import EventBuilder
+    from shieldcli.logs.line_filter import cached_filter, compile_filter
+    from shieldcli.logs.parallel_scan import scan_files
+    from shieldcli.logs.tailer import load_checkpoints, save_checkpoints, tail_file
+except ImportError:
+    from events import EventBuilder
+    from line_filter import cached_filter, compile_filter
+    from parallel_scan import scan_files
+    from tailer import load_checkpoints, save_checkpoints, tail_file
+
 try:
     import win32evtlog
 except ImportError:
@@ -18,38 +28,55 @@ def parse_iso(dt_str):
     return datetime.datetime.fromisoformat(dt_str) if dt_str else None
 
 def filter_line(line, since, until, keywords):
-    try:
-        parts = line.split()
-        dt = datetime.datetime.strptime(
-            f"{parts[0]} {parts[1]} {datetime.datetime.now().year} {parts[2]}",
-            "%b %d %Y %H:%M:%S"
-        )
-    except Exception:
-        dt = None
-    if dt:
-        if since and dt < since:
-            return False
-        if until and dt > until:
-            return False
-    if keywords and not any(re.search(kw, line, re.IGNORECASE) for kw in keywords):
-        return False
-    return True
+    # Filtre compilé au premier appel puis réutilisé tant que since / until / keywords ne changent pas
+    return cached_filter(since, until, keywords)(line)
 
 # Logs Linux
-def fetch_linux(cfg):
+def iter_linux(cfg, checkpoints=None):
+    """
+    Générateur des entrées filtrées, fichier par fichier (mémoire constante).
+    Avec checkpoints (mode tail), seules les lignes ajoutées depuis le dernier passage sont lues ;
+    sinon, avec "parallel", les fichiers sont analysés par tranches dans un pool de processus.
+    """
     since = parse_iso(cfg['filters'].get('since', ''))
     until = parse_iso(cfg['filters'].get('until', ''))
     keywords = cfg['filters'].get('keywords', [])
-    data = []
+    paths = []
     for path in cfg['logs']:
         if not os.path.isfile(path):
             print(f"Fichier introuvable: {path}")
             continue
-        with open(path, 'r', errors='ignore') as f:
-            for line in f:
-                if filter_line(line, since, until, keywords):
-                    data.append({'file': os.path.basename(path), 'line': line.strip()})
-    return data
+        paths.append(path)
+    if cfg.get('parallel') and checkpoints is None:
+        chunk_size = int(cfg.get('chunk_size_mb', 32) * 1024 * 1024)
+        for path, line in scan_files(paths, since, until, keywords, datetime.datetime.now().year,
+                                     cfg.get('scan_workers'), chunk_size):
+            yield {'file': os.path.basename(path), 'line': line}
+        return
+    match = compile_filter(since, until, keywords)
+    for path in paths:
+        name = os.path.basename(path)
+        if checkpoints is not None:
+            lines = tail_file(path, checkpoints)
+        else:
+            lines = open(path, 'r', errors='ignore')
+        try:
+            for line in lines:
+                if match(line):
+                    yield {'file': name, 'line': line.strip()}
+        finally:
+            lines.close()
+
+def fetch_linux(cfg):
+    return list(iter_linux(cfg))
+
+def iter_events(cfg, checkpoints=None, host=None):
+    """
+    Générateur des événements structurés (voir events.py) correspondant aux entrées retenues.
+    """
+    build = EventBuilder(cfg['filters'].get('keywords', []), cfg.get('severity'), host or platform.node())
+    for entry in iter_linux(cfg, checkpoints):
+        yield build(entry['file'], entry['line'])
 
 # Logs Windows
 def fetch_windows(cfg):
@@ -87,35 +114,61 @@ def fetch_windows(cfg):
         win32evtlog.CloseEventLog(handle)
     return data
 
-# Sauvegarde TXT ou CSV
-def save(data, outcfg):
-    if not data:
-        print("Aucune entrée collectée.")
-        return
+# Sauvegarde TXT, CSV ou JSONL (les entrées sont écrites au fil de l'eau)
+def save(data, outcfg, append=False):
     fmt = outcfg['format']
     base = outcfg['file']
-    if fmt == 'txt':
-        with open(base + '.txt', 'w', encoding='utf-8') as f:
-            for entry in data:
+    path = f"{base}.{fmt}"
+    # En mode ajout, l'en-tête CSV n'est écrit que pour un nouveau fichier
+    new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+    count = 0
+    f = None
+    writer = None
+    try:
+        for entry in data:
+            if f is None:
+                f = open(path, 'a' if append else 'w', newline='' if fmt == 'csv' else None, encoding='utf-8')
+                if fmt == 'csv':
+                    writer = csv.DictWriter(f, fieldnames=list(entry.keys()))
+                    if new_file:
+                        writer.writeheader()
+            if writer:
+                writer.writerow(entry)
+            elif fmt == 'jsonl':
+                f.write(json.dumps(entry) + '\n')
+            else:
                 f.write(str(entry) + '\n')
-    else:
-        with open(base + '.csv', 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=list(data[0].keys()))
-            writer.writeheader()
-            writer.writerows(data)
-    print(f"{len(data)} entrées enregistrées dans {base}.{fmt}")
+            count += 1
+    finally:
+        if f:
+            f.close()
+    if not count:
+        print("Aucune entrée collectée.")
+        return
+    print(f"{count} entrées enregistrées dans {path}")
 
 if __name__ == '__main__':
     cfg = load_config()
     current_os = platform.system().lower()
+    checkpoints = None
     if current_os == 'windows':
         data = fetch_windows(cfg['windows'])
         outcfg = cfg['windows']['output']
     elif current_os == 'linux':
-        data = fetch_linux(cfg['linux'])
+        if cfg['linux'].get('tail'):
+            # Mode tail : reprise aux points de reprise, ajout au fichier de sortie
+            checkpoint_file = cfg['linux'].get('checkpoint_file', 'log_checkpoints.json')
+            checkpoints = load_checkpoints(checkpoint_file)
         outcfg = cfg['linux']['output']
+        # JSONL : événements structurés plutôt que lignes brutes
+        if outcfg['format'] == 'jsonl':
+            data = iter_events(cfg['linux'], checkpoints)
+        else:
+            data = iter_linux(cfg['linux'], checkpoints)
     else:
         print(f"OS non supporté: {current_os}")
         exit(1)
-    save(data, outcfg)
-
+    save(data, outcfg, append=checkpoints is not None)
+    if checkpoints is not None:
+        # Enregistrés après l'écriture : un arrêt en cours de route relit les lignes au lieu de les perdre
+        save_checkpoints(checkpoint_file, checkpoints)
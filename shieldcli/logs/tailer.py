@@ -0,0 +1,65 @@
+# Lecture incrémentale des fichiers de logs
+# Un point de reprise (inode, offset) est conservé par fichier : seules les lignes ajoutées depuis
+# la dernière exécution sont lues. La rotation (nouvel inode) et la troncature sont détectées.
+
+import json
+import os
+
+def load_checkpoints(path):
+    """
+    Charge les points de reprise {fichier: {"inode": int, "offset": int}}.
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_checkpoints(path, checkpoints):
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f, indent=4)
+    os.replace(tmp_path, path)
+
+def _read_lines(path, offset, checkpoint):
+    """
+    Lit les lignes complètes à partir de offset ; checkpoint["offset"] avance au fil des lignes
+    consommées (une ligne en cours d'écriture, sans fin de ligne, sera relue au prochain passage).
+    """
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                break
+            offset += len(raw)
+            checkpoint['offset'] = offset
+            yield raw.decode('utf-8', errors='ignore')
+
+def _rotated_file(path, inode):
+    # Fichier renommé par logrotate (auth.log -> auth.log.1) : même inode que le point de reprise
+    for candidate in (path + '.1', path + '-1'):
+        try:
+            if os.stat(candidate).st_ino == inode:
+                return candidate
+        except OSError:
+            continue
+    return None
+
+def tail_file(path, checkpoints):
+    """
+    Générateur des nouvelles lignes de path depuis son point de reprise (mis à jour en place).
+    Après une rotation, la fin de l'ancien fichier est lue avant le nouveau.
+    """
+    st = os.stat(path)
+    previous = checkpoints.get(path)
+    offset = 0
+    if previous:
+        if previous['inode'] == st.st_ino:
+            # Fichier tronqué (copytruncate) : reprise au début
+            offset = previous['offset'] if previous['offset'] <= st.st_size else 0
+        else:
+            rotated = _rotated_file(path, previous['inode'])
+            if rotated:
+                yield from _read_lines(rotated, previous['offset'], previous)
+    checkpoint = checkpoints[path] = {'inode': st.st_ino, 'offset': offset}
+    yield from _read_lines(path, offset, checkpoint)
@@ -0,0 +1,198 @@
+# Instrumentation de ShieldCLI : compteurs, jauges et histogrammes en mémoire
+# Exposés par l'API au format texte Prometheus (/metrics) et exportés par l'agent en JSON
+# à chaque exécution. Aucune dépendance externe (prometheus_client non requis).
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Bornes (secondes) adaptées aux latences de la milliseconde à la dizaine de secondes
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+# Bornes (octets) pour les tailles de fichiers et de rapports
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864, 268435456)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=None):
+    items = list(key) + (extra or [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in items) + "}"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def reset(self):
+        with self.lock:
+            self.values.clear()
+
+    def items(self):
+        # Copie cohérente des valeurs, prise sous verrou
+        with self.lock:
+            return list(self.values.items())
+
+class Counter(Metric):
+    """
+    Valeur cumulée ; une fonction peut être fournie pour lire au moment de l'export un total
+    tenu ailleurs (ex. compteurs internes d'un cache).
+    """
+    kind = "counter"
+
+    def __init__(self, name, help_text, function=None):
+        super().__init__(name, help_text)
+        self.function = function
+
+    def items(self):
+        if self.function:
+            value = self.function()
+            with self.lock:
+                self.values[()] = value
+        return super().items()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        return [f"{self.name}{_format_labels(key)} {_format_value(value)}" for key, value in self.items()]
+
+    def summary(self, value):
+        return value
+
+class Gauge(Counter):
+    """
+    Valeur instantanée ; une fonction peut être fournie pour la lire au moment de l'export.
+    """
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[_label_key(labels)] = value
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            entry = self.values.get(key)
+            if entry is None:
+                # [compteurs par borne, somme, nombre, maximum]
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0, value]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+            entry[3] = max(entry[3], value)
+
+    def items(self):
+        with self.lock:
+            return [(key, [list(counts), total, count, maximum])
+                    for key, (counts, total, count, maximum) in self.values.items()]
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = []
+        for key, (counts, total, count, _) in self.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', _format_value(bound))])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def summary(self, value):
+        counts, total, count, maximum = value
+        return {"count": count, "sum": round(total, 6), "avg": round(total / count, 6) if count else 0.0,
+                "max": round(maximum, 6)}
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def _register(self, metric):
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                # Un module rechargé ou importé deux fois (script / package) réutilise la métrique
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_text, function=None):
+        return self._register(Counter(name, help_text, function))
+
+    def gauge(self, name, help_text, function=None):
+        return self._register(Gauge(name, help_text, function))
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, buckets))
+
+    def render(self):
+        """
+        Export au format texte Prometheus (version 0.0.4).
+        """
+        lines = []
+        for metric in list(self.metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """
+        Résumé JSON : {métrique: [{"labels": {...}, "value" | "count"/"sum"/"avg"/"max"}]}.
+        """
+        result = {}
+        for metric in list(self.metrics.values()):
+            entries = []
+            for key, value in metric.items():
+                summary = metric.summary(value)
+                entry = {"labels": dict(key)}
+                entry.update(summary if isinstance(summary, dict) else {"value": summary})
+                entries.append(entry)
+            if entries:
+                result[metric.name] = entries
+        return result
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
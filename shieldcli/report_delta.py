@@ -0,0 +1,42 @@
+# Rapports différentiels agent -> API
+# L'agent n'envoie que les résultats d'audit modifiés et les alertes nouvelles / résolues
+# depuis le dernier rapport acquitté ; l'API reconstruit l'état complet.
+
+import json
+
+def alert_key(alert):
+    """
+    Identifiant stable d'une alerte (dictionnaire type/file/msg).
+    """
+    return json.dumps(alert, sort_keys=True)
+
+def compute_delta(prev_audit, prev_alerts, audit, alerts):
+    """
+    Calcule la différence entre deux états.
+    Retourne (audit modifié {check: valeur, None si supprimé}, alertes nouvelles, alertes résolues).
+    """
+    changed = {check: value for check, value in audit.items() if check not in prev_audit or prev_audit[check] != value}
+    for check in prev_audit:
+        if check not in audit:
+            changed[check] = None
+    prev_keys = {alert_key(a) for a in prev_alerts}
+    keys = {alert_key(a) for a in alerts}
+    new_alerts = [a for a in alerts if alert_key(a) not in prev_keys]
+    resolved = [a for a in prev_alerts if alert_key(a) not in keys]
+    return changed, new_alerts, resolved
+
+def apply_delta(audit, alerts, changed, new_alerts, resolved):
+    """
+    Applique un delta à un état complet et retourne le nouvel état (audit, alertes).
+    """
+    audit = dict(audit)
+    for check, value in changed.items():
+        if value is None:
+            audit.pop(check, None)
+        else:
+            audit[check] = value
+    resolved_keys = {alert_key(a) for a in resolved}
+    alerts = [a for a in alerts if alert_key(a) not in resolved_keys]
+    known = {alert_key(a) for a in alerts}
+    alerts.extend(a for a in new_alerts if alert_key(a) not in known)
+    return audit, alerts
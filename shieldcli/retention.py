@@ -0,0 +1,110 @@
+# Maintenance de reports.db : suppressions par lots et vacuum incrémental
+# Les politiques (durées de conservation, tables concernées) sont définies dans api.py ; ce module
+# fournit le thread périodique et les primitives qui ménagent l'ingestion : chaque lot de suppressions
+# est une transaction courte, suivie d'une pause qui laisse passer le thread écrivain.
+
+import threading
+import time
+
+from sqlalchemy import select, text
+
+class PeriodicJob:
+    """
+    Appelle func() toutes les interval secondes dans un thread dédié (première exécution après delay).
+    Une exception est signalée sans arrêter le thread.
+    """
+
+    def __init__(self, func, interval, delay=0, name="retention"):
+        self.func = func
+        self.interval = interval
+        self.delay = delay
+        self.name = name
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None or not self.thread.is_alive():
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        wait = self.delay
+        while not self.stop_event.wait(wait):
+            try:
+                self.func()
+            except Exception as e:
+                print(f"Erreur lors de la tâche {self.name}: {e}")
+            wait = self.interval
+
+    def stop(self, timeout=5):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+def delete_ids(engine, table, ids, batch_size=1000, pause=0.05):
+    """
+    Supprime les lignes d'identifiants ids par lots de batch_size, une transaction par lot.
+    Retourne le nombre de lignes supprimées.
+    """
+    ids = list(ids)
+    deleted = 0
+    for start in range(0, len(ids), batch_size):
+        with engine.begin() as conn:
+            deleted += conn.execute(table.delete().where(table.c.id.in_(ids[start:start + batch_size]))).rowcount
+        if pause and start + batch_size < len(ids):
+            time.sleep(pause)
+    return deleted
+
+def delete_where(engine, table, condition, batch_size=1000, pause=0.05):
+    """
+    Supprime par lots les lignes vérifiant condition (à appuyer sur un index pour rester rapide) :
+    chaque lot sélectionne au plus batch_size identifiants puis les supprime dans la même transaction.
+    """
+    deleted = 0
+    while True:
+        with engine.begin() as conn:
+            ids = conn.execute(select(table.c.id).where(condition).limit(batch_size)).scalars().all()
+            if ids:
+                deleted += conn.execute(table.delete().where(table.c.id.in_(ids))).rowcount
+        if len(ids) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)
+
+# PRAGMA auto_vacuum : 0 = aucun, 1 = complet, 2 = incrémental
+AUTO_VACUUM_INCREMENTAL = 2
+
+def auto_vacuum_mode(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("PRAGMA auto_vacuum")).scalar()
+
+def enable_incremental_vacuum(engine):
+    """
+    Passe une base existante en auto_vacuum incrémental. Nécessite un VACUUM complet
+    (reconstruction de la base, écritures bloquées pendant l'opération) : à lancer une seule fois.
+    """
+    with engine.connect() as conn:
+        conn.execute(text(f"PRAGMA auto_vacuum={AUTO_VACUUM_INCREMENTAL}"))
+        conn.commit()
+        conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+
+def incremental_vacuum(engine, max_pages=None):
+    """
+    Rend au système les pages libérées par les suppressions (au plus max_pages par appel),
+    sans reconstruire la base. Retourne le nombre de pages libérées.
+    """
+    raw = engine.raw_connection()
+    try:
+        conn = raw.driver_connection
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            return 0
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # sqlite3 ne libère qu'une page par étape avec execute() : executescript va jusqu'au bout
+        conn.executescript(f"PRAGMA incremental_vacuum({int(max_pages or 0)})")
+        after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # Le fichier principal n'est réduit qu'au checkpoint du WAL (mode passif : aucun lecteur bloqué)
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+    finally:
+        raw.close()
+    return before - after
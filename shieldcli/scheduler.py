@@ -0,0 +1,195 @@
+# Planificateur de l'agent en mode démon (voir agent.py --daemon)
+# Chaque tâche (intégrité, conformité, logs, découverte) a sa propre période, décalée d'un délai
+# aléatoire au démarrage (splay) puis d'une gigue à chaque exécution : sur un parc de machines,
+# les passes ne tombent pas toutes à la même seconde. Une tâche encore en cours à l'échéance
+# suivante n'est pas relancée (l'exécution est comptée comme "skipped").
+# Le processus peut aussi être déprioritisé (nice, classe d'I/O "idle" ou "best-effort").
+
+import ctypes
+import ctypes.util
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+from shieldcli import metrics
+
+TASK_RUNS = metrics.counter("shieldcli_agent_task_runs_total", "Exécutions des tâches planifiées (ok / error / skipped)")
+TASK_SECONDS = metrics.histogram("shieldcli_agent_task_seconds", "Durée des tâches planifiées")
+TASK_RUNNING = metrics.gauge("shieldcli_agent_tasks_running", "Tâches planifiées en cours d'exécution")
+
+# ioprio_set(2) : numéro d'appel système par architecture (pas de wrapper dans la libc)
+IOPRIO_SYSCALLS = {"x86_64": 251, "i386": 289, "i686": 289, "aarch64": 30, "armv7l": 314}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASSES = {"realtime": 1, "best-effort": 2, "idle": 3}
+
+def set_io_priority(io_class, level=7):
+    """
+    Classe d'I/O du processus (Linux, équivalent de "ionice -c"). Retourne True si elle est appliquée.
+    Les threads créés ensuite héritent de la priorité.
+    """
+    number = IOPRIO_SYSCALLS.get(platform.machine())
+    if not sys.platform.startswith("linux") or number is None or io_class not in IOPRIO_CLASSES:
+        return False
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return False
+    value = (IOPRIO_CLASSES[io_class] << IOPRIO_CLASS_SHIFT) | (0 if io_class == "idle" else level)
+    if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, value) != 0:
+        print(f"Impossible d'appliquer la classe d'I/O {io_class}: {os.strerror(ctypes.get_errno())}")
+        return False
+    return True
+
+def lower_priority(nice=None, io_class=None):
+    """
+    Déprioritise le processus courant : nice (CPU, POSIX) et classe d'I/O (Linux).
+    À appeler avant de lancer les threads de travail.
+    """
+    if nice and hasattr(os, "nice"):
+        try:
+            os.nice(nice)
+        except OSError as e:
+            print(f"Impossible d'appliquer nice {nice}: {e}")
+    if io_class:
+        set_io_priority(io_class)
+
+class RunLock:
+    """
+    Verrou exclusif sur fichier entre processus (flock, ou msvcrt sous Windows) :
+    une exécution lancée par cron pendant que la précédente, ou le démon, tourne encore est ignorée.
+    Le verrou est libéré par le système si le processus s'arrête brutalement.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def acquire(self):
+        f = open(self.path, "a+")
+        try:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            elif msvcrt:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        f.seek(0)
+        f.truncate()
+        f.write(str(os.getpid()))
+        f.flush()
+        self.file = f
+        return True
+
+    def release(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, *exc):
+        self.release()
+
+class Task:
+    """
+    interval : période en secondes ; jitter : fraction de la période ajoutée ou retirée au hasard
+    à chaque échéance (0.1 = ±10 %).
+    """
+
+    def __init__(self, name, func, interval, jitter=0.1):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        self.next_run = None
+        self.thread = None
+
+    def delay(self):
+        return max(0.0, self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+class Scheduler:
+    """
+    Lance chaque tâche dans son propre thread à son échéance ; les tâches ne se bloquent pas entre elles.
+    on_complete(task, outcome, seconds) est appelé dans le thread de la tâche après chaque exécution.
+    """
+
+    def __init__(self, tasks, splay=0, on_complete=None):
+        self.tasks = tasks
+        self.splay = splay
+        self.on_complete = on_complete
+        self.stop_event = threading.Event()
+
+    def _run(self, task):
+        start = time.perf_counter()
+        outcome = "ok"
+        TASK_RUNNING.inc()
+        try:
+            task.func()
+        except Exception as e:
+            outcome = "error"
+            print(f"Erreur lors de la tâche {task.name}: {e}")
+        finally:
+            TASK_RUNNING.inc(-1)
+        seconds = time.perf_counter() - start
+        TASK_SECONDS.observe(seconds, task=task.name)
+        TASK_RUNS.inc(task=task.name, outcome=outcome)
+        if self.on_complete:
+            self.on_complete(task, outcome, seconds)
+
+    def _dispatch(self, task, now):
+        if task.running():
+            print(f"Tâche {task.name} toujours en cours : exécution ignorée")
+            TASK_RUNS.inc(task=task.name, outcome="skipped")
+        else:
+            task.thread = threading.Thread(target=self._run, args=(task,), name=f"task-{task.name}", daemon=True)
+            task.thread.start()
+        # Échéance suivante calculée depuis l'échéance prévue (pas de dérive), sauf après un long retard
+        task.next_run += task.delay()
+        if task.next_run <= now:
+            task.next_run = now + task.delay()
+
+    def run(self):
+        """
+        Boucle principale, jusqu'à stop(). La première exécution de chaque tâche est répartie
+        aléatoirement sur [0, splay] secondes.
+        """
+        now = time.monotonic()
+        for task in self.tasks:
+            task.next_run = now + random.uniform(0, min(self.splay, task.interval))
+        while not self.stop_event.is_set():
+            now = time.monotonic()
+            for task in self.tasks:
+                if task.next_run <= now:
+                    self._dispatch(task, now)
+            self.stop_event.wait(max(0.0, min(task.next_run for task in self.tasks) - time.monotonic()))
+
+    def stop(self):
+        self.stop_event.set()
+
+    def join(self, timeout=None):
+        """
+        Attend la fin des tâches en cours (au plus timeout secondes au total).
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for task in self.tasks:
+            if task.running():
+                task.thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
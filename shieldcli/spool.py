@@ -0,0 +1,88 @@
+# File locale des rapports de l'agent (append-only)
+# Chaque rapport est ajouté en fin de fichier (une ligne JSON) ; un fichier d'offset mémorise
+# jusqu'où l'API a acquitté. Le fichier est tronqué une fois entièrement vidé.
+
+import json
+import os
+
+class Spool:
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024):
+        self.path = path
+        self.offset_path = path + ".offset"
+        self.max_bytes = max_bytes
+
+    def _read_offset(self):
+        try:
+            with open(self.offset_path, "r") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def _write_offset(self, offset):
+        tmp_path = self.offset_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(str(offset))
+        os.replace(tmp_path, self.offset_path)
+
+    def size(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    def append(self, payload):
+        """
+        Ajoute un rapport à la file. Retourne False si la file a dépassé sa taille maximale.
+        """
+        size = self.size()
+        if size >= self.max_bytes:
+            return False
+        prefix = ""
+        if size:
+            # Termine une éventuelle ligne incomplète laissée par un arrêt brutal
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    prefix = "\n"
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(prefix + json.dumps(payload) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return True
+
+    def pending(self, limit=None):
+        """
+        Retourne les rapports non acquittés [(offset de fin, rapport)], dans l'ordre d'ajout.
+        """
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "rb") as f:
+            f.seek(self._read_offset())
+            while limit is None or len(entries) < limit:
+                line = f.readline()
+                if not line:
+                    break
+                if not line.endswith(b"\n"):
+                    # Ligne incomplète (arrêt brutal pendant l'écriture) : ignorée
+                    break
+                try:
+                    entries.append((f.tell(), json.loads(line)))
+                except ValueError:
+                    continue
+        return entries
+
+    def ack(self, offset):
+        """
+        Acquitte tous les rapports jusqu'à offset ; la file est vidée lorsqu'il n'en reste plus.
+        """
+        if offset >= self.size():
+            self.clear()
+        else:
+            self._write_offset(offset)
+
+    def clear(self):
+        for path in (self.path, self.offset_path):
+            if os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,37 @@
+# Configuration commune des tests : l'API est importée sur une base SQLite temporaire,
+# sans job de rétention en arrière-plan.
+
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_DB_DIR = tempfile.mkdtemp(prefix="shieldcli-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DB_DIR}/reports.db"
+os.environ.setdefault("JWT_SECRET_KEY", "shieldcli-tests-secret-0123456789abcdef")
+os.environ["RETENTION_INTERVAL"] = "0"
+
+@pytest.fixture(scope="session")
+def api():
+    from shieldcli import api
+    return api
+
+@pytest.fixture(scope="session")
+def client(api):
+    from fastapi.testclient import TestClient
+    with TestClient(api.app) as client:
+        yield client
+
+@pytest.fixture
+def agent(client):
+    """
+    Agent neuf (identifiant unique) et en-têtes d'authentification : les tests partagent la base.
+    """
+    agent_id = f"test-{uuid.uuid4()}"
+    token = client.post("/login", json={"agent_id": agent_id}).json()["access_token"]
+    return agent_id, {"Authorization": f"Bearer {token}"}
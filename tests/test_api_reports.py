@@ -0,0 +1,145 @@
+# Ingestion des rapports (complets et différentiels) puis relecture par le dashboard
+
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+def at(hours):
+    return (START + timedelta(hours=hours)).isoformat()
+
+def post(client, headers, **report):
+    return client.post("/report", json=report, headers=headers)
+
+def test_delta_without_resolved_alerts(client, agent):
+    agent_id, headers = agent
+    alert = {"type": "checksum", "file": "/etc/passwd", "msg": "Modification détectée"}
+    assert post(client, headers, timestamp=at(0), audit={"ssh": True}, integrity_alerts=[], seq=1).status_code == 200
+    # Delta sans resolved_alerts (champ optionnel du modèle)
+    r = post(client, headers, timestamp=at(1), audit={"ssh": False}, integrity_alerts=[alert], seq=2, base_seq=1)
+    assert r.status_code == 200
+
+    r = client.get(f"/dashboard/{agent_id}", headers=headers)
+    assert r.status_code == 200
+    assert r.json()[-1] == {"timestamp": at(1)[:19], "audit": {"ssh": False}, "integrity_alerts": [alert]}
+    raw = client.get(f"/dashboard/{agent_id}", params={"expand": "false"}, headers=headers).json()
+    assert raw[-1]["resolved_alerts"] == []
+
+def test_legacy_null_resolved_alerts(client, agent, api):
+    agent_id, headers = agent
+    assert post(client, headers, timestamp=at(0), audit={"ssh": True}, integrity_alerts=[], seq=1).status_code == 200
+    # Ligne écrite par une version antérieure : resolved_alerts = "null"
+    db = api.SessionLocal()
+    try:
+        db.add(api.ReportDB(agent_id=agent_id, timestamp=START + timedelta(hours=1), audit='{"ssh": false}',
+                            integrity_alerts="[]", seq=2, is_delta=1, resolved_alerts="null"))
+        db.commit()
+    finally:
+        db.close()
+    r = client.get(f"/dashboard/{agent_id}", headers=headers)
+    assert r.status_code == 200
+    assert r.json()[-1]["audit"] == {"ssh": False}
+
+def test_full_report_with_null_alerts(client, agent):
+    agent_id, headers = agent
+    assert post(client, headers, timestamp=at(0), audit={"ssh": True}, integrity_alerts=None, seq=1).status_code == 200
+    alert = {"type": "checksum", "file": "/etc/passwd", "msg": "Modification détectée"}
+    assert post(client, headers, timestamp=at(1), audit={"ssh": True}, integrity_alerts=[alert], seq=2).status_code == 200
+    assert post(client, headers, timestamp=at(2), audit={}, integrity_alerts=[], seq=3, base_seq=2).status_code == 200
+    assert client.get(f"/state/{agent_id}", headers=headers).json()["integrity_alerts"] == [alert]
+    raw = client.get(f"/dashboard/{agent_id}", params={"expand": "false"}, headers=headers).json()
+    assert raw[0]["integrity_alerts"] == []
+
+def test_delta_on_legacy_null_state(client, agent, api):
+    agent_id, headers = agent
+    # État écrit par une version antérieure : integrity_alerts = "null"
+    db = api.SessionLocal()
+    try:
+        db.add(api.AgentStateDB(agent_id=agent_id, seq=1, audit='{"ssh": true}', integrity_alerts="null"))
+        db.commit()
+    finally:
+        db.close()
+    alert = {"type": "checksum", "file": "/etc/hosts", "msg": "Modification détectée"}
+    r = post(client, headers, timestamp=at(1), audit={}, integrity_alerts=[alert], seq=2, base_seq=1)
+    assert r.status_code == 200
+    state = client.get(f"/state/{agent_id}", headers=headers).json()
+    assert state["audit"] == {"ssh": True} and state["integrity_alerts"] == [alert]
+
+def test_delta_with_wrong_base_requests_resync(client, agent):
+    _, headers = agent
+    assert post(client, headers, timestamp=at(0), audit={"ssh": True}, integrity_alerts=[], seq=1).status_code == 200
+    r = post(client, headers, timestamp=at(1), audit={}, integrity_alerts=[], seq=3, base_seq=2)
+    assert r.status_code == 409
+    assert r.json()["detail"]["expected_base_seq"] == 1
+
+def ingest_history(client, headers, count):
+    """
+    Un rapport complet puis count - 1 deltas ; retourne l'état complet attendu après chaque rapport.
+    """
+    audit = {f"c{i}": True for i in range(5)}
+    alerts = []
+    expected = []
+    assert post(client, headers, timestamp=at(0), audit=audit, integrity_alerts=[], seq=1).status_code == 200
+    expected.append({"audit": dict(audit), "integrity_alerts": []})
+    for seq in range(2, count + 1):
+        check = f"c{seq % 5}"
+        audit[check] = not audit[check]
+        new = [{"type": "checksum", "file": f"/f{seq}", "msg": "m"}]
+        resolved = alerts[:1] if seq % 3 == 0 else []
+        alerts = [a for a in alerts if a not in resolved] + new
+        r = post(client, headers, timestamp=at(seq), audit={check: audit[check]}, integrity_alerts=new,
+                 resolved_alerts=resolved, seq=seq, base_seq=seq - 1)
+        assert r.status_code == 200
+        expected.append({"audit": dict(audit), "integrity_alerts": list(alerts)})
+    return expected
+
+def test_dashboard_pages_replay_from_snapshots(client, agent, api, monkeypatch):
+    agent_id, headers = agent
+    monkeypatch.setattr(api, "REPORT_SNAPSHOT_EVERY", 4)
+    expected = ingest_history(client, headers, 23)
+
+    db = api.SessionLocal()
+    try:
+        snapshots = db.query(api.ReportDB).filter(api.ReportDB.agent_id == agent_id,
+                                                  api.ReportDB.snapshot_audit.isnot(None)).count()
+    finally:
+        db.close()
+    assert snapshots == 5
+
+    # Pages de 5 : chaque page repart du point de reprise le plus proche
+    pages, cursor = [], None
+    while True:
+        params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+        r = client.get(f"/dashboard/{agent_id}", params=params, headers=headers)
+        assert r.status_code == 200
+        pages.extend({k: v for k, v in item.items() if k != "timestamp"} for item in r.json())
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert pages == expected
+
+    # Rapport seq=17 à at(17) : index 16 de expected
+    r = client.get(f"/dashboard/{agent_id}", params={"since": at(17)[:19]}, headers=headers)
+    assert [{k: v for k, v in item.items() if k != "timestamp"} for item in r.json()] == expected[16:]
+
+def test_failed_report_does_not_abort_its_batch(client, api):
+    valid = api.Report(timestamp=at(0), audit={"ssh": True}, integrity_alerts=[], seq=1)
+    # Valeur non sérialisable : échec à l'écriture, après l'ajout d'objets à la session
+    poisoned = api.Report(timestamp=at(0), audit={"ssh": True, "bad": object()}, integrity_alerts=[], seq=1)
+    results = api.write_reports([("batch-valid", valid), ("batch-poisoned", poisoned), ("batch-valid-2", valid)])
+    assert isinstance(results[1], TypeError)
+    assert results[0]["seq"] == results[2]["seq"] == 1
+
+    # Même lot via la file d'écriture : seul le Future du rapport en échec porte l'erreur
+    futures = [api.ingest_queue.submit(item) for item in
+               [("queue-valid", valid), ("queue-poisoned", poisoned)]]
+    assert futures[0].result(timeout=5)["seq"] == 1
+    assert isinstance(futures[1].exception(timeout=5), TypeError)
+
+    db = api.SessionLocal()
+    try:
+        stored = {state.agent_id for state in db.query(api.AgentStateDB).filter(api.AgentStateDB.agent_id.like("%-valid%"))}
+        assert stored == {"batch-valid", "batch-valid-2", "queue-valid"}
+        assert db.get(api.AgentStateDB, "batch-poisoned") is None and db.get(api.AgentStateDB, "queue-poisoned") is None
+        assert db.query(api.CheckResultDB).filter(api.CheckResultDB.agent_id == "batch-poisoned").count() == 0
+    finally:
+        db.close()
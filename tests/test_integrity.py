@@ -0,0 +1,39 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from shieldcli.integrity import file_monitor
+from shieldcli.integrity.merkle import build_tree, node_payload
+from shieldcli.integrity.store import write_store
+
+@pytest.fixture
+def racine(tmp_path):
+    data = tmp_path / "data"
+    for i in range(200):
+        path = data / f"d{i % 7}" / f"s{i % 3}" / f"f{i}.txt"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(str(i))
+    (tmp_path / "monitor_config.json").write_text(json.dumps({"paths": [str(data)], "hash_workers": 4}))
+    write_store(str(tmp_path / "baseline.db"), file_monitor.build_baseline([str(data)]))
+    return tmp_path
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_batched_check_matches_flat_tree(racine, monkeypatch, incremental):
+    data = racine / "data"
+    (data / "d1" / "s1" / "f1.txt").unlink()
+    (data / "d2" / "s2" / "f2.txt").write_text("modifié")
+    monkeypatch.setattr(file_monitor, "HASH_BATCH_SIZE", 16)
+
+    alerts = file_monitor.run_integrity_check(incremental=incremental, racine=str(racine))
+
+    assert sorted((a["type"], os.path.basename(a["file"])) for a in alerts) == [("checksum", "f2.txt"), ("missing", "f1.txt")]
+    assert file_monitor.last_scan_stats["hashed"] == (1 if incremental else 199)
+    # Même arbre que build_tree sur la liste complète des digests courants
+    current = [(str(p), hashlib.sha256(p.read_bytes()).digest()) for p in data.rglob("*.txt")]
+    expected = build_tree(current, [str(data)])
+    tree = file_monitor.last_merkle["tree"]
+    assert set(tree) == set(expected)
+    for path in expected:
+        assert node_payload(tree, path, file_monitor.last_merkle["files"]) == node_payload(expected, path)
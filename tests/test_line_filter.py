@@ -0,0 +1,46 @@
+# Filtre de lignes de logs : filter_line réutilise le filtre compilé
+
+import datetime
+
+from shieldcli.logs import line_filter
+from shieldcli.logs.script_logs_multiOS_detect import filter_line
+
+# Les lignes syslog n'ont pas d'année : filter_line prend l'année courante
+YEAR = datetime.date.today().year
+SINCE = datetime.datetime(YEAR, 6, 1, 0, 0, 0)
+UNTIL = datetime.datetime(YEAR, 6, 30, 23, 59, 59)
+LINES = [
+    "Jun  2 10:00:00 host sshd[1]: Failed password for root",
+    "Jun  2 10:00:00 host sshd[1]: Accepted password for alice",
+    "May 31 23:59:59 host kernel: error in module",
+    f"{YEAR}-06-15T08:30:00+02:00 host app: ERROR disk full",
+    "not a log line with error",
+]
+
+def test_filter_line_matches_compiled_filter():
+    match = line_filter.compile_filter(SINCE, UNTIL, ["fail", "error"], YEAR)
+    assert [filter_line(line, SINCE, UNTIL, ["fail", "error"]) for line in LINES] == \
+        [match(line) for line in LINES] == [True, False, False, True, True]
+
+def test_filter_line_compiles_once():
+    line_filter._cached_filter.cache_clear()
+    keywords = ["fail", "error"]
+    for line in LINES * 10:
+        filter_line(line, SINCE, UNTIL, keywords)
+    info = line_filter._cached_filter.cache_info()
+    assert info.misses == 1 and info.hits == len(LINES) * 10 - 1
+    # Des paramètres différents donnent un autre filtre
+    assert filter_line(LINES[1], SINCE, UNTIL, ["accepted"])
+    assert line_filter._cached_filter.cache_info().misses == 2
+
+def test_parallel_scan_matches_sequential(tmp_path):
+    from shieldcli.logs.script_logs_multiOS_detect import iter_linux
+    path = tmp_path / "auth.log"
+    content = "\r\n".join(LINES) + "\r\n\r\n" + "\n\n".join(LINES) + "\rlast line with error\r\n"
+    path.write_bytes((content * 20).encode())
+    for keywords in (["fail", "error"], []):
+        cfg = {"logs": [str(path)], "filters": {"keywords": keywords}, "chunk_size_mb": 0.001}
+        sequential = list(iter_linux(cfg))
+        parallel = list(iter_linux(dict(cfg, parallel=True, scan_workers=2)))
+        assert parallel == sequential
+        assert len(sequential) > 20
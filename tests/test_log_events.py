@@ -0,0 +1,15 @@
+# Réception et recherche des événements de logs
+
+def test_search_escapes_like_wildcards(client, agent):
+    agent_id, headers = agent
+    events = [{"timestamp": "2026-03-02T10:00:00", "source": "auth", "severity": "warning", "message": message}
+              for message in ("disk 100% full", "disk 1000 blocks", "user_admin login", "useradmin login")]
+    assert client.post("/logs/events", json=events, headers=headers).json() == {"received": 4}
+
+    def search(q):
+        params = {"agent_id": agent_id, "q": q, "since": "2026-03-01T00:00:00"}
+        return sorted(e["message"] for e in client.get("/logs/events", params=params, headers=headers).json())
+
+    assert search("100%") == ["disk 100% full"]
+    assert search("user_admin") == ["user_admin login"]
+    assert search("disk") == ["disk 100% full", "disk 1000 blocks"]
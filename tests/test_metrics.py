@@ -0,0 +1,28 @@
+# Export Prometheus : types des métriques et accès à /metrics
+
+from shieldcli import metrics
+
+def test_function_counter_is_exported_as_counter():
+    registry = metrics.Registry()
+    total = {"hits": 0}
+    registry.counter("test_cache_hits_total", "Hits", lambda: total["hits"])
+    total["hits"] = 7
+    text = registry.render()
+    assert "# TYPE test_cache_hits_total counter" in text
+    assert "test_cache_hits_total 7" in text
+    assert registry.snapshot()["test_cache_hits_total"] == [{"labels": {}, "value": 7}]
+
+def test_token_cache_metrics_are_counters(api):
+    text = metrics.REGISTRY.render()
+    assert "# TYPE shieldcli_token_cache_hits_total counter" in text
+    assert "# TYPE shieldcli_token_cache_misses_total counter" in text
+
+def test_metrics_require_local_client_without_token(client, api, monkeypatch):
+    monkeypatch.setattr(api, "METRICS_TOKEN", None)
+    # Le client de test n'a pas d'adresse de bouclage
+    assert client.get("/metrics").status_code == 403
+    monkeypatch.setattr(api, "METRICS_TOKEN", "metrics-token")
+    assert client.get("/metrics").status_code == 403
+    r = client.get("/metrics", headers={"Authorization": "Bearer metrics-token"})
+    assert r.status_code == 200
+    assert "shieldcli_token_cache_hits_total" in r.text
@@ -0,0 +1,69 @@
+# Compactage des rapports et agrégation des résultats de contrôles (politiques de rétention d'api.py)
+
+from datetime import timedelta
+
+from test_api_reports import START, at, ingest_history, post
+
+def agent_reports(api, agent_id):
+    db = api.SessionLocal()
+    try:
+        return (db.query(api.ReportDB).filter(api.ReportDB.agent_id == agent_id)
+                .order_by(api.ReportDB.timestamp, api.ReportDB.id).all())
+    finally:
+        db.close()
+
+def test_compact_reports_keeps_dashboard_state(client, agent, api, monkeypatch):
+    agent_id, headers = agent
+    monkeypatch.setattr(api, "REPORT_SNAPSHOT_EVERY", 4)
+    expected = ingest_history(client, headers, 23)
+    since = {"since": at(10)}
+    before = client.get(f"/dashboard/{agent_id}", params=since, headers=headers).json()
+    assert [{"audit": r["audit"], "integrity_alerts": r["integrity_alerts"]} for r in before] == expected[9:]
+
+    assert api.compact_reports((START + timedelta(hours=10, minutes=30)).replace(tzinfo=None)) >= 10
+
+    rows = agent_reports(api, agent_id)
+    assert [row.seq for row in rows] == list(range(10, 24))
+    # Le rapport à la limite devient complet (état reconstruit, sans snapshot)
+    assert not rows[0].is_delta and rows[0].snapshot_audit is None and rows[0].snapshot_alerts is None
+    assert client.get(f"/dashboard/{agent_id}", params=since, headers=headers).json() == before
+    # La chaîne de deltas continue après le compactage
+    assert post(client, headers, timestamp=at(24), audit={"c0": False}, integrity_alerts=[],
+                seq=24, base_seq=23).status_code == 200
+
+def test_rollup_check_results_keeps_state_changes(client, agent, api):
+    agent_id, headers = agent
+    for hour, ssh in enumerate([True, True, True, False, False]):
+        assert post(client, headers, timestamp=at(hour), audit={"ssh": ssh}, integrity_alerts=[],
+                    seq=hour + 1).status_code == 200
+
+    api.rollup_check_results((START + timedelta(hours=10)).replace(tzinfo=None))
+
+    db = api.SessionLocal()
+    try:
+        values = [row.value for row in db.query(api.CheckResultDB)
+                  .filter(api.CheckResultDB.agent_id == agent_id, api.CheckResultDB.check_id == "ssh")
+                  .order_by(api.CheckResultDB.timestamp)]
+    finally:
+        db.close()
+    assert values == ["true", "false"]
+
+def test_rollup_check_results_across_pages(client, agent, api, monkeypatch):
+    agent_id, headers = agent
+    monkeypatch.setattr(api, "RETENTION_BATCH_SIZE", 2)
+    monkeypatch.setattr(api, "RETENTION_BATCH_PAUSE", 0)
+    history = [(True, 1), (True, 1), (True, 2), (False, 2), (False, 2), (False, 2), (True, 2)]
+    for hour, (ssh, level) in enumerate(history):
+        assert post(client, headers, timestamp=at(hour), audit={"ssh": ssh, "level": level}, integrity_alerts=[],
+                    seq=hour + 1).status_code == 200
+
+    api.rollup_check_results((START + timedelta(hours=10)).replace(tzinfo=None))
+
+    db = api.SessionLocal()
+    try:
+        rows = (db.query(api.CheckResultDB).filter(api.CheckResultDB.agent_id == agent_id)
+                .order_by(api.CheckResultDB.check_id, api.CheckResultDB.timestamp).all())
+    finally:
+        db.close()
+    assert [(row.check_id, row.value) for row in rows] == [
+        ("level", "1"), ("level", "2"), ("ssh", "true"), ("ssh", "false"), ("ssh", "true")]
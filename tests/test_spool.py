@@ -0,0 +1,39 @@
+import os
+
+from shieldcli.spool import Spool
+
+def test_ack_removes_acknowledged_reports(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"))
+    for seq in range(3):
+        assert spool.append({"seq": seq})
+    entries = spool.pending()
+    assert [report["seq"] for _, report in entries] == [0, 1, 2]
+
+    spool.ack(entries[0][0])
+    assert [report["seq"] for _, report in spool.pending()] == [1, 2]
+    # Un nouvel objet relit l'offset persisté (redémarrage de l'agent)
+    assert [report["seq"] for _, report in Spool(spool.path).pending(limit=1)] == [1]
+
+    spool.ack(spool.pending()[-1][0])
+    assert spool.pending() == []
+    assert not os.path.exists(spool.path) and not os.path.exists(spool.offset_path)
+
+def test_partial_line_is_skipped_then_terminated(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"))
+    spool.append({"seq": 0})
+    # Arrêt brutal pendant l'écriture du rapport suivant
+    with open(spool.path, "a", encoding="utf-8") as f:
+        f.write('{"seq": 1, "tronq')
+    assert [report["seq"] for _, report in spool.pending()] == [0]
+
+    spool.append({"seq": 2})
+    entries = spool.pending()
+    assert [report["seq"] for _, report in entries] == [0, 2]
+    spool.ack(entries[-1][0])
+    assert spool.pending() == []
+
+def test_append_refused_when_full(tmp_path):
+    spool = Spool(str(tmp_path / "spool.jsonl"), max_bytes=10)
+    assert spool.append({"seq": 0, "data": "x" * 20})
+    assert not spool.append({"seq": 1})
+    assert len(spool.pending()) == 1